@@ -1,17 +1,24 @@
 import logging
+import time
 
 from fastapi import APIRouter, Depends, status
 from fastapi.responses import StreamingResponse
 
 from app.data.connection import Database
 from app.data.db import get_db
-from app.llms.chat import handle_chat
+from app.llms.answer_cache import answer_cache
+from app.llms.chat import handle_chat, instrument_stream, record_generation
+from app.llms.coalescing import chat_coalescer
 from app.llms.context import get_retrieved_context
 from app.llms.models import Model
 from app.schemas.chat import ChatSchema
+from app.utils.settings import Settings
+from app.utils.timing import start_timer, timed
 
 logger = logging.getLogger(__name__)
 
+settings = Settings()
+
 db_dep = Depends(get_db)
 
 router = APIRouter(
@@ -27,7 +34,10 @@ router = APIRouter(
     description=(
         "Compute an embedding for the incoming question, retrieve top-N "
         "similar questions for context, construct a prompt, and stream back "
-        "the LLM's answer as a text stream."
+        "the LLM's answer as a text stream. The time spent in each stage is "
+        "reported in the Server-Timing header. If the answer cache is enabled, "
+        "a cached answer to a near-identical question is replayed instead. "
+        "Identical requests in flight at the same time share one answer."
     ),
     response_class=StreamingResponse,
     status_code=status.HTTP_200_OK,
@@ -55,17 +65,62 @@ async def chat(
         payload.model_dump(mode="json", exclude_defaults=True),
     )
 
-    context = await get_retrieved_context(
-        db=db,
-        query=payload.prompt,
-        embedding_model=payload.embeddings_model,
-        use_reranker=payload.rerank_documents,
+    timer = start_timer()
+
+    key = chat_coalescer.get_key(payload)
+    if key is None:
+        response = await answer_chat(payload, db)
+    else:
+        response = await chat_coalescer.join(key, lambda: answer_chat(payload, db))
+
+    return instrument_stream(
+        response,
+        timer=timer,
+        emit_timings=payload.include_timings,
     )
 
+
+async def answer_chat(payload: ChatSchema, db: Database) -> StreamingResponse:
+    """
+    Run the chat pipeline: replay a cached answer, or retrieve the context
+    and stream a generated answer.
+    """
+    embedding = None
+    if settings.ANSWER_CACHE_ENABLED and payload.use_cache:
+        with timed("answer_cache"):
+            cached, embedding = await answer_cache.lookup(db, payload)
+
+        if cached is not None:
+            return answer_cache.replay(cached["answer"])
+
+    with timed("retrieval"):
+        context, sources = await get_retrieved_context(
+            db=db,
+            query=payload.prompt,
+            embedding_model=payload.embeddings_model,
+            use_reranker=payload.rerank_documents,
+            use_cache=payload.use_cache,
+            speculative=payload.speculative_retrieval,
+            use_index=payload.use_vector_index,
+            hybrid=payload.hybrid_retrieval,
+            fusion_models=payload.fusion_embeddings_models,
+        )
+
     if not context:
         context = "Не можев да пронајдам релевантни информации во базата на податоци."
 
-    return await handle_chat(payload, context)
+    generation_started_at = time.perf_counter()
+    with timed("agent_setup"):
+        response = await handle_chat(payload, context)
+
+    if embedding is not None:
+        response = answer_cache.capture(response, db, payload, embedding, sources)
+
+    return record_generation(
+        response,
+        payload.inference_model,
+        generation_started_at=generation_started_at,
+    )
 
 
 @router.get(
@@ -0,0 +1,187 @@
+import asyncio
+import json
+from collections.abc import AsyncGenerator
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+
+from app.data.connection import Database
+from app.data.db import get_db
+from app.data.fill_jobs import (
+    cancel_fill_job_query,
+    get_fill_job_events_query,
+    get_fill_job_query,
+)
+from app.llms.embeddings import resolve_fill_models
+from app.llms.fill_jobs import create_fill_job, fill_job_runner
+from app.schemas.fill_jobs import FILL_JOB_TERMINAL_STATUSES, FillJobSchema
+from app.schemas.questions import FillEmbeddingsSchema
+from app.utils.auth import verify_api_key
+from app.utils.settings import Settings
+
+settings = Settings()
+
+db_dep = Depends(get_db)
+api_key_dep = Depends(verify_api_key)
+
+router = APIRouter(
+    prefix="/questions/fill/jobs",
+    tags=["Questions"],
+    dependencies=[db_dep],
+)
+
+
+@router.post(
+    "/",
+    summary="Start an embedding fill job",
+    description=(
+        "Queue a fill job that runs server-side, independently of this request. "
+        "Progress is stored in the database, and the job resumes after a restart."
+    ),
+    response_model=FillJobSchema,
+    status_code=status.HTTP_202_ACCEPTED,
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"description": "Unsupported model"},
+        status.HTTP_401_UNAUTHORIZED: {"description": "Invalid or missing API Key"},
+    },
+    dependencies=[api_key_dep],
+    operation_id="startFillJob",
+)
+async def start_fill_job(
+    payload: FillEmbeddingsSchema,
+    db: Database = db_dep,
+) -> FillJobSchema:
+    models = resolve_fill_models(
+        payload.embeddings_model,
+        all_models=payload.all_models,
+    )
+    job = await create_fill_job(
+        db,
+        models,
+        questions=payload.questions,
+        all_questions=payload.all_questions,
+    )
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Failed to create fill job",
+        )
+    return job
+
+
+@router.get(
+    "/{job_id}",
+    summary="Get a fill job",
+    description="Return the status and progress of the fill job, 404 if not found.",
+    response_model=FillJobSchema,
+    status_code=status.HTTP_200_OK,
+    responses={status.HTTP_404_NOT_FOUND: {"description": "Fill job not found"}},
+    operation_id="getFillJob",
+)
+async def get_fill_job(
+    job_id: UUID,
+    db: Database = db_dep,
+) -> FillJobSchema:
+    job = await get_fill_job_query(db, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Fill job '{job_id}' not found",
+        )
+    return job
+
+
+@router.get(
+    "/{job_id}/events",
+    summary="Stream fill job events",
+    description=(
+        "Streams the job's per-row progress as Server-Sent Events (SSE), "
+        "starting after the given event index or the Last-Event-ID header. "
+        "The stream ends once the job has finished."
+    ),
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+    responses={status.HTTP_404_NOT_FOUND: {"description": "Fill job not found"}},
+    operation_id="streamFillJobEvents",
+)
+async def stream_fill_job_events(
+    job_id: UUID,
+    after: int = Query(
+        default=0,
+        ge=0,
+        description="Only stream events with a greater index",
+    ),
+    last_event_id: int | None = Header(default=None),
+    db: Database = db_dep,
+) -> StreamingResponse:
+    if not await get_fill_job_query(db, job_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Fill job '{job_id}' not found",
+        )
+
+    last_index = max(after, last_event_id or 0)
+
+    async def _gen() -> AsyncGenerator[str]:
+        nonlocal last_index
+        finished = False
+
+        while True:
+            events = await get_fill_job_events_query(db, job_id, after=last_index)
+            for event in events:
+                last_index = event["index"]
+                payload = json.loads(event["payload"])
+                yield (
+                    f"id: {last_index}\n"
+                    f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+                )
+
+            if events:
+                continue
+
+            # Events of a finished job are all stored, so one more empty read ends the stream
+            if finished:
+                return
+
+            job = await get_fill_job_query(db, job_id)
+            finished = job is None or job.status in FILL_JOB_TERMINAL_STATUSES
+            if not finished:
+                await asyncio.sleep(settings.FILL_JOB_EVENT_POLL_INTERVAL)
+
+    return StreamingResponse(
+        _gen(),
+        media_type="text/event-stream",
+    )
+
+
+@router.post(
+    "/{job_id}/cancel",
+    summary="Cancel a fill job",
+    description=(
+        "Cancel a pending or running fill job, 404 if not found. "
+        "Finished jobs are returned unchanged."
+    ),
+    response_model=FillJobSchema,
+    status_code=status.HTTP_200_OK,
+    responses={
+        status.HTTP_404_NOT_FOUND: {"description": "Fill job not found"},
+        status.HTTP_401_UNAUTHORIZED: {"description": "Invalid or missing API Key"},
+    },
+    dependencies=[api_key_dep],
+    operation_id="cancelFillJob",
+)
+async def cancel_fill_job(
+    job_id: UUID,
+    db: Database = db_dep,
+) -> FillJobSchema:
+    job = await cancel_fill_job_query(db, job_id)
+    if not job:
+        job = await get_fill_job_query(db, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Fill job '{job_id}' not found",
+        )
+    fill_job_runner.cancel(job_id)
+    return job
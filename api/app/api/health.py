@@ -6,7 +6,23 @@ from fastapi.responses import JSONResponse
 
 from app.data.connection import Database
 from app.data.db import get_db
-from app.schemas.health import DependencyStatus, HealthResponse, RootStatus
+from app.llms.answer_cache import answer_cache
+from app.llms.coalescing import chat_coalescer
+from app.llms.embedding_queue import embedding_queue
+from app.llms.embeddings_cache import embeddings_cache
+from app.llms.fill_jobs import fill_job_runner
+from app.llms.google import google_rate_limiter
+from app.llms.gpu_api import get_gpu_api_client_stats
+from app.llms.openai import openai_rate_limiter
+from app.llms.query_transform import query_transform_cache
+from app.llms.vector_index import question_index
+from app.llms.vector_snapshots import vector_snapshots
+from app.schemas.health import (
+    DependencyStatus,
+    HealthResponse,
+    RootStatus,
+    StatsResponse,
+)
 
 db_dep = Depends(get_db)
 
@@ -94,3 +110,37 @@ async def health_check(db: Database = db_dep) -> JSONResponse:
         status_code=code,
         content=jsonable_encoder(payload.model_dump()),
     )
+
+
+@router.get(
+    "/stats",
+    summary="Runtime Statistics",
+    description=(
+        "Returns counters for the caches and connection pools of the worker "
+        "that served the request, the depth of the embedding queue, the "
+        "throttle state of the provider rate limiters, the size and "
+        "snapshot version of the in-memory vector index, the answer "
+        "cache counters, and the chat requests in flight."
+    ),
+    response_model=StatsResponse,
+    status_code=status.HTTP_200_OK,
+    response_description="Cache and connection pool counters",
+    operation_id="getRuntimeStats",
+)
+async def runtime_stats(db: Database = db_dep) -> StatsResponse:
+    return StatsResponse(
+        timestamp=datetime.now(UTC),
+        stats={
+            "gpu_api_http": get_gpu_api_client_stats(),
+            "query_transform_cache": query_transform_cache.stats(),
+            "embeddings_cache": embeddings_cache.stats(),
+            "embedding_queue": await embedding_queue.stats(db),
+            "fill_jobs": fill_job_runner.stats(),
+            "openai_rate_limit": openai_rate_limiter.stats(),
+            "google_rate_limit": google_rate_limiter.stats(),
+            "vector_index": question_index.stats(),
+            "vector_snapshots": vector_snapshots.stats(),
+            "answer_cache": answer_cache.stats(),
+            "chat_coalescing": chat_coalescer.stats(),
+        },
+    )
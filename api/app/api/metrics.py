@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Response, status
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from app.utils.metrics import render_metrics
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["Health"],
+)
+
+
+@router.get(
+    "",
+    summary="Prometheus Metrics",
+    description=(
+        "Returns request, database pool, provider, cache and streaming metrics "
+        "in the Prometheus text format, aggregated across all workers."
+    ),
+    response_class=Response,
+    status_code=status.HTTP_200_OK,
+    response_description="Metrics in the Prometheus exposition format",
+    operation_id="getMetrics",
+)
+def metrics() -> Response:
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
@@ -18,6 +18,7 @@ from app.data.questions import (
 from app.data.questions import (
     get_closest_questions as query_closest_questions,
 )
+from app.llms.embedding_queue import embedding_queue
 from app.llms.embeddings import generate_embeddings, stream_fill_embeddings
 from app.llms.models import MODEL_EMBEDDINGS_COLUMNS, Model
 from app.schemas.questions import (
@@ -25,6 +26,7 @@ from app.schemas.questions import (
     CreateQuestionSchema,
     FillEmbeddingsSchema,
     QuestionSchema,
+    UnfilledQuestionSchema,
     UpdateQuestionSchema,
 )
 from app.utils.auth import verify_api_key
@@ -47,8 +49,14 @@ router = APIRouter(
     status_code=status.HTTP_200_OK,
     operation_id="listQuestions",
 )
-async def list_questions(db: Database = db_dep) -> list[QuestionSchema]:
-    return await get_questions_query(db)
+async def list_questions(
+    include_embeddings: bool = Query(
+        default=False,
+        description="Whether to include the embedding vectors of each question",
+    ),
+    db: Database = db_dep,
+) -> list[QuestionSchema]:
+    return await get_questions_query(db, include_embeddings=include_embeddings)
 
 
 @router.get(
@@ -98,10 +106,18 @@ async def closest_questions(
 )
 async def get_question_by_name(
     name: str,
+    include_embeddings: bool = Query(
+        default=False,
+        description="Whether to include the embedding vectors of the question",
+    ),
     db: Database = db_dep,
 ) -> QuestionSchema:
     decoded = urllib.parse.unquote(name)
-    question = await get_question_by_name_query(db, decoded)
+    question = await get_question_by_name_query(
+        db,
+        decoded,
+        include_embeddings=include_embeddings,
+    )
     if not question:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -113,7 +129,10 @@ async def get_question_by_name(
 @router.post(
     "/",
     summary="Create a new question",
-    description="Insert a new question. 400 if one with the same name exists.",
+    description=(
+        "Insert a new question and queue it for embedding. "
+        "400 if one with the same name exists."
+    ),
     response_model=QuestionSchema,
     status_code=status.HTTP_201_CREATED,
     responses={
@@ -142,13 +161,17 @@ async def create_question(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Failed to create question",
         )
+    await embedding_queue.enqueue(db, [created.id])
     return created
 
 
 @router.put(
     "/{name:path}",
     summary="Update an existing question",
-    description="Apply partial updates, 404 if not found.",
+    description=(
+        "Apply partial updates, 404 if not found. "
+        "Changes to the name or content queue the question for re-embedding."
+    ),
     response_model=QuestionSchema,
     status_code=status.HTTP_200_OK,
     responses={
@@ -187,6 +210,8 @@ async def update_question(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Failed to update question",
         )
+    if updates.keys() & {"name", "content"}:
+        await embedding_queue.enqueue(db, [updated.id])
     return updated
 
 
@@ -269,8 +294,11 @@ async def fill_embeddings(
 @router.get(
     "/unfilled",
     summary="List questions with unfilled embeddings",
-    description="Returns a list of questions that have unfilled embeddings for the specified model.",
-    response_model=list[QuestionSchema],
+    description=(
+        "Returns a list of questions whose embeddings for the specified model "
+        "are missing or stale (computed from an older version of the question)."
+    ),
+    response_model=list[UnfilledQuestionSchema],
     status_code=status.HTTP_200_OK,
     operation_id="listUnfilledQuestions",
     responses={
@@ -282,7 +310,7 @@ async def fill_embeddings(
 async def list_unfilled_questions(
     model: Model = Query(description="The model to check for unfilled embeddings"),  # noqa: B008
     db: Database = db_dep,
-) -> list[QuestionSchema]:
+) -> list[UnfilledQuestionSchema]:
     if model not in MODEL_EMBEDDINGS_COLUMNS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
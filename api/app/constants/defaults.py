@@ -2,3 +2,8 @@ from app.llms.models import Model
 
 DEFAULT_EMBEDDINGS_MODEL = Model.BGE_M3
 DEFAULT_INFERENCE_MODEL = Model.LLAMA_3_3_70B
+
+# Sent as the last SSE event when generation fails
+STREAM_ERROR_MESSAGE = (
+    "An error occurred while processing your request. Please try again."
+)
@@ -0,0 +1,104 @@
+from datetime import datetime
+from uuid import UUID
+
+from asyncpg import Record
+
+from app.data.connection import Database
+from app.utils.database import Vector
+
+
+async def get_cached_answer_query(
+    db: Database,
+    embeddings_model: str,
+    answer_key: str,
+    embedding: Vector,
+    *,
+    max_distance: float,
+    ttl: float,
+) -> Record | None:
+    """
+    Return the closest unexpired cached answer within `max_distance` of the
+    query embedding, counting the hit.
+    """
+    query = """
+    WITH closest AS (
+        SELECT id, embedding <=> $3 AS distance
+        FROM answer_cache
+        WHERE embeddings_model = $1
+            AND answer_key = $2
+            AND created_at > NOW() - make_interval(secs => $5)
+        ORDER BY distance
+        LIMIT 1
+    )
+    UPDATE answer_cache
+    SET hits = hits + 1
+    FROM closest
+    WHERE answer_cache.id = closest.id AND closest.distance < $4
+    RETURNING answer_cache.id, answer_cache.prompt, answer_cache.answer, closest.distance
+    """
+
+    return await db.fetchrow(
+        query,
+        embeddings_model,
+        answer_key,
+        embedding,
+        max_distance,
+        ttl,
+    )
+
+
+async def store_cached_answer_query(
+    db: Database,
+    embeddings_model: str,
+    answer_key: str,
+    prompt: str,
+    embedding: Vector,
+    answer: str,
+    sources: list[tuple[UUID, datetime]],
+) -> bool:
+    """
+    Cache an answer, unless one of its source questions was changed or
+    deleted since it was retrieved. Returns whether the answer was stored.
+    """
+    query = """
+    INSERT INTO answer_cache (embeddings_model, answer_key, prompt, embedding, answer, question_ids)
+    SELECT $1, $2, $3, $4, $5, $6::uuid[]
+    WHERE (
+        SELECT COUNT(*)
+        FROM question
+        JOIN unnest($6::uuid[], $7::timestamp[]) AS source(id, updated_at)
+            ON question.id = source.id AND question.updated_at = source.updated_at
+    ) = cardinality($6::uuid[])
+    """
+    result = await db.execute(
+        query,
+        embeddings_model,
+        answer_key,
+        prompt,
+        embedding,
+        answer,
+        [question_id for question_id, _ in sources],
+        [updated_at for _, updated_at in sources],
+    )
+
+    return result == "INSERT 0 1"
+
+
+async def delete_expired_answers_query(db: Database, ttl: float) -> None:
+    query = (
+        "DELETE FROM answer_cache WHERE created_at <= NOW() - make_interval(secs => $1)"
+    )
+    await db.execute(query, ttl)
+
+
+async def delete_excess_answers_query(db: Database, max_entries: int) -> None:
+    """
+    Keep only the newest `max_entries` cached answers.
+    """
+    query = """
+    DELETE FROM answer_cache
+    WHERE id IN (
+        SELECT id FROM answer_cache ORDER BY created_at DESC OFFSET $1
+    )
+    """
+    await db.execute(query, max_entries)
@@ -1,9 +1,20 @@
 import logging
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 
 import anyio
 from asyncpg import Pool, Record, create_pool
+from asyncpg.pool import PoolConnectionProxy
 
 from app.constants.db import SCHEMA_PATH
+from app.utils.database import register_vector_codecs
+from app.utils.metrics import (
+    DB_POOL_ACQUIRE_SECONDS,
+    DB_POOL_CONNECTIONS,
+    DB_POOL_CONNECTIONS_IN_USE,
+    DB_POOL_MAX_CONNECTIONS,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -38,12 +49,15 @@ class Database:
                     dsn=self.dsn,
                     min_size=self.min_size,
                     max_size=self.max_size,
+                    init=register_vector_codecs,
                 )
             except Exception:
                 logger.exception("Failed to initialize database pool")
                 raise
             else:
                 logger.info("Database pool initialized successfully")
+                DB_POOL_MAX_CONNECTIONS.set(self.max_size)
+                self._update_pool_metrics(self.pool)
         else:
             logger.debug("Database pool already initialized")
 
@@ -55,6 +69,8 @@ class Database:
             logger.info("Closing database connection pool")
             await self.pool.close()
             self.pool = None
+            DB_POOL_CONNECTIONS.set(0)
+            DB_POOL_CONNECTIONS_IN_USE.set(0)
             logger.info("Database pool closed")
 
     async def _ensure_pool(self) -> Pool:
@@ -72,20 +88,40 @@ class Database:
 
         return self.pool
 
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[PoolConnectionProxy]:
+        """
+        Acquire a pooled connection, recording the wait and the pool usage.
+        """
+        pool = await self._ensure_pool()
+
+        started = time.perf_counter()
+        try:
+            async with pool.acquire() as conn:
+                DB_POOL_ACQUIRE_SECONDS.observe(time.perf_counter() - started)
+                self._update_pool_metrics(pool)
+                yield conn
+        finally:
+            self._update_pool_metrics(pool)
+
+    @staticmethod
+    def _update_pool_metrics(pool: Pool) -> None:
+        size = pool.get_size()
+        DB_POOL_CONNECTIONS.set(size)
+        DB_POOL_CONNECTIONS_IN_USE.set(size - pool.get_idle_size())
+
     async def fetch(self, query: str, *args: object) -> list[Record]:
         """
         Run a SELECT query and return all rows.
         """
-        pool = await self._ensure_pool()
-        async with pool.acquire() as conn:
+        async with self.acquire() as conn:
             return await conn.fetch(query, *args)
 
     async def fetchrow(self, query: str, *args: object) -> Record | None:
         """
         Run a SELECT query and return the first row (or None).
         """
-        pool = await self._ensure_pool()
-        async with pool.acquire() as conn:
+        async with self.acquire() as conn:
             return await conn.fetchrow(query, *args)
 
     async def fetchval(
@@ -97,18 +133,23 @@ class Database:
         """
         Run a query and return a single value from the first row.
         """
-        pool = await self._ensure_pool()
-        async with pool.acquire() as conn:
+        async with self.acquire() as conn:
             return await conn.fetchval(query, *args, column=column)
 
     async def execute(self, query: str, *args: object) -> str:
         """
         Run an INSERT/UPDATE/DELETE/DDL command.
         """
-        pool = await self._ensure_pool()
-        async with pool.acquire() as conn:
+        async with self.acquire() as conn:
             return await conn.execute(query, *args)
 
+    async def executemany(self, query: str, args: list[tuple]) -> None:
+        """
+        Run a command once per argument tuple, pipelined in a single round trip.
+        """
+        async with self.acquire() as conn:
+            await conn.executemany(query, args)
+
     async def run_migrations(self) -> None:
         """
         Read the SQL in SCHEMA_PATH and execute it as one big transaction.
@@ -0,0 +1,50 @@
+from app.data.connection import Database
+
+
+async def get_cached_embeddings_query(
+    db: Database,
+    model: str,
+    kind: str,
+    text_hashes: list[str],
+) -> dict[str, bytes]:
+    """
+    Return the cached embeddings by text hash, marking them as used.
+    """
+    query = """
+    UPDATE embedding_cache
+    SET last_used_at = NOW()
+    WHERE model = $1 AND kind = $2 AND text_hash = ANY($3::text[])
+    RETURNING text_hash, embedding
+    """
+    result = await db.fetch(query, model, kind, text_hashes)
+
+    return {str(row["text_hash"]): bytes(row["embedding"]) for row in result}
+
+
+async def store_cached_embeddings_query(
+    db: Database,
+    model: str,
+    kind: str,
+    items: list[tuple[str, bytes]],
+) -> None:
+    query = """
+    INSERT INTO embedding_cache (model, kind, text_hash, embedding)
+    SELECT $1, $2, item.text_hash, item.embedding
+    FROM unnest($3::text[], $4::bytea[]) AS item(text_hash, embedding)
+    ON CONFLICT DO NOTHING
+    """
+    await db.execute(
+        query,
+        model,
+        kind,
+        [text_hash for text_hash, _ in items],
+        [embedding for _, embedding in items],
+    )
+
+
+async def delete_expired_embeddings_query(db: Database, ttl: float) -> None:
+    query = (
+        "DELETE FROM embedding_cache "
+        "WHERE last_used_at <= NOW() - make_interval(secs => $1)"
+    )
+    await db.execute(query, ttl)
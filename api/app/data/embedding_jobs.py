@@ -0,0 +1,146 @@
+from datetime import datetime
+from uuid import UUID
+
+from asyncpg import Record
+
+from app.data.connection import Database
+
+
+async def enqueue_embedding_jobs_query(
+    db: Database,
+    question_ids: list[UUID],
+    delay: float,
+) -> None:
+    """
+    Queue the questions for re-embedding after `delay` seconds. A question
+    that is already queued is pushed back instead, so bursts of edits to the
+    same question are coalesced into one job.
+    """
+    query = """
+    INSERT INTO embedding_job (question_id, enqueued_at, available_at)
+    SELECT id, NOW(), NOW() + make_interval(secs => $2)
+    FROM unnest($1::uuid[]) AS id
+    ON CONFLICT (question_id) DO UPDATE
+    SET enqueued_at = EXCLUDED.enqueued_at,
+        available_at = EXCLUDED.available_at,
+        locked_until = NULL,
+        attempts = 0,
+        last_error = NULL
+    """
+    await db.execute(query, question_ids, delay)
+
+
+async def claim_embedding_jobs_query(
+    db: Database,
+    limit: int,
+    lease: float,
+) -> list[Record]:
+    """
+    Lease up to `limit` due jobs for `lease` seconds. Jobs leased by another
+    worker are skipped; a lease that expires makes the job claimable again.
+    """
+    query = """
+    WITH due AS (
+        SELECT question_id
+        FROM embedding_job
+        WHERE available_at <= NOW()
+            AND (locked_until IS NULL OR locked_until < NOW())
+        ORDER BY available_at
+        LIMIT $1
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE embedding_job AS job
+    SET locked_until = NOW() + make_interval(secs => $2),
+        attempts = job.attempts + 1
+    FROM due
+    WHERE job.question_id = due.question_id
+    RETURNING job.question_id, job.enqueued_at, job.attempts
+    """
+
+    return await db.fetch(query, limit, lease)
+
+
+async def complete_embedding_jobs_query(
+    db: Database,
+    jobs: list[tuple[UUID, datetime]],
+) -> None:
+    """
+    Remove finished (question_id, enqueued_at) jobs. Jobs re-enqueued while
+    they were being processed have a newer enqueued_at and are kept.
+    """
+    query = """
+    DELETE FROM embedding_job AS job
+    USING unnest($1::uuid[], $2::timestamp[]) AS done(question_id, enqueued_at)
+    WHERE job.question_id = done.question_id
+        AND job.enqueued_at = done.enqueued_at
+    """
+    await db.execute(
+        query,
+        [question_id for question_id, _ in jobs],
+        [enqueued_at for _, enqueued_at in jobs],
+    )
+
+
+async def retry_embedding_jobs_query(
+    db: Database,
+    jobs: list[tuple[UUID, datetime]],
+    delay: float,
+    error: str,
+) -> None:
+    """
+    Release failed (question_id, enqueued_at) jobs so they are retried after
+    `delay` seconds.
+    """
+    query = """
+    UPDATE embedding_job AS job
+    SET available_at = NOW() + make_interval(secs => $3),
+        locked_until = NULL,
+        last_error = $4
+    FROM unnest($1::uuid[], $2::timestamp[]) AS failed(question_id, enqueued_at)
+    WHERE job.question_id = failed.question_id
+        AND job.enqueued_at = failed.enqueued_at
+    """
+    await db.execute(
+        query,
+        [question_id for question_id, _ in jobs],
+        [enqueued_at for _, enqueued_at in jobs],
+        delay,
+        error,
+    )
+
+
+async def get_next_embedding_job_delay_query(db: Database) -> float | None:
+    """
+    Return the seconds until the next queued job becomes due, or None if the
+    queue is empty.
+    """
+    query = """
+    SELECT EXTRACT(EPOCH FROM MIN(GREATEST(available_at, COALESCE(locked_until, available_at))) - NOW())
+    FROM embedding_job
+    """
+    result = await db.fetchval(query)
+
+    return float(result) if result is not None else None  # type: ignore[arg-type]
+
+
+async def get_embedding_job_counts_query(db: Database) -> dict[str, int]:
+    """
+    Return the number of queued, due, leased and failing jobs.
+    """
+    query = """
+    SELECT
+        COUNT(*) AS queued,
+        COUNT(*) FILTER (
+            WHERE available_at <= NOW()
+                AND (locked_until IS NULL OR locked_until < NOW())
+        ) AS due,
+        COUNT(*) FILTER (WHERE locked_until >= NOW()) AS leased,
+        COUNT(*) FILTER (WHERE last_error IS NOT NULL) AS failing
+    FROM embedding_job
+    """
+    result = await db.fetchrow(query)
+
+    if result is None:
+        return {"queued": 0, "due": 0, "leased": 0, "failing": 0}
+
+    return {key: int(value) for key, value in result.items()}
@@ -0,0 +1,289 @@
+import json
+from uuid import UUID
+
+from asyncpg import Record
+
+from app.data.connection import Database
+from app.data.questions import unfilled_embedding_condition
+from app.llms.models import MODEL_EMBEDDINGS_COLUMNS, Model
+from app.schemas.fill_jobs import FillJobSchema
+
+FILL_JOB_COLUMNS = (
+    "id, status, models, questions, all_questions, total, processed, failed, "
+    "error, created_at, updated_at, finished_at"
+)
+
+
+def row_to_fill_job(row: Record) -> FillJobSchema:
+    """
+    Map a fill job row (selected with `FILL_JOB_COLUMNS`) to its schema.
+    """
+    return FillJobSchema(
+        id=row["id"],
+        status=row["status"],
+        models=list(row["models"]),
+        questions=list(row["questions"]) if row["questions"] is not None else None,
+        all_questions=row["all_questions"],
+        total=row["total"],
+        processed=row["processed"],
+        failed=row["failed"],
+        error=row["error"],
+        created_at=row["created_at"],
+        updated_at=row["updated_at"],
+        finished_at=row["finished_at"],
+    )
+
+
+def fill_rows_condition(
+    model: Model,
+    *,
+    questions: list[str] | None,
+    all_questions: bool,
+) -> str:
+    """
+    Return the SQL condition selecting the questions a fill job embeds for the
+    model. Explicitly named questions are re-embedded like `all_questions`;
+    the names themselves are bound as $1.
+    """
+    condition = "TRUE"
+    if not all_questions and not questions:
+        condition = unfilled_embedding_condition(MODEL_EMBEDDINGS_COLUMNS[model])
+
+    return f"($1::text[] IS NULL OR name = ANY($1::text[])) AND {condition}"
+
+
+async def count_fill_rows_query(
+    db: Database,
+    model: Model,
+    *,
+    questions: list[str] | None,
+    all_questions: bool,
+) -> int:
+    condition = fill_rows_condition(
+        model,
+        questions=questions,
+        all_questions=all_questions,
+    )
+    query = f"SELECT COUNT(*) FROM question WHERE {condition}"  # noqa: S608
+    result = await db.fetchval(query, questions)
+
+    return int(result) if isinstance(result, int) else 0
+
+
+async def get_fill_rows_query(
+    db: Database,
+    model: Model,
+    *,
+    questions: list[str] | None,
+    all_questions: bool,
+    after: UUID | None,
+    limit: int,
+) -> list[Record]:
+    """
+    Return the next (id, name, content, content_hash) rows to embed, in id
+    order, starting after the given question id.
+    """
+    condition = fill_rows_condition(
+        model,
+        questions=questions,
+        all_questions=all_questions,
+    )
+    query = f"""
+    SELECT id, name, content, content_hash
+    FROM question
+    WHERE {condition} AND ($2::uuid IS NULL OR id > $2)
+    ORDER BY id
+    LIMIT $3
+    """  # noqa: S608
+
+    return await db.fetch(query, questions, after, limit)
+
+
+async def create_fill_job_query(
+    db: Database,
+    models: list[Model],
+    *,
+    questions: list[str] | None,
+    all_questions: bool,
+    total: int,
+) -> FillJobSchema | None:
+    query = f"""
+    INSERT INTO embedding_fill_job (models, questions, all_questions, total)
+    VALUES ($1::text[], $2::text[], $3, $4)
+    RETURNING {FILL_JOB_COLUMNS}
+    """  # noqa: S608
+    result = await db.fetchrow(
+        query,
+        [model.value for model in models],
+        questions,
+        all_questions,
+        total,
+    )
+
+    if not result:
+        return None
+
+    return row_to_fill_job(result)
+
+
+async def get_fill_job_query(db: Database, job_id: UUID) -> FillJobSchema | None:
+    query = f"SELECT {FILL_JOB_COLUMNS} FROM embedding_fill_job WHERE id = $1"  # noqa: S608
+    result = await db.fetchrow(query, job_id)
+
+    if not result:
+        return None
+
+    return row_to_fill_job(result)
+
+
+async def claim_fill_job_query(db: Database, lease: float) -> Record | None:
+    """
+    Lease the oldest pending job, or a running job whose worker stopped
+    renewing its lease, and mark it as running.
+    """
+    query = """
+    WITH next_job AS (
+        SELECT id
+        FROM embedding_fill_job
+        WHERE status = 'pending'
+            OR (status = 'running' AND (locked_until IS NULL OR locked_until < NOW()))
+        ORDER BY created_at
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE embedding_fill_job AS job
+    SET status = 'running',
+        locked_until = NOW() + make_interval(secs => $1),
+        updated_at = NOW()
+    FROM next_job
+    WHERE job.id = next_job.id
+    RETURNING job.*
+    """
+
+    return await db.fetchrow(query, lease)
+
+
+async def renew_fill_job_lease_query(
+    db: Database,
+    job_id: UUID,
+    lease: float,
+) -> str | None:
+    """
+    Extend a running job's lease. Returns the job's status, so cancellation is
+    noticed even while a batch is in progress.
+    """
+    query = """
+    UPDATE embedding_fill_job
+    SET locked_until = NOW() + make_interval(secs => $2)
+    WHERE id = $1 AND status = 'running'
+    RETURNING status
+    """
+    result = await db.fetchval(query, job_id, lease)
+
+    return str(result) if result is not None else None
+
+
+async def record_fill_batch_query(
+    db: Database,
+    job_id: UUID,
+    model: Model,
+    cursor: UUID,
+    events: list[dict[str, str]],
+    *,
+    failed: int,
+    lease: float,
+) -> str | None:
+    """
+    Atomically store a batch's progress events, advance the model's cursor and
+    renew the job's lease. Events are numbered after the job's processed
+    count. Returns the job's status, so cancellation is noticed between batches.
+    """
+    query = """
+    WITH job AS (
+        UPDATE embedding_fill_job
+        SET processed = processed + cardinality($2::jsonb[]),
+            failed = failed + $3,
+            cursors = cursors || jsonb_build_object($4::text, $5::text),
+            locked_until = NOW() + make_interval(secs => $6),
+            updated_at = NOW()
+        WHERE id = $1
+        RETURNING processed, total, status
+    ),
+    inserted AS (
+        INSERT INTO embedding_fill_event (job_id, index, payload)
+        SELECT
+            $1,
+            job.processed - cardinality($2::jsonb[]) + event.ordinality,
+            event.payload || jsonb_build_object(
+                'index', job.processed - cardinality($2::jsonb[]) + event.ordinality,
+                'total', job.total
+            )
+        FROM job, unnest($2::jsonb[]) WITH ORDINALITY AS event(payload, ordinality)
+    )
+    SELECT status FROM job
+    """
+    result = await db.fetchval(
+        query,
+        job_id,
+        [json.dumps(event, ensure_ascii=False) for event in events],
+        failed,
+        model.value,
+        str(cursor),
+        lease,
+    )
+
+    return str(result) if result is not None else None
+
+
+async def finish_fill_job_query(
+    db: Database,
+    job_id: UUID,
+    status: str,
+    error: str | None = None,
+) -> None:
+    """
+    Mark a running job as finished. Jobs cancelled in the meantime keep
+    their cancelled status.
+    """
+    query = """
+    UPDATE embedding_fill_job
+    SET status = $2, error = $3, locked_until = NULL, finished_at = NOW(), updated_at = NOW()
+    WHERE id = $1 AND status = 'running'
+    """
+    await db.execute(query, job_id, status, error)
+
+
+async def cancel_fill_job_query(db: Database, job_id: UUID) -> FillJobSchema | None:
+    """
+    Cancel a pending or running job. Returns None if there is no such job.
+    """
+    query = f"""
+    UPDATE embedding_fill_job
+    SET status = 'cancelled', locked_until = NULL, finished_at = NOW(), updated_at = NOW()
+    WHERE id = $1 AND status IN ('pending', 'running')
+    RETURNING {FILL_JOB_COLUMNS}
+    """  # noqa: S608
+    result = await db.fetchrow(query, job_id)
+
+    if not result:
+        return None
+
+    return row_to_fill_job(result)
+
+
+async def get_fill_job_events_query(
+    db: Database,
+    job_id: UUID,
+    *,
+    after: int,
+    limit: int = 500,
+) -> list[Record]:
+    query = """
+    SELECT index, payload
+    FROM embedding_fill_event
+    WHERE job_id = $1 AND index > $2
+    ORDER BY index
+    LIMIT $3
+    """
+
+    return await db.fetch(query, job_id, after, limit)
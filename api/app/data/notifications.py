@@ -0,0 +1,161 @@
+import asyncio
+import contextlib
+import logging
+from collections import defaultdict
+from collections.abc import Callable
+
+from asyncpg import Connection, connect
+
+logger = logging.getLogger(__name__)
+
+type NotificationHandler = Callable[[str], None]
+type ConnectHandler = Callable[[], None]
+
+
+class NotificationListener:
+    """
+    Keep a dedicated connection LISTENing on Postgres channels and dispatch
+    each NOTIFY payload to the subscribed handlers. The connection is checked
+    periodically and re-established when lost. Notifications sent while not
+    listening are missed, so connect handlers are called once LISTEN is in
+    place, on the first connection as well as on reconnects, and subscribers
+    can resynchronize with whatever changed before.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        *,
+        keepalive_interval: float = 30.0,
+        reconnect_delay: float = 5.0,
+    ) -> None:
+        """
+        Create a listener; subscribe handlers, then call `start`.
+        """
+        self.dsn: str = dsn
+        self.keepalive_interval: float = keepalive_interval
+        self.reconnect_delay: float = reconnect_delay
+        self.handlers: dict[str, list[NotificationHandler]] = defaultdict(list)
+        self.connect_handlers: list[ConnectHandler] = []
+        self.conn: Connection | None = None
+        self.task: asyncio.Task | None = None
+        self.terminated = asyncio.Event()
+
+    def subscribe(self, channel: str, handler: NotificationHandler) -> None:
+        """
+        Call `handler` with the payload of every notification on the channel.
+        Subscribe before `start`.
+        """
+        self.handlers[channel].append(handler)
+
+    def on_connect(self, handler: ConnectHandler) -> None:
+        """
+        Call `handler` whenever the connection is (re-)established and
+        listening.
+        """
+        self.connect_handlers.append(handler)
+
+    async def start(self) -> None:
+        """
+        Connect and start listening. If the first connection fails, it is
+        retried in the background.
+        """
+        if self.task is not None:
+            return
+
+        try:
+            await self.connect()
+        except Exception:
+            logger.exception("Failed to connect notification listener")
+        else:
+            self.resync()
+
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """
+        Stop listening and close the connection.
+        """
+        if self.task is not None:
+            self.task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.task
+            self.task = None
+
+        await self.close()
+
+    async def connect(self) -> None:
+        """
+        Open the connection and LISTEN on every subscribed channel.
+        """
+        self.terminated.clear()
+        conn = await connect(dsn=self.dsn)
+        conn.add_termination_listener(lambda _: self.terminated.set())
+
+        for channel in self.handlers:
+            await conn.add_listener(channel, self.dispatch)
+
+        self.conn = conn
+        logger.info("Listening on channels: %s", ", ".join(self.handlers))
+
+    async def close(self) -> None:
+        if self.conn is not None and not self.conn.is_closed():
+            with contextlib.suppress(Exception):
+                await self.conn.close()
+        self.conn = None
+
+    def dispatch(
+        self,
+        conn: object,
+        pid: int,
+        channel: str,
+        payload: object,
+    ) -> None:
+        for handler in self.handlers.get(channel, []):
+            try:
+                handler(str(payload))
+            except Exception:
+                logger.exception("Notification handler failed on %s", channel)
+
+    def resync(self) -> None:
+        for handler in self.connect_handlers:
+            try:
+                handler()
+            except Exception:
+                logger.exception("Connect handler failed")
+
+    async def run(self) -> None:
+        """
+        Watch the connection and reconnect when it is lost, until cancelled.
+        """
+        while True:
+            if self.conn is None or self.conn.is_closed():
+                await self.close()
+                try:
+                    await self.connect()
+                except Exception:
+                    logger.warning(
+                        "Notification listener reconnect failed, retrying in %.0fs",
+                        self.reconnect_delay,
+                    )
+                    await asyncio.sleep(self.reconnect_delay)
+                    continue
+
+                self.resync()
+
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(
+                    self.terminated.wait(),
+                    timeout=self.keepalive_interval,
+                )
+
+            if self.terminated.is_set() or self.conn is None:
+                logger.warning("Notification listener connection lost")
+                await self.close()
+                continue
+
+            try:
+                await self.conn.execute("SELECT 1")
+            except Exception:
+                logger.warning("Notification listener keepalive failed")
+                await self.close()
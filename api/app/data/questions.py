@@ -1,35 +1,157 @@
 # mypy: disable-error-code="arg-type"
 
 import json
+from uuid import UUID
+
+import numpy as np
+from asyncpg import Record
 
 from app.data.connection import Database
 from app.llms.models import HALFVEC_EMBEDDING_MODELS, MODEL_EMBEDDINGS_COLUMNS, Model
 from app.schemas.questions import (
     CreateQuestionSchema,
     QuestionSchema,
+    UnfilledQuestionSchema,
     UpdateQuestionSchema,
 )
-from app.utils.database import embedding_to_pgvector
+from app.utils.database import Vector
+
+# Columns returned for a question; the embedding vectors are large and only
+# selected when explicitly requested
+QUESTION_COLUMNS = "id, name, content, user_id, links, created_at, updated_at"
+EMBEDDING_COLUMNS: tuple[str, ...] = tuple(
+    sorted(set(MODEL_EMBEDDINGS_COLUMNS.values())),
+)
+
+
+def question_columns(*, include_embeddings: bool = False) -> str:
+    """
+    Return the column projection for question queries.
+    """
+    if not include_embeddings:
+        return QUESTION_COLUMNS
 
+    return ", ".join([QUESTION_COLUMNS, *EMBEDDING_COLUMNS])
 
-async def get_questions_query(db: Database) -> list[QuestionSchema]:
-    query = "SELECT * FROM question ORDER BY name ASC"
+
+def unfilled_embedding_condition(embedding_column: str) -> str:
+    """
+    Return the SQL condition matching questions whose embedding for the column
+    is missing or was computed from a different version of their text.
+    """
+    return (
+        f"({embedding_column} IS NULL "
+        f"OR embedding_hashes->>'{embedding_column}' IS DISTINCT FROM content_hash)"
+    )
+
+
+def parse_vector(value: object) -> list[float]:
+    """
+    Convert a pgvector value as returned by asyncpg to a list of floats.
+    """
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+
+    if isinstance(value, str):
+        return json.loads(value)
+
+    return list(value)  # type: ignore[call-overload]
+
+
+def row_to_question(
+    row: Record,
+    *,
+    include_embeddings: bool = False,
+) -> QuestionSchema:
+    """
+    Map a question row (selected with `question_columns`) to its schema.
+    """
+    embeddings: dict[str, list[float]] | None = None
+    if include_embeddings:
+        embeddings = {
+            column: parse_vector(row[column])
+            for column in EMBEDDING_COLUMNS
+            if row[column] is not None
+        }
+
+    return QuestionSchema(
+        id=row["id"],
+        name=row["name"],
+        content=row["content"],
+        user_id=row["user_id"],
+        links=json.loads(row["links"]) if row["links"] else {},
+        created_at=row["created_at"],
+        updated_at=row["updated_at"],
+        distance=row.get("distance", None),
+        embeddings=embeddings,
+    )
+
+
+async def get_questions_query(
+    db: Database,
+    *,
+    include_embeddings: bool = False,
+) -> list[QuestionSchema]:
+    columns = question_columns(include_embeddings=include_embeddings)
+    query = f"SELECT {columns} FROM question ORDER BY name ASC"  # noqa: S608
     result = await db.fetch(query)
 
     return [
-        QuestionSchema(
-            id=row["id"],
-            name=row["name"],
-            content=row["content"],
-            user_id=row["user_id"],
-            links=json.loads(row["links"]),
-            created_at=row["created_at"],
-            updated_at=row["updated_at"],
-        )
-        for row in result
+        row_to_question(row, include_embeddings=include_embeddings) for row in result
     ]
 
 
+async def get_question_rows_query(
+    db: Database,
+    question_ids: list[UUID] | None = None,
+    *,
+    include_embeddings: bool = False,
+) -> list[Record]:
+    """
+    Return raw question rows, optionally limited to the given questions.
+    """
+    columns = question_columns(include_embeddings=include_embeddings)
+    query = f"""
+    SELECT {columns}
+    FROM question
+    WHERE $1::uuid[] IS NULL OR id = ANY($1::uuid[])
+    """  # noqa: S608
+
+    return await db.fetch(query, question_ids)
+
+
+async def get_embedding_vectors_query(db: Database, column: str) -> list[Record]:
+    """
+    Return the (id, vector) rows of every question with an embedding in the
+    column, in id order.
+    """
+    query = f"""
+    SELECT id, {column} AS embedding
+    FROM question
+    WHERE {column} IS NOT NULL
+    ORDER BY id
+    """  # noqa: S608
+
+    return await db.fetch(query)
+
+
+async def get_embeddings_fingerprint_query(db: Database) -> str:
+    """
+    Return a hash that changes whenever a question is added or removed or one
+    of its embeddings is written, even for unchanged text.
+    """
+    query = """
+    SELECT md5(COALESCE(string_agg(
+        id::text || embedding_hashes::text || COALESCE(embeddings_updated_at::text, ''),
+        ',' ORDER BY id
+    ), ''))
+    FROM question
+    """
+    result = await db.fetchval(query)
+
+    return str(result)
+
+
 async def get_question_names_query(db: Database) -> list[str]:
     query = "SELECT name FROM question ORDER BY name ASC"
     result = await db.fetch(query)
@@ -37,55 +159,95 @@ async def get_question_names_query(db: Database) -> list[str]:
     return [str(row["name"]) for row in result]
 
 
-async def get_question_by_name_query(db: Database, name: str) -> QuestionSchema | None:
-    query = "SELECT * FROM question WHERE name = $1"
+async def get_question_by_name_query(
+    db: Database,
+    name: str,
+    *,
+    include_embeddings: bool = False,
+) -> QuestionSchema | None:
+    columns = question_columns(include_embeddings=include_embeddings)
+    query = f"SELECT {columns} FROM question WHERE name = $1"  # noqa: S608
     result = await db.fetchrow(query, name)
 
     if not result:
         return None
 
-    return QuestionSchema(
-        id=result["id"],
-        name=result["name"],
-        content=result["content"],
-        user_id=result["user_id"],
-        links=json.loads(result["links"]),
-        created_at=result["created_at"],
-        updated_at=result["updated_at"],
-    )
+    return row_to_question(result, include_embeddings=include_embeddings)
 
 
 async def get_questions_without_embeddings_query(
     db: Database,
     model: Model,
-) -> list[QuestionSchema]:
+) -> list[UnfilledQuestionSchema]:
     embedding_column = MODEL_EMBEDDINGS_COLUMNS[model]
-    query = f"SELECT * FROM question WHERE {embedding_column} IS NULL ORDER BY name ASC"  # noqa: S608
+    query = f"""
+    SELECT {QUESTION_COLUMNS},
+        CASE WHEN {embedding_column} IS NULL THEN 'missing' ELSE 'stale' END AS reason
+    FROM question
+    WHERE {unfilled_embedding_condition(embedding_column)}
+    ORDER BY name ASC
+    """  # noqa: S608
     result = await db.fetch(query)
 
     return [
-        QuestionSchema(
-            id=row["id"],
-            name=row["name"],
-            content=row["content"],
-            user_id=row["user_id"],
-            links=json.loads(row["links"]),
-            created_at=row["created_at"],
-            updated_at=row["updated_at"],
+        UnfilledQuestionSchema(
+            **row_to_question(row).model_dump(),
+            reason=row["reason"],
         )
         for row in result
     ]
 
 
+async def get_unfilled_question_rows_query(
+    db: Database,
+    model: Model,
+    question_ids: list[UUID] | None = None,
+) -> list[Record]:
+    """
+    Return (id, name, content, content_hash) rows whose embedding for the
+    model is missing or stale, optionally limited to the given questions.
+    """
+    embedding_column = MODEL_EMBEDDINGS_COLUMNS[model]
+    query = f"""
+    SELECT id, name, content, content_hash
+    FROM question
+    WHERE {unfilled_embedding_condition(embedding_column)}
+        AND ($1::uuid[] IS NULL OR id = ANY($1::uuid[]))
+    """  # noqa: S608
+
+    return await db.fetch(query, question_ids)
+
+
+async def update_question_embeddings_query(
+    db: Database,
+    model: Model,
+    embeddings: list[tuple[UUID, Vector, str]],
+) -> None:
+    """
+    Store (id, embedding, content_hash) triples, recording for each question
+    the hash of the text its embedding was computed from and when it was
+    written.
+    """
+    embedding_column = MODEL_EMBEDDINGS_COLUMNS[model]
+    query = f"""
+    UPDATE question
+    SET {embedding_column} = $2,
+        embedding_hashes = embedding_hashes || jsonb_build_object('{embedding_column}', $3::text),
+        embeddings_updated_at = NOW()
+    WHERE id = $1
+    """  # noqa: S608
+    await db.executemany(query, embeddings)
+
+
 async def create_question_query(
     db: Database,
     question: CreateQuestionSchema,
 ) -> QuestionSchema | None:
-    query = """
+    query = f"""
     INSERT INTO question (name, content, user_id, links)
     VALUES ($1, $2, $3, $4::jsonb)
-    RETURNING *
-    """
+    RETURNING {QUESTION_COLUMNS}
+    """  # noqa: S608
     result = await db.fetchrow(
         query,
         question.name,
@@ -97,15 +259,7 @@ async def create_question_query(
     if not result:
         return None
 
-    return QuestionSchema(
-        id=result["id"],
-        name=result["name"],
-        content=result["content"],
-        user_id=result["user_id"],
-        links=json.loads(result["links"]),
-        created_at=result["created_at"],
-        updated_at=result["updated_at"],
-    )
+    return row_to_question(result)
 
 
 async def update_question_query(
@@ -127,22 +281,14 @@ async def update_question_query(
         update_values.append(value)
 
     query += "updated_at = NOW()"
-    query += f" WHERE name = ${len(updates) + 1} RETURNING *"
+    query += f" WHERE name = ${len(updates) + 1} RETURNING {QUESTION_COLUMNS}"
 
     result = await db.fetchrow(query, *update_values, name)
 
     if not result:
         return None
 
-    return QuestionSchema(
-        id=result["id"],
-        name=result["name"],
-        content=result["content"],
-        user_id=result["user_id"],
-        links=json.loads(result["links"]),
-        created_at=result["created_at"],
-        updated_at=result["updated_at"],
-    )
+    return row_to_question(result)
 
 
 async def delete_question_query(db: Database, name: str) -> None:
@@ -151,26 +297,20 @@ async def delete_question_query(db: Database, name: str) -> None:
 
 
 async def get_nth_question_query(db: Database, n: int) -> QuestionSchema | None:
-    query = "SELECT * FROM question OFFSET $1 LIMIT 1 ORDER BY name ASC"
+    query = (
+        f"SELECT {QUESTION_COLUMNS} FROM question ORDER BY name ASC LIMIT 1 OFFSET $1"  # noqa: S608
+    )
     result = await db.fetchrow(query, n)
 
     if result is None:
         return None
 
-    return QuestionSchema(
-        id=result["id"],
-        name=result["name"],
-        content=result["content"],
-        user_id=result["user_id"],
-        links=json.loads(result["links"]),
-        created_at=result["created_at"],
-        updated_at=result["updated_at"],
-    )
+    return row_to_question(result)
 
 
 async def get_closest_questions(
     db: Database,
-    embedded_query: list[float],
+    embedded_query: Vector,
     model: Model,
     limit: int = 8,
     threshold: float = 0.5,
@@ -186,7 +326,7 @@ async def get_closest_questions(
         param_expr = "$1"
 
     sql = f"""
-    SELECT *, {col_expr} <=> {param_expr} AS distance
+    SELECT {QUESTION_COLUMNS}, {col_expr} <=> {param_expr} AS distance
     FROM question
     WHERE {embedding_column} IS NOT NULL AND {col_expr} <=> {param_expr} < $3
     ORDER BY distance
@@ -195,21 +335,32 @@ async def get_closest_questions(
 
     result = await db.fetch(
         sql,
-        embedding_to_pgvector(embedded_query),
+        embedded_query,
         limit,
         threshold,
     )
 
-    return [
-        QuestionSchema(
-            id=row["id"],
-            name=row["name"],
-            content=row["content"],
-            user_id=row["user_id"],
-            links=json.loads(row["links"]) if row["links"] else {},
-            created_at=row["created_at"],
-            updated_at=row["updated_at"],
-            distance=row.get("distance", None),
-        )
-        for row in result
-    ]
+    return [row_to_question(row) for row in result]
+
+
+async def get_lexical_matches_query(
+    db: Database,
+    query: str,
+    limit: int = 8,
+) -> list[QuestionSchema]:
+    """
+    Return the questions sharing the most terms with the query, best first.
+    Any query term may match; names weigh more than contents.
+    """
+    sql = f"""
+    SELECT {QUESTION_COLUMNS}
+    FROM question,
+        replace(plainto_tsquery('simple', $1)::text, '&', '|')::tsquery AS terms
+    WHERE search_vector @@ terms
+    ORDER BY ts_rank_cd(search_vector, terms, 32) DESC
+    LIMIT $2
+    """  # noqa: S608
+
+    result = await db.fetch(sql, query, limit)
+
+    return [row_to_question(row) for row in result]
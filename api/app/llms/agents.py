@@ -6,6 +6,10 @@ from fastapi.responses import StreamingResponse
 from langchain_core.messages import AIMessageChunk
 from langgraph.graph.state import CompiledStateGraph
 
+from app.constants.defaults import STREAM_ERROR_MESSAGE
+from app.utils.metrics import PROVIDER_ERRORS
+from app.utils.rate_limit import ProviderRateLimiter
+
 logger = logging.getLogger(__name__)
 
 
@@ -29,8 +33,11 @@ def stream_sync_gen_as_sse(gen: Generator[str]) -> StreamingResponse:
 async def create_agent_token_generator(
     agent: CompiledStateGraph,
     messages: list[dict[str, str]],
+    *,
+    provider: str,
+    rate_limiter: ProviderRateLimiter | None = None,
 ) -> AsyncGenerator[str]:
-    """Generate SSE tokens from an agent stream."""
+    """Generate SSE tokens from an agent stream, reporting errors to the metrics and the rate limiter."""
     try:
         async for message, _metadata in agent.astream(
             {"messages": messages},
@@ -52,6 +59,9 @@ async def create_agent_token_generator(
             preserved = text.replace("\n", "\\n")
             yield f"data: {preserved}\n\n"
 
-    except Exception:
+    except Exception as e:
         logger.exception("Agent error occurred during streaming")
-        yield "data: An error occurred while processing your request. Please try again.\n\n"
+        PROVIDER_ERRORS.labels(provider=provider, operation="stream").inc()
+        if rate_limiter is not None:
+            rate_limiter.observe_error(e)
+        yield f"data: {STREAM_ERROR_MESSAGE}\n\n"
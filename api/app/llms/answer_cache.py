@@ -0,0 +1,221 @@
+import asyncio
+import hashlib
+import json
+import logging
+from collections.abc import AsyncGenerator, Coroutine
+from typing import Any
+
+from asyncpg import Record
+from fastapi.responses import StreamingResponse
+
+from app.constants.defaults import STREAM_ERROR_MESSAGE
+from app.data.answer_cache import (
+    delete_excess_answers_query,
+    delete_expired_answers_query,
+    get_cached_answer_query,
+    store_cached_answer_query,
+)
+from app.data.connection import Database
+from app.llms.embeddings import generate_embeddings
+from app.llms.prompts import DEFAULT_AGENT_SYSTEM_PROMPT
+from app.schemas.chat import ChatSchema
+from app.schemas.questions import QuestionSchema
+from app.utils.metrics import CACHE_LOOKUPS
+from app.utils.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+settings = Settings()
+
+# Fields that don't affect the answer, or are keyed on separately
+_UNKEYED_FIELDS = {"prompt", "embeddings_model", "use_cache", "include_timings"}
+
+
+def get_answer_key(payload: ChatSchema) -> str:
+    """
+    Hash the settings an answer depends on besides the question, so answers
+    are only reused for the same model, prompts, sampling and retrieval
+    options.
+    """
+    key = {
+        **payload.model_dump(mode="json", exclude=_UNKEYED_FIELDS),
+        "system_prompt": payload.system_prompt or DEFAULT_AGENT_SYSTEM_PROMPT,
+    }
+
+    return hashlib.sha256(
+        json.dumps(key, sort_keys=True).encode("utf-8"),
+    ).hexdigest()
+
+
+class AnswerCache:
+    """
+    Semantic cache of generated answers, keyed on the embedding of the user's
+    prompt. A prompt within ANSWER_CACHE_MAX_DISTANCE (cosine) of a cached one
+    gets the cached answer replayed as SSE, skipping retrieval and generation.
+    Each answer is stored with the ids of the questions it was generated from,
+    and a trigger deletes it when any of them is updated or deleted.
+    """
+
+    def __init__(self) -> None:
+        """
+        Create the cache; it is backed by the `answer_cache` table.
+        """
+        self.tasks: set[asyncio.Task] = set()
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.stores: int = 0
+        self.rejected: int = 0
+        self.errors: int = 0
+
+    async def lookup(
+        self,
+        db: Database,
+        payload: ChatSchema,
+    ) -> tuple[Record | None, list[float] | None]:
+        """
+        Return the cached answer for the prompt, if there is one, and the
+        prompt's embedding for storing a new answer. Failures are logged and
+        treated as a miss without an embedding, so the answer is not stored.
+        """
+        try:
+            embedding = await generate_embeddings(
+                f"пребарување: {payload.prompt}",
+                payload.embeddings_model,
+            )
+            cached = await get_cached_answer_query(
+                db,
+                payload.embeddings_model.value,
+                get_answer_key(payload),
+                embedding,
+                max_distance=settings.ANSWER_CACHE_MAX_DISTANCE,
+                ttl=settings.ANSWER_CACHE_TTL,
+            )
+        except Exception:
+            logger.exception("Failed to look up the answer cache")
+            self.errors += 1
+            return None, None
+
+        if cached is None:
+            self.misses += 1
+            CACHE_LOOKUPS.labels(cache="answers", result="miss").inc()
+            return None, embedding
+
+        self.hits += 1
+        CACHE_LOOKUPS.labels(cache="answers", result="hit").inc()
+        logger.info(
+            "Answer cache hit at distance %.4f for cached prompt: '%s'",
+            cached["distance"],
+            cached["prompt"][:100],
+        )
+
+        return cached, embedding
+
+    def replay(self, answer: str) -> StreamingResponse:
+        """
+        Stream a cached answer event by event, as it was originally sent.
+        """
+
+        async def _gen() -> AsyncGenerator[str]:
+            for event in answer.split("\n\n"):
+                if event:
+                    yield f"{event}\n\n"
+
+        return StreamingResponse(_gen(), media_type="text/event-stream")
+
+    def capture(
+        self,
+        response: StreamingResponse,
+        db: Database,
+        payload: ChatSchema,
+        embedding: list[float],
+        sources: list[QuestionSchema],
+    ) -> StreamingResponse:
+        """
+        Pass the response through while recording it, and cache the answer
+        once the stream completes. Answers that failed, were cut off by the
+        client, or were not grounded in any question are not cached.
+        """
+        if not sources:
+            return response
+
+        body = response.body_iterator
+
+        async def _gen() -> AsyncGenerator[str | bytes | memoryview]:
+            chunks: list[str] = []
+
+            async for chunk in body:
+                chunks.append(
+                    chunk
+                    if isinstance(chunk, str)
+                    else bytes(chunk).decode(errors="ignore"),
+                )
+                yield chunk
+
+            answer = "".join(chunks)
+            if not answer or STREAM_ERROR_MESSAGE in answer:
+                return
+
+            self.spawn(self.store(db, payload, embedding, answer, sources))
+
+        response.body_iterator = _gen()
+
+        return response
+
+    def spawn(self, coro: Coroutine[Any, Any, None]) -> None:
+        """
+        Run the coroutine in the background, keeping a reference until it ends.
+        """
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def store(
+        self,
+        db: Database,
+        payload: ChatSchema,
+        embedding: list[float],
+        answer: str,
+        sources: list[QuestionSchema],
+    ) -> None:
+        """
+        Cache the answer, unless a source question changed while it was being
+        generated, and drop expired and excess answers.
+        """
+        try:
+            stored = await store_cached_answer_query(
+                db,
+                payload.embeddings_model.value,
+                get_answer_key(payload),
+                payload.prompt,
+                embedding,
+                answer,
+                [(question.id, question.updated_at) for question in sources],
+            )
+            await delete_expired_answers_query(db, settings.ANSWER_CACHE_TTL)
+            await delete_excess_answers_query(db, settings.ANSWER_CACHE_MAX_ENTRIES)
+        except Exception:
+            logger.exception("Failed to store the answer in the answer cache")
+            self.errors += 1
+            return
+
+        if stored:
+            self.stores += 1
+        else:
+            self.rejected += 1
+            logger.info("Not caching an answer whose sources changed")
+
+    def stats(self) -> dict[str, int | float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "pending": len(self.tasks),
+        }
+
+
+answer_cache = AnswerCache()
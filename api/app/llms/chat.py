@@ -1,13 +1,24 @@
+import json
 import logging
+import time
+from collections.abc import AsyncGenerator
 
 from fastapi.responses import StreamingResponse
 
+from app.llms.models import Model
 from app.llms.prompts import (
     DEFAULT_AGENT_SYSTEM_PROMPT,
     build_user_agent_prompt,
 )
 from app.llms.streams import stream_response_with_agent
 from app.schemas.chat import ChatSchema
+from app.utils.metrics import (
+    CHAT_STAGE_SECONDS,
+    CHAT_TIME_TO_FIRST_TOKEN_SECONDS,
+    CHAT_TOKENS_PER_SECOND,
+)
+from app.utils.rate_limit import estimate_tokens
+from app.utils.timing import StageTimer
 
 logger = logging.getLogger(__name__)
 
@@ -37,3 +48,85 @@ async def handle_chat(
         top_p=payload.top_p,
         max_tokens=payload.max_tokens,
     )
+
+
+def record_generation(
+    response: StreamingResponse,
+    model: Model,
+    *,
+    generation_started_at: float,
+) -> StreamingResponse:
+    """
+    Record the model's time to first token and generation speed once the
+    stream ends.
+    """
+    body = response.body_iterator
+
+    async def _gen() -> AsyncGenerator[str | bytes | memoryview]:
+        first_token_at: float | None = None
+        tokens = 0
+
+        try:
+            async for chunk in body:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    CHAT_TIME_TO_FIRST_TOKEN_SECONDS.labels(model=model.value).observe(
+                        first_token_at - generation_started_at,
+                    )
+
+                text = (
+                    chunk
+                    if isinstance(chunk, str)
+                    else bytes(chunk).decode(errors="ignore")
+                )
+                tokens += estimate_tokens(text.replace("data: ", ""))
+
+                yield chunk
+        finally:
+            finished_at = time.perf_counter()
+            CHAT_STAGE_SECONDS.labels(stage="generation").observe(
+                finished_at - generation_started_at,
+            )
+
+            if first_token_at is not None and finished_at > first_token_at:
+                CHAT_TOKENS_PER_SECOND.labels(model=model.value).observe(
+                    tokens / (finished_at - first_token_at),
+                )
+
+    response.body_iterator = _gen()
+
+    return response
+
+
+def instrument_stream(
+    response: StreamingResponse,
+    *,
+    timer: StageTimer,
+    emit_timings: bool = False,
+) -> StreamingResponse:
+    """
+    Report the timed stages as a Server-Timing header, and optionally as an
+    initial `timings` SSE event.
+    """
+    stages = timer.server_timing()
+    total = f"total;dur={timer.elapsed() * 1000:.1f}"
+    response.headers["Server-Timing"] = f"{stages}, {total}" if stages else total
+
+    if not emit_timings:
+        return response
+
+    body = response.body_iterator
+
+    async def _gen() -> AsyncGenerator[str | bytes | memoryview]:
+        timings = {
+            "stages": timer.to_dict(),
+            "total_ms": round(timer.elapsed() * 1000, 1),
+        }
+        yield f"event: timings\ndata: {json.dumps(timings)}\n\n"
+
+        async for chunk in body:
+            yield chunk
+
+    response.body_iterator = _gen()
+
+    return response
@@ -0,0 +1,226 @@
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+from collections.abc import AsyncGenerator, Awaitable, Callable
+
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from app.schemas.chat import ChatSchema
+from app.utils.settings import Settings
+from app.utils.timing import timed
+
+logger = logging.getLogger(__name__)
+
+settings = Settings()
+
+type Chunk = str | bytes | memoryview
+
+# Fields that only change how the answer is delivered, not the answer itself
+_PRESENTATION_FIELDS = {"prompt", "include_timings"}
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.split()).casefold()
+
+
+class Flight:
+    """
+    One in-flight chat pipeline and the chunks it has streamed so far.
+    Subscribers replay the buffer and then follow the live stream.
+    """
+
+    def __init__(self, key: str) -> None:
+        """
+        Create a flight that has not started yet.
+        """
+        self.key: str = key
+        self.ready: asyncio.Future[StreamingResponse] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self.chunks: list[Chunk] = []
+        self.done: bool = False
+        self.changed = asyncio.Condition()
+        self.subscribers: int = 0
+        self.task: asyncio.Task | None = None
+
+    async def subscribe(self) -> AsyncGenerator[Chunk]:
+        """
+        Yield every chunk of the stream, from the first one.
+        """
+        position = 0
+        while True:
+            async with self.changed:
+                while not self.done and len(self.chunks) <= position:
+                    await self.changed.wait()
+                chunks = self.chunks[position:]
+                done = self.done
+
+            for chunk in chunks:
+                yield chunk
+            position += len(chunks)
+
+            if done:
+                return
+
+    def leave(self) -> None:
+        """
+        Drop a subscriber, cancelling the pipeline if nobody is left to read it.
+        """
+        self.subscribers -= 1
+        if self.subscribers == 0 and not self.done and self.task is not None:
+            self.task.cancel()
+
+
+class FlightResponse(StreamingResponse):
+    """
+    A subscriber's stream of a flight. The subscription is released once the
+    response is closed, whether its body was streamed, cut off by the client,
+    or never started.
+    """
+
+    def __init__(self, flight: Flight, response: StreamingResponse) -> None:
+        """
+        Stream the flight with the status and headers of its response.
+        """
+        super().__init__(
+            flight.subscribe(),
+            status_code=response.status_code,
+            headers=response.headers,
+            media_type=response.media_type,
+        )
+        self.flight: Flight = flight
+        self.released: bool = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.flight.leave()
+
+
+class ChatCoalescer:
+    """
+    Single-flight for chat requests: identical requests that arrive while one
+    is in flight share its retrieval and generation, and the one token stream
+    is fanned out to every subscriber. Requests match on the normalized
+    prompt and every other setting that affects the answer. Unless
+    CHAT_COALESCING_DETERMINISTIC_ONLY is disabled, only requests sampled
+    with a temperature of 0 are coalesced, so sampled requests still get
+    answers of their own. Flights are per worker.
+    """
+
+    def __init__(self) -> None:
+        """
+        Create a coalescer with nothing in flight.
+        """
+        self.flights: dict[str, Flight] = {}
+
+        self.started: int = 0
+        self.coalesced: int = 0
+
+    def get_key(self, payload: ChatSchema) -> str | None:
+        """
+        Return the key identical requests share, or None if the request
+        should not be coalesced.
+        """
+        if not settings.CHAT_COALESCING_ENABLED or not payload.use_cache:
+            return None
+
+        if settings.CHAT_COALESCING_DETERMINISTIC_ONLY and payload.temperature > 0:
+            return None
+
+        key = {
+            "prompt": normalize_prompt(payload.prompt),
+            **payload.model_dump(mode="json", exclude=_PRESENTATION_FIELDS),
+        }
+
+        return hashlib.sha256(
+            json.dumps(key, sort_keys=True).encode("utf-8"),
+        ).hexdigest()
+
+    async def join(
+        self,
+        key: str,
+        pipeline: Callable[[], Awaitable[StreamingResponse]],
+    ) -> StreamingResponse:
+        """
+        Subscribe to the flight for `key`, starting it with `pipeline` if
+        there is none. Errors raised by the pipeline before it starts
+        streaming are raised to every subscriber.
+        """
+        flight = self.flights.get(key)
+        leader = flight is None
+        if flight is None:
+            flight = Flight(key)
+            flight.task = asyncio.create_task(self.run(flight, pipeline))
+            self.flights[key] = flight
+            self.started += 1
+        else:
+            self.coalesced += 1
+            logger.info("Coalescing chat request into flight %s", key[:12])
+
+        flight.subscribers += 1
+        try:
+            # The leader's stages are timed inside the pipeline
+            with contextlib.nullcontext() if leader else timed("coalesced_wait"):
+                response = await asyncio.shield(flight.ready)
+        except BaseException:
+            flight.leave()
+            raise
+
+        return FlightResponse(flight, response)
+
+    async def run(
+        self,
+        flight: Flight,
+        pipeline: Callable[[], Awaitable[StreamingResponse]],
+    ) -> None:
+        """
+        Run the pipeline and buffer its stream for the subscribers.
+        """
+        try:
+            try:
+                response = await pipeline()
+            except asyncio.CancelledError:
+                flight.ready.cancel()
+                raise
+            except Exception as e:
+                flight.ready.set_exception(e)
+                return
+
+            flight.ready.set_result(response)
+
+            async for chunk in response.body_iterator:
+                async with flight.changed:
+                    flight.chunks.append(chunk)
+                    flight.changed.notify_all()
+        except asyncio.CancelledError:
+            logger.info("Cancelled flight %s, no subscribers left", flight.key[:12])
+        except Exception:
+            logger.exception("Chat stream failed in flight %s", flight.key[:12])
+        finally:
+            if self.flights.get(flight.key) is flight:
+                del self.flights[flight.key]
+
+            flight.done = True
+            async with flight.changed:
+                flight.changed.notify_all()
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "in_flight": len(self.flights),
+            "subscribers": sum(flight.subscribers for flight in self.flights.values()),
+            "started": self.started,
+            "coalesced": self.coalesced,
+        }
+
+
+chat_coalescer = ChatCoalescer()
@@ -1,33 +1,347 @@
+import asyncio
 import logging
-
-import httpx
+from collections import defaultdict
+from uuid import UUID
 
 from app.data.connection import Database
-from app.data.questions import get_closest_questions
+from app.data.questions import get_closest_questions, get_lexical_matches_query
 from app.llms.embeddings import generate_embeddings
-from app.llms.models import Model
-from app.llms.query_transform import transform_query
+from app.llms.gpu_api import rerank_with_gpu_api
+from app.llms.models import MODEL_EMBEDDINGS_COLUMNS, Model
+from app.llms.query_transform import normalize_query, transform_query
+from app.llms.vector_index import question_index
+from app.schemas.questions import QuestionSchema
 from app.utils.exceptions import RetrievalError
 from app.utils.settings import Settings
+from app.utils.timing import timed
 
 logger = logging.getLogger(__name__)
 
 settings = Settings()
 
 
+# Keeps references to rewrites that outlived their budget, so they can finish and fill the cache
+_background_tasks: set[asyncio.Task] = set()
+
+
+async def vector_search(
+    db: Database,
+    query: str,
+    embedding_model: Model,
+    *,
+    limit: int,
+    use_cache: bool = True,
+    use_index: bool = True,
+) -> list[QuestionSchema]:
+    """
+    Embed the query and return the closest questions for the embedding model,
+    from the in-memory index when it is enabled and loaded, otherwise from the
+    database.
+    """
+    query_to_embed = f"пребарување: {query}"
+    with timed("embed"):
+        prompt_embedding = await generate_embeddings(
+            query_to_embed,
+            embedding_model,
+            use_cache=use_cache,
+        )
+
+    with timed("vector_search"):
+        if use_index:
+            candidates = question_index.search(
+                prompt_embedding,
+                embedding_model,
+                limit=limit,
+            )
+            if candidates is not None:
+                return candidates
+
+        return await get_closest_questions(
+            db,
+            prompt_embedding,
+            embedding_model,
+            limit=limit,
+        )
+
+
+async def lexical_search(
+    db: Database,
+    query: str,
+    *,
+    limit: int,
+) -> list[QuestionSchema]:
+    """
+    Return the full-text matches for the query.
+    """
+    with timed("lexical_search"):
+        return await get_lexical_matches_query(db, query, limit=limit)
+
+
+def fuse_rankings(
+    *rankings: list[QuestionSchema],
+    limit: int,
+) -> list[QuestionSchema]:
+    """
+    Merge ranked candidate lists with reciprocal rank fusion: each question
+    scores the sum of 1 / (k + rank) over the lists it appears in. The
+    question keeps the smallest distance it was found with.
+    """
+    scores: dict[UUID, float] = defaultdict(float)
+    fused: dict[UUID, QuestionSchema] = {}
+
+    for ranking in rankings:
+        for rank, candidate in enumerate(ranking, start=1):
+            scores[candidate.id] += 1.0 / (settings.RETRIEVAL_RRF_K + rank)
+
+            existing = fused.get(candidate.id)
+            if existing is None or (
+                candidate.distance is not None
+                and (
+                    existing.distance is None or candidate.distance < existing.distance
+                )
+            ):
+                fused[candidate.id] = candidate
+
+    return sorted(fused.values(), key=lambda q: scores[q.id], reverse=True)[:limit]
+
+
+async def multi_model_search(
+    db: Database,
+    query: str,
+    embedding_models: list[Model],
+    *,
+    limit: int,
+    use_cache: bool = True,
+    use_index: bool = True,
+) -> list[QuestionSchema]:
+    """
+    Run the vector search with every embedding model concurrently and fuse
+    the rankings. A model that fails or exceeds its timeout is dropped; the
+    search only fails if every model does.
+    """
+    models = list(dict.fromkeys(embedding_models))
+
+    async def _search(model: Model) -> list[QuestionSchema]:
+        if model not in MODEL_EMBEDDINGS_COLUMNS:
+            msg = f"Model '{model.value}' does not support embeddings"
+            raise ValueError(msg)
+
+        return await asyncio.wait_for(
+            vector_search(
+                db,
+                query,
+                model,
+                limit=limit,
+                use_cache=use_cache,
+                use_index=use_index,
+            ),
+            timeout=settings.RETRIEVAL_MODEL_TIMEOUTS.get(
+                model,
+                settings.RETRIEVAL_MODEL_TIMEOUT,
+            ),
+        )
+
+    results = await asyncio.gather(
+        *(_search(model) for model in models),
+        return_exceptions=True,
+    )
+
+    rankings: list[list[QuestionSchema]] = []
+    errors: list[BaseException] = []
+    for model, result in zip(models, results, strict=True):
+        if isinstance(result, BaseException):
+            logger.warning("Dropping %s from retrieval: %r", model, result)
+            errors.append(result)
+        else:
+            rankings.append(result)
+
+    if not rankings:
+        raise errors[0]
+
+    return fuse_rankings(*rankings, limit=limit)
+
+
+async def search_questions(
+    db: Database,
+    query: str,
+    embedding_model: Model,
+    *,
+    limit: int,
+    use_cache: bool = True,
+    use_index: bool = True,
+    hybrid: bool = False,
+    fusion_models: list[Model] | None = None,
+) -> list[QuestionSchema]:
+    """
+    Return the questions most relevant to the query. If fusion_models are
+    given, they are all searched and fused instead of only embedding_model.
+    If hybrid is True, a full-text search runs alongside the vector search
+    and the two rankings are fused; if it fails, the vector results are used
+    alone.
+    """
+    if fusion_models:
+        vector = multi_model_search(
+            db,
+            query,
+            fusion_models,
+            limit=limit,
+            use_cache=use_cache,
+            use_index=use_index,
+        )
+    else:
+        vector = vector_search(
+            db,
+            query,
+            embedding_model,
+            limit=limit,
+            use_cache=use_cache,
+            use_index=use_index,
+        )
+
+    if not hybrid:
+        return await vector
+
+    vector_candidates, lexical_candidates = await asyncio.gather(
+        vector,
+        lexical_search(db, query, limit=limit),
+        return_exceptions=True,
+    )
+
+    if isinstance(vector_candidates, BaseException):
+        raise vector_candidates
+
+    if isinstance(lexical_candidates, BaseException):
+        logger.warning(
+            "Lexical search failed, using vector results only: %r",
+            lexical_candidates,
+        )
+        return vector_candidates
+
+    logger.info("Lexical candidates retrieved: %d", len(lexical_candidates))
+
+    return fuse_rankings(vector_candidates, lexical_candidates, limit=limit)
+
+
+async def rewrite_query(query: str, *, use_cache: bool) -> str:
+    """
+    Rewrite the query for retrieval using the default query transform model.
+    """
+    with timed("rewrite"):
+        return await transform_query(
+            query,
+            Model.GPT_4_1_MINI,
+            temperature=0.0,
+            top_p=1.0,
+            max_tokens=512,
+            use_cache=use_cache,
+        )
+
+
+async def speculative_search(
+    db: Database,
+    query: str,
+    embedding_model: Model,
+    *,
+    limit: int,
+    use_cache: bool,
+    use_index: bool,
+    hybrid: bool,
+    fusion_models: list[Model] | None,
+) -> tuple[list[QuestionSchema], str]:
+    """
+    Search with the raw query while the rewrite is in flight. If the rewrite
+    arrives within the budget, its results are fused with the raw ones;
+    otherwise the raw results are used as they are.
+    Returns the candidates and the query that should be used for re-ranking.
+    """
+    rewrite = asyncio.create_task(rewrite_query(query, use_cache=use_cache))
+    raw_search = asyncio.create_task(
+        search_questions(
+            db,
+            query,
+            embedding_model,
+            limit=limit,
+            use_cache=use_cache,
+            use_index=use_index,
+            hybrid=hybrid,
+            fusion_models=fusion_models,
+        ),
+    )
+
+    try:
+        try:
+            transformed = await asyncio.wait_for(
+                asyncio.shield(rewrite),
+                timeout=settings.QUERY_TRANSFORM_BUDGET,
+            )
+        except TimeoutError:
+            logger.info(
+                "Query rewrite missed its %.2fs budget. Using raw query results",
+                settings.QUERY_TRANSFORM_BUDGET,
+            )
+            _background_tasks.add(rewrite)
+            rewrite.add_done_callback(_background_tasks.discard)
+
+            return await raw_search, query
+
+        logger.info("Transformed query: '%s'", transformed)
+
+        if normalize_query(transformed) == normalize_query(query):
+            return await raw_search, query
+
+        raw_candidates, rewritten_candidates = await asyncio.gather(
+            raw_search,
+            search_questions(
+                db,
+                transformed,
+                embedding_model,
+                limit=limit,
+                use_cache=use_cache,
+                use_index=use_index,
+                hybrid=hybrid,
+                fusion_models=fusion_models,
+            ),
+        )
+
+        return (
+            fuse_rankings(rewritten_candidates, raw_candidates, limit=limit),
+            transformed,
+        )
+    finally:
+        # The raw search is left unawaited if the rewrite path fails or the
+        # request is cancelled, so stop it and retrieve its outcome
+        raw_search.cancel()
+        await asyncio.wait([raw_search])
+        if not raw_search.cancelled():
+            raw_search.exception()
+
+
 async def get_retrieved_context(
     db: Database,
     query: str,
     embedding_model: Model,
     *,
     use_reranker: bool,
+    use_cache: bool = True,
+    speculative: bool = False,
+    use_index: bool = True,
+    hybrid: bool = False,
+    fusion_models: list[Model] | None = None,
     initial_k: int = 30,
     top_k: int = 10,
-) -> str:
+) -> tuple[str, list[QuestionSchema]]:
     """
     Performs a retrieval process. If use_reranker is True, it's a two-stage
     process (vector search + re-ranking). Otherwise, it's a single-stage
-    vector search.
+    vector search. If use_cache is False, the query rewrite and the query
+    embedding bypass their caches. If speculative is True, the raw query is
+    searched while the rewrite is still running. If use_index is True, the
+    in-memory vector index is searched when it is available. If hybrid is
+    True, full-text matches are fused with the vector results, and fewer
+    candidates (HYBRID_INITIAL_K) are sent to the re-ranker. If fusion_models
+    are given, the query is embedded with each of them and the results fused.
+    Re-ranked documents scoring below RERANK_MIN_SCORE, if set, are dropped.
+    Returns the context and the questions it was built from.
     """
 
     logger.info(
@@ -36,39 +350,53 @@ async def get_retrieved_context(
         embedding_model,
     )
 
-    query = await transform_query(
-        query,
-        Model.GPT_4_1_MINI,
-        temperature=0.0,
-        top_p=1.0,
-        max_tokens=512,
-    )
+    if not use_reranker:
+        retrieval_limit = top_k
+    elif hybrid:
+        retrieval_limit = min(initial_k, settings.HYBRID_INITIAL_K)
+    else:
+        retrieval_limit = initial_k
 
-    logger.info("Transformed query: '%s'", query)
+    try:
+        if speculative:
+            initial_candidates, query = await speculative_search(
+                db,
+                query,
+                embedding_model,
+                limit=retrieval_limit,
+                use_cache=use_cache,
+                use_index=use_index,
+                hybrid=hybrid,
+                fusion_models=fusion_models,
+            )
+        else:
+            query = await rewrite_query(query, use_cache=use_cache)
 
-    retrieval_limit = initial_k if use_reranker else top_k
+            logger.info("Transformed query: '%s'", query)
 
-    try:
-        query_to_embed = f"пребарување: {query}"
-        prompt_embedding = await generate_embeddings(query_to_embed, embedding_model)
-        initial_candidates = await get_closest_questions(
-            db,
-            prompt_embedding,
-            embedding_model,
-            limit=retrieval_limit,
-        )
+            initial_candidates = await search_questions(
+                db,
+                query,
+                embedding_model,
+                limit=retrieval_limit,
+                use_cache=use_cache,
+                use_index=use_index,
+                hybrid=hybrid,
+                fusion_models=fusion_models,
+            )
 
         logger.info("Initial candidates retrieved: %d", len(initial_candidates))
 
         if not initial_candidates:
-            return ""
+            return "", []
 
     except Exception as e:
         raise RetrievalError("Failed during initial vector search") from e
 
-    candidate_docs = [
-        f"Наслов: {q.name}\nСодржина: {q.content}" for q in initial_candidates
-    ]
+    candidates_by_doc = {
+        f"Наслов: {q.name}\nСодржина: {q.content}": q for q in initial_candidates
+    }
+    candidate_docs = list(candidates_by_doc)
 
     logger.info("Reranking enabled: %s", use_reranker)
 
@@ -76,20 +404,15 @@ async def get_retrieved_context(
         try:
             logger.info("Sending %d candidates to re-ranker...", len(candidate_docs))
 
-            rerank_payload = {
-                "query": query,
-                "documents": candidate_docs,
-            }
+            with timed("rerank"):
+                ranked = await rerank_with_gpu_api(query, candidate_docs, top_n=top_k)
 
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{settings.GPU_API_URL}/rerank/",
-                    json=rerank_payload,
-                )
-
-                response.raise_for_status()
-
-                final_docs = response.json()["reranked_documents"]
+            final_docs = [
+                candidate_docs[index]
+                for index, score in ranked
+                if settings.RERANK_MIN_SCORE is None
+                or score >= settings.RERANK_MIN_SCORE
+            ]
 
             logger.info(
                 "Selected top %d documents",
@@ -103,4 +426,7 @@ async def get_retrieved_context(
     else:
         final_docs = candidate_docs
 
-    return "\n\n---\n\n".join(final_docs[:top_k])
+    final_docs = final_docs[:top_k]
+    sources = [candidates_by_doc[doc] for doc in final_docs if doc in candidates_by_doc]
+
+    return "\n\n---\n\n".join(final_docs), sources
@@ -0,0 +1,228 @@
+import asyncio
+import contextlib
+import logging
+from collections import defaultdict
+from datetime import datetime
+from itertools import batched
+from uuid import UUID
+
+from app.data.connection import Database
+from app.data.embedding_jobs import (
+    claim_embedding_jobs_query,
+    complete_embedding_jobs_query,
+    enqueue_embedding_jobs_query,
+    get_embedding_job_counts_query,
+    get_next_embedding_job_delay_query,
+    retry_embedding_jobs_query,
+)
+from app.data.questions import get_unfilled_question_rows_query
+from app.llms.embeddings import embed_question_rows
+from app.llms.models import MODEL_EMBEDDINGS_COLUMNS, Model
+from app.utils.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+settings = Settings()
+
+
+def get_queue_models() -> list[Model]:
+    """
+    Return the configured models to embed with, one per embedding column.
+    """
+    models: dict[str, Model] = {}
+    for model in settings.EMBEDDING_QUEUE_MODELS:
+        column = MODEL_EMBEDDINGS_COLUMNS.get(model)
+        if column is None:
+            logger.warning("Skipping non-embedding model in queue: %s", model)
+            continue
+        models.setdefault(column, model)
+
+    return list(models.values())
+
+
+class EmbeddingQueue:
+    """
+    Background worker re-embedding questions after they are created or edited.
+    Jobs are persisted in the `embedding_job` table and leased with
+    SKIP LOCKED, so several workers can share the queue and jobs survive
+    restarts. Enqueueing is debounced, so a burst of edits is embedded with
+    one batched call per model once it settles.
+    """
+
+    def __init__(self) -> None:
+        """
+        Create an idle queue; call `start` to begin processing.
+        """
+        self.db: Database | None = None
+        self.task: asyncio.Task | None = None
+        self.wakeup = asyncio.Event()
+        self.processed: int = 0
+        self.failed: int = 0
+
+    def start(self, db: Database) -> None:
+        """
+        Start processing jobs in the background.
+        """
+        if self.task is not None:
+            return
+
+        self.db = db
+        self.task = asyncio.create_task(self.run())
+        logger.info("Embedding queue started")
+
+    async def stop(self) -> None:
+        """
+        Stop the worker. Leased jobs are picked up again once their lease expires.
+        """
+        if self.task is None:
+            return
+
+        self.task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self.task
+        self.task = None
+        logger.info("Embedding queue stopped")
+
+    async def enqueue(self, db: Database, question_ids: list[UUID]) -> None:
+        """
+        Queue the questions for re-embedding. Failures are logged rather than
+        raised, since the stale rows are still picked up by /questions/fill.
+        """
+        try:
+            await enqueue_embedding_jobs_query(
+                db,
+                question_ids,
+                settings.EMBEDDING_QUEUE_DEBOUNCE,
+            )
+        except Exception:
+            logger.exception("Failed to queue embedding jobs for %s", question_ids)
+            return
+
+        self.wakeup.set()
+
+    async def run(self) -> None:
+        """
+        Process due jobs until cancelled, sleeping until the next job is due.
+        """
+        while True:
+            self.wakeup.clear()
+
+            try:
+                if await self.process_due_jobs():
+                    continue
+                delay = await self.get_idle_delay()
+            except Exception:
+                logger.exception("Embedding queue iteration failed")
+                delay = settings.EMBEDDING_QUEUE_POLL_INTERVAL
+
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(self.wakeup.wait(), timeout=delay)
+
+    async def get_idle_delay(self) -> float:
+        """
+        Return how long to sleep before checking the queue again.
+        """
+        if self.db is None:
+            return settings.EMBEDDING_QUEUE_POLL_INTERVAL
+
+        next_due = await get_next_embedding_job_delay_query(self.db)
+        if next_due is None:
+            return settings.EMBEDDING_QUEUE_POLL_INTERVAL
+
+        return min(max(next_due, 0.1), settings.EMBEDDING_QUEUE_POLL_INTERVAL)
+
+    async def process_due_jobs(self) -> int:
+        """
+        Claim a batch of due jobs and embed their stale columns for every
+        configured model. Returns the number of jobs claimed.
+        """
+        if self.db is None:
+            return 0
+
+        jobs = await claim_embedding_jobs_query(
+            self.db,
+            settings.EMBEDDING_QUEUE_BATCH_SIZE,
+            settings.EMBEDDING_QUEUE_LEASE,
+        )
+        if not jobs:
+            return 0
+
+        question_ids = [job["question_id"] for job in jobs]
+        results = await asyncio.gather(
+            *(
+                self.embed_model(self.db, model, question_ids)
+                for model in get_queue_models()
+            ),
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+
+        if not errors:
+            await complete_embedding_jobs_query(
+                self.db,
+                [(job["question_id"], job["enqueued_at"]) for job in jobs],
+            )
+            self.processed += len(jobs)
+            logger.info("Embedded %d queued questions", len(jobs))
+            return len(jobs)
+
+        error_detail = "; ".join(repr(error) for error in errors)
+        logger.warning(
+            "Failed to embed %d queued questions: %s",
+            len(jobs),
+            error_detail,
+        )
+        self.failed += len(jobs)
+
+        exhausted: list[tuple[UUID, datetime]] = []
+        retries: dict[float, list[tuple[UUID, datetime]]] = defaultdict(list)
+        for job in jobs:
+            key = (job["question_id"], job["enqueued_at"])
+            if job["attempts"] >= settings.EMBEDDING_QUEUE_MAX_ATTEMPTS:
+                exhausted.append(key)
+            else:
+                backoff = 2 ** (job["attempts"] - 1)
+                retries[settings.EMBEDDING_QUEUE_RETRY_DELAY * backoff].append(key)
+
+        if exhausted:
+            logger.error(
+                "Dropping %d embedding jobs after %d attempts",
+                len(exhausted),
+                settings.EMBEDDING_QUEUE_MAX_ATTEMPTS,
+            )
+            await complete_embedding_jobs_query(self.db, exhausted)
+
+        for delay, keys in retries.items():
+            await retry_embedding_jobs_query(self.db, keys, delay, error_detail)
+
+        return len(jobs)
+
+    async def embed_model(
+        self,
+        db: Database,
+        model: Model,
+        question_ids: list[UUID],
+    ) -> None:
+        """
+        Embed the questions whose vector for the model is missing or stale.
+        """
+        rows = await get_unfilled_question_rows_query(db, model, question_ids)
+
+        for batch in batched(rows, settings.EMBEDDINGS_FILL_BATCH_SIZE, strict=False):
+            await embed_question_rows(db, model, batch)
+
+    async def stats(self, db: Database) -> dict[str, int | float]:
+        """
+        Return the queue depth and this worker's processing counters.
+        """
+        counts = await get_embedding_job_counts_query(db)
+
+        return {
+            **counts,
+            "running": int(self.task is not None),
+            "processed": self.processed,
+            "failed": self.failed,
+        }
+
+
+embedding_queue = EmbeddingQueue()
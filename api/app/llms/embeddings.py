@@ -1,27 +1,48 @@
+import asyncio
 import json
 import logging
-from collections.abc import AsyncGenerator
+from collections import defaultdict
+from collections.abc import AsyncGenerator, Sequence
 from datetime import UTC, datetime
+from itertools import batched
 from typing import overload
 
+from asyncpg import Record
 from fastapi import HTTPException, status
 from fastapi.responses import StreamingResponse
 
 from app.data.connection import Database
+from app.data.questions import (
+    get_unfilled_question_rows_query,
+    unfilled_embedding_condition,
+    update_question_embeddings_query,
+)
+from app.llms.embeddings_cache import EmbeddingKind, embeddings_cache
 from app.llms.google import generate_google_embeddings
 from app.llms.gpu_api import generate_gpu_api_embeddings
-from app.llms.models import MODEL_EMBEDDINGS_COLUMNS, Model
+from app.llms.models import (
+    EMBEDDING_MODEL_PROVIDERS,
+    MODEL_EMBEDDINGS_COLUMNS,
+    Model,
+)
 from app.llms.ollama import generate_ollama_embeddings
 from app.llms.openai import generate_openai_embeddings
-from app.utils.database import embedding_to_pgvector
+from app.utils.metrics import observe_provider_call
+from app.utils.settings import Settings
 
 logger = logging.getLogger(__name__)
 
+settings = Settings()
+
+_provider_semaphores: dict[str, asyncio.Semaphore] = {}
+
 
 @overload
 async def generate_embeddings(
     text: str,
     model: Model,
+    *,
+    use_cache: bool = True,
 ) -> list[float]: ...
 
 
@@ -29,19 +50,89 @@ async def generate_embeddings(
 async def generate_embeddings(
     text: list[str],
     model: Model,
+    *,
+    use_cache: bool = True,
 ) -> list[list[float]]: ...
 
 
 async def generate_embeddings(
     text: str | list[str],
     model: Model,
+    *,
+    use_cache: bool = True,
 ) -> list[float] | list[list[float]]:
     """
     Generate embeddings for the given text using the specified model.
+    Cached vectors are reused unless use_cache is False; only the misses are
+    sent to the provider.
     """
 
     logger.info("Generating embeddings for text: '%s'", text[:100])
 
+    if not use_cache:
+        return await dispatch_embeddings(text, model)
+
+    # Single strings are embedded as queries, lists as documents, and some
+    # providers produce different vectors for each
+    kind: EmbeddingKind = "query" if isinstance(text, str) else "document"
+    texts = [text] if isinstance(text, str) else text
+
+    cached = await embeddings_cache.get_many(model, kind, texts)
+    missing = [i for i, vector in enumerate(cached) if vector is None]
+
+    fresh: list[list[float]] = []
+    if missing:
+        if isinstance(text, str):
+            fresh = [await dispatch_embeddings(text, model)]
+        else:
+            fresh = await dispatch_embeddings([texts[i] for i in missing], model)
+
+        await embeddings_cache.set_many(model, kind, [texts[i] for i in missing], fresh)
+
+    resolved = dict(zip(missing, fresh, strict=True))
+    vectors: list[list[float]] = [
+        resolved[i] if vector is None else vector.tolist()
+        for i, vector in enumerate(cached)
+    ]
+
+    if isinstance(text, str):
+        return vectors[0]
+
+    return vectors
+
+
+@overload
+async def dispatch_embeddings(
+    text: str,
+    model: Model,
+) -> list[float]: ...
+
+
+@overload
+async def dispatch_embeddings(
+    text: list[str],
+    model: Model,
+) -> list[list[float]]: ...
+
+
+async def dispatch_embeddings(
+    text: str | list[str],
+    model: Model,
+) -> list[float] | list[list[float]]:
+    """
+    Send the text to the provider backing the specified model, bypassing the cache.
+    """
+    with observe_provider_call(
+        EMBEDDING_MODEL_PROVIDERS.get(model, "unknown"),
+        "embed",
+    ):
+        return await _dispatch_embeddings(text, model)
+
+
+async def _dispatch_embeddings(
+    text: str | list[str],
+    model: Model,
+) -> list[float] | list[list[float]]:
     match model:
         case Model.LLAMA_3_3_70B | Model.BGE_M3:
             return await generate_ollama_embeddings(text, model)
@@ -59,6 +150,108 @@ async def generate_embeddings(
             raise ValueError(f"Unsupported model: {model}")
 
 
+def get_provider_semaphore(model: Model) -> asyncio.Semaphore:
+    """
+    Return the semaphore bounding concurrent fill requests to the model's provider.
+    """
+    provider = EMBEDDING_MODEL_PROVIDERS[model]
+    semaphore = _provider_semaphores.get(provider)
+
+    if semaphore is None:
+        limit = settings.EMBEDDINGS_FILL_PROVIDER_CONCURRENCY.get(provider, 1)
+        semaphore = asyncio.Semaphore(max(limit, 1))
+        _provider_semaphores[provider] = semaphore
+
+    return semaphore
+
+
+async def embed_question_rows(
+    db: Database,
+    model: Model,
+    rows: Sequence[Record],
+) -> None:
+    """
+    Embed (id, name, content, content_hash) rows as documents with one
+    provider call and write the vectors back.
+    """
+    texts_to_embed = [
+        f"преземи документ: Наслов: {row['name']}\nСодржина: {row['content']}"
+        for row in rows
+    ]
+
+    async with get_provider_semaphore(model):
+        embeddings = await generate_embeddings(
+            texts_to_embed,
+            model,
+            use_cache=False,
+        )
+
+    await update_question_embeddings_query(
+        db,
+        model,
+        [
+            (row["id"], embedding, row["content_hash"])
+            for row, embedding in zip(rows, embeddings, strict=True)
+        ],
+    )
+
+
+async def fill_model_embeddings(
+    db: Database,
+    model: Model,
+    question_rows: list[Record],
+    events: asyncio.Queue[dict[str, str] | None],
+    *,
+    batch_size: int,
+) -> None:
+    """
+    Embed the questions for one model in batches, writing each batch back and
+    putting one progress event per question on the queue. If no question rows
+    are given, the questions whose embedding for the model is missing or stale
+    are filled.
+    """
+    rows_for_this_model = question_rows
+    if not rows_for_this_model:
+        rows_for_this_model = await get_unfilled_question_rows_query(db, model)
+
+    for batch in batched(rows_for_this_model, batch_size, strict=False):
+        result = "ok"
+        error_detail = ""
+
+        try:
+            await embed_question_rows(db, model, batch)
+        except Exception as e:
+            result = "error"
+            error_detail = repr(e)
+
+        for row in batch:
+            await events.put(
+                {
+                    "status": result,
+                    "error": error_detail,
+                    "model": model.value,
+                    "id": str(row["id"]),
+                    "name": row["name"],
+                },
+            )
+
+
+def resolve_fill_models(model: Model, *, all_models: bool) -> list[Model]:
+    """
+    Return the models a fill request covers, rejecting non-embedding models.
+    """
+    if all_models:
+        return list(MODEL_EMBEDDINGS_COLUMNS.keys())
+
+    if model not in MODEL_EMBEDDINGS_COLUMNS:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported embedding model: {model.value}",
+        )
+
+    return [model]
+
+
 async def stream_fill_embeddings(
     db: Database,
     model: Model,
@@ -71,6 +264,12 @@ async def stream_fill_embeddings(
     Stream progress of filling embeddings for questions.
     Can process a single model or all available embedding models.
     Emits one SSE event per question-model combination as JSON.
+    Questions are embedded and written back in batches of
+    EMBEDDINGS_FILL_BATCH_SIZE; if a batch fails, every question in it is
+    reported with the error.
+    Models run concurrently, bounded per provider by
+    EMBEDDINGS_FILL_PROVIDER_CONCURRENCY, and their events are interleaved.
+    Models sharing an embedding column are processed one after another.
     """
 
     logger.info(
@@ -80,27 +279,49 @@ async def stream_fill_embeddings(
         all_models,
     )
 
-    models_to_process: list[Model]
-    if all_models:
-        models_to_process = list(MODEL_EMBEDDINGS_COLUMNS.keys())
-    else:
-        if model not in MODEL_EMBEDDINGS_COLUMNS:
-            raise HTTPException(
-                status.HTTP_400_BAD_REQUEST,
-                detail=f"Unsupported embedding model: {model.value}",
-            )
-        models_to_process = [model]
+    models_to_process = resolve_fill_models(model, all_models=all_models)
 
     question_rows = []
     if all_questions:
-        question_rows = await db.fetch("SELECT id, name, content FROM question")
+        question_rows = await db.fetch(
+            "SELECT id, name, content, content_hash FROM question",
+        )
     elif questions:
         placeholders = ",".join(["$" + str(i + 1) for i in range(len(questions))])
         question_rows = await db.fetch(
-            f"SELECT id, name, content FROM question WHERE name IN ({placeholders})",  # noqa: S608
+            f"SELECT id, name, content, content_hash FROM question WHERE name IN ({placeholders})",  # noqa: S608
             *questions,
         )
 
+    batch_size = max(settings.EMBEDDINGS_FILL_BATCH_SIZE, 1)
+
+    models_by_column: dict[str, list[Model]] = defaultdict(list)
+    for m in models_to_process:
+        models_by_column[MODEL_EMBEDDINGS_COLUMNS[m]].append(m)
+
+    async def _fill_column(
+        models: list[Model],
+        events: asyncio.Queue[dict[str, str] | None],
+    ) -> None:
+        try:
+            for current_model in models:
+                try:
+                    await fill_model_embeddings(
+                        db,
+                        current_model,
+                        question_rows,
+                        events,
+                        batch_size=batch_size,
+                    )
+                except Exception:
+                    logger.exception(
+                        "Failed to fill embeddings for model: %s",
+                        current_model,
+                    )
+        finally:
+            # Marks this worker as finished for the event stream
+            events.put_nowait(None)
+
     async def _gen() -> AsyncGenerator[str]:
         progress_counter = 0
         total_tasks = 0
@@ -111,54 +332,40 @@ async def stream_fill_embeddings(
             for m in models_to_process:
                 col = MODEL_EMBEDDINGS_COLUMNS[m]
                 count_result = await db.fetchval(
-                    f"SELECT COUNT(*) FROM question WHERE {col} IS NULL",  # noqa: S608
+                    f"SELECT COUNT(*) FROM question WHERE {unfilled_embedding_condition(col)}",  # noqa: S608
                 )
                 if isinstance(count_result, int | str):
                     total_tasks += int(count_result)
 
-        for current_model in models_to_process:
-            model_column = MODEL_EMBEDDINGS_COLUMNS[current_model]
+        events: asyncio.Queue[dict[str, str] | None] = asyncio.Queue()
+        workers = [
+            asyncio.create_task(_fill_column(models, events))
+            for models in models_by_column.values()
+        ]
+        running = len(workers)
 
-            rows_for_this_model = []
-            if question_rows:
-                rows_for_this_model = question_rows
-            else:
-                rows_for_this_model = await db.fetch(
-                    f"SELECT id, name, content FROM question WHERE {model_column} IS NULL",  # noqa: S608
-                )
+        try:
+            while running:
+                event = await events.get()
+                if event is None:
+                    running -= 1
+                    continue
 
-            for row in rows_for_this_model:
                 progress_counter += 1
-                qid = row["id"]
-                name = row["name"]
-                result = "ok"
-                error_detail = ""
-
-                try:
-                    document_text = f"Наслов: {name}\nСодржина: {row['content']}"
-                    text_to_embed = f"преземи документ: {document_text}"
-
-                    embedding = await generate_embeddings(text_to_embed, current_model)
-                    await db.execute(
-                        f"UPDATE question SET {model_column} = $1 WHERE id = $2",  # noqa: S608
-                        embedding_to_pgvector(embedding),
-                        qid,
-                    )
-                except Exception as e:
-                    result = "error"
-                    error_detail = repr(e)
-
                 payload = {
-                    "status": result,
-                    "error": error_detail,
+                    "status": event["status"],
+                    "error": event["error"],
                     "index": progress_counter,
                     "total": total_tasks,
-                    "model": current_model.value,
-                    "id": str(qid),
-                    "name": name,
+                    "model": event["model"],
+                    "id": event["id"],
+                    "name": event["name"],
                     "ts": datetime.now(UTC).isoformat() + "Z",
                 }
                 yield f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+        finally:
+            for worker in workers:
+                worker.cancel()
 
     return StreamingResponse(
         _gen(),
@@ -0,0 +1,168 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections.abc import Sequence
+from typing import Literal
+
+import numpy as np
+
+from app.data.connection import Database
+from app.data.embedding_cache import (
+    delete_expired_embeddings_query,
+    get_cached_embeddings_query,
+    store_cached_embeddings_query,
+)
+from app.llms.models import Model
+from app.utils.cache import LRUCache
+from app.utils.metrics import CACHE_LOOKUPS
+from app.utils.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+settings = Settings()
+
+type EmbeddingKind = Literal["query", "document"]
+
+
+def hash_text(text: str) -> str:
+    """
+    Return a stable hash of the text used as the cache key.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingsCache:
+    """
+    Two-tier cache of embedding vectors keyed on (model, kind, text hash).
+    Vectors are kept in an in-process LRU as float32 arrays. If a database is
+    attached, misses fall through to the `embedding_cache` table, so hits
+    survive restarts and are shared between workers. Persisted vectors unused
+    for EMBEDDINGS_CACHE_TTL are pruned in the background, at most once every
+    EMBEDDINGS_CACHE_PRUNE_INTERVAL per worker.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        """
+        Create an embeddings cache holding at most `maxsize` vectors in memory.
+        """
+        self.memory: LRUCache[tuple[str, str, str], np.ndarray] = LRUCache(
+            maxsize=maxsize,
+            name="embeddings",
+        )
+        self.db: Database | None = None
+        self.db_hits: int = 0
+        self.pruned_at: float | None = None
+        self.prune_task: asyncio.Task | None = None
+
+    def attach(self, db: Database) -> None:
+        """
+        Enable the Postgres-backed second tier.
+        """
+        self.db = db
+
+    async def get_many(
+        self,
+        model: Model,
+        kind: EmbeddingKind,
+        texts: Sequence[str],
+    ) -> list[np.ndarray | None]:
+        """
+        Look up the vectors for the texts, returning None for every miss.
+        """
+        hashes = [hash_text(text) for text in texts]
+        found = [self.memory.get((model.value, kind, h)) for h in hashes]
+
+        missing = [h for h, vector in zip(hashes, found, strict=True) if vector is None]
+        if self.db is None or not missing:
+            return found
+
+        try:
+            rows = await get_cached_embeddings_query(
+                self.db,
+                model.value,
+                kind,
+                missing,
+            )
+        except Exception:
+            logger.exception("Failed to read from the persistent embeddings cache")
+            return found
+
+        for i, h in enumerate(hashes):
+            if found[i] is None and h in rows:
+                vector = np.frombuffer(rows[h], dtype="<f4").astype(np.float32)
+                self.memory.set((model.value, kind, h), vector)
+                found[i] = vector
+                self.db_hits += 1
+
+        CACHE_LOOKUPS.labels(cache="embeddings_db", result="hit").inc(len(rows))
+        CACHE_LOOKUPS.labels(cache="embeddings_db", result="miss").inc(
+            len(missing) - len(rows),
+        )
+
+        return found
+
+    async def set_many(
+        self,
+        model: Model,
+        kind: EmbeddingKind,
+        texts: Sequence[str],
+        vectors: Sequence[Sequence[float]],
+    ) -> None:
+        """
+        Store freshly generated vectors in memory and, if attached, in Postgres.
+        """
+        items: list[tuple[str, bytes]] = []
+
+        for text, vector in zip(texts, vectors, strict=True):
+            h = hash_text(text)
+            array = np.asarray(vector, dtype=np.float32)
+            self.memory.set((model.value, kind, h), array)
+            items.append((h, array.astype("<f4").tobytes()))
+
+        if self.db is None or not items:
+            return
+
+        try:
+            await store_cached_embeddings_query(self.db, model.value, kind, items)
+        except Exception:
+            logger.exception("Failed to write to the persistent embeddings cache")
+
+        self.schedule_prune()
+
+    def schedule_prune(self) -> None:
+        """
+        Drop expired vectors from Postgres in the background, if it is due.
+        """
+        now = time.monotonic()
+        if (
+            self.db is None
+            or (self.prune_task is not None and not self.prune_task.done())
+            or (
+                self.pruned_at is not None
+                and now - self.pruned_at < settings.EMBEDDINGS_CACHE_PRUNE_INTERVAL
+            )
+        ):
+            return
+
+        self.pruned_at = now
+        self.prune_task = asyncio.create_task(self.prune(self.db))
+
+    async def prune(self, db: Database) -> None:
+        try:
+            await delete_expired_embeddings_query(db, settings.EMBEDDINGS_CACHE_TTL)
+        except Exception:
+            logger.exception("Failed to prune the persistent embeddings cache")
+
+    def stats(self) -> dict[str, int | float]:
+        """
+        Return the in-memory counters plus hits served by the persistent tier.
+        """
+        return {
+            **self.memory.stats(),
+            "db_hits": self.db_hits,
+            "persistent": int(self.db is not None),
+        }
+
+
+embeddings_cache = EmbeddingsCache(maxsize=settings.EMBEDDINGS_CACHE_SIZE)
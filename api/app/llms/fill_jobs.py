@@ -0,0 +1,312 @@
+import asyncio
+import contextlib
+import json
+import logging
+from collections import defaultdict
+from datetime import UTC, datetime
+from uuid import UUID
+
+from asyncpg import Record
+
+from app.data.connection import Database
+from app.data.fill_jobs import (
+    claim_fill_job_query,
+    count_fill_rows_query,
+    create_fill_job_query,
+    finish_fill_job_query,
+    get_fill_rows_query,
+    record_fill_batch_query,
+    renew_fill_job_lease_query,
+)
+from app.llms.embeddings import embed_question_rows
+from app.llms.models import MODEL_EMBEDDINGS_COLUMNS, Model
+from app.schemas.fill_jobs import FillJobSchema
+from app.utils.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+settings = Settings()
+
+
+class FillJobCancelledError(Exception):
+    """
+    Raised inside a job's workers once the job has been cancelled.
+    """
+
+
+async def create_fill_job(
+    db: Database,
+    models: list[Model],
+    *,
+    questions: list[str] | None,
+    all_questions: bool,
+) -> FillJobSchema | None:
+    """
+    Store a pending fill job; a runner picks it up and processes it.
+    """
+    if all_questions or not questions:
+        questions = None
+
+    # Models sharing a column fill the same unfilled rows, and only the first
+    # one finds them unfilled, so each column is counted once
+    counted = models
+    if not all_questions and not questions:
+        models_by_column: dict[str, Model] = {}
+        for model in models:
+            models_by_column.setdefault(MODEL_EMBEDDINGS_COLUMNS[model], model)
+        counted = list(models_by_column.values())
+
+    total = 0
+    for model in counted:
+        total += await count_fill_rows_query(
+            db,
+            model,
+            questions=questions,
+            all_questions=all_questions,
+        )
+
+    job = await create_fill_job_query(
+        db,
+        models,
+        questions=questions,
+        all_questions=all_questions,
+        total=total,
+    )
+    fill_job_runner.wakeup.set()
+
+    return job
+
+
+class FillJobRunner:
+    """
+    Background worker executing embedding fill jobs stored in Postgres.
+    Jobs are leased, and a heartbeat renews the lease every
+    FILL_JOB_HEARTBEAT_INTERVAL independently of how long a batch takes.
+    Every batch records a per-model cursor of the last processed question. A
+    job whose worker crashed is picked up again once its lease expires and
+    resumes after its cursors, so no work is repeated or lost.
+    """
+
+    def __init__(self) -> None:
+        """
+        Create an idle runner; call `start` to begin processing.
+        """
+        self.db: Database | None = None
+        self.task: asyncio.Task | None = None
+        self.wakeup = asyncio.Event()
+        self.jobs: dict[UUID, asyncio.Task] = {}
+
+    def start(self, db: Database) -> None:
+        """
+        Start claiming and running jobs in the background.
+        """
+        if self.task is not None:
+            return
+
+        self.db = db
+        self.task = asyncio.create_task(self.run())
+        logger.info("Fill job runner started")
+
+    async def stop(self) -> None:
+        """
+        Stop the runner and its jobs. Interrupted jobs are resumed by the next
+        runner once their lease expires.
+        """
+        tasks = [task for task in (self.task, *self.jobs.values()) if task]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+        self.task = None
+        self.jobs.clear()
+        logger.info("Fill job runner stopped")
+
+    def cancel(self, job_id: UUID) -> None:
+        """
+        Stop the job right away if it runs in this process. Jobs running
+        elsewhere notice the cancellation at their next heartbeat or batch.
+        """
+        task = self.jobs.get(job_id)
+        if task is not None:
+            task.cancel()
+
+    async def run(self) -> None:
+        """
+        Claim jobs while below the concurrency limit, until cancelled.
+        """
+        while True:
+            self.wakeup.clear()
+
+            try:
+                claimed = await self.claim()
+            except Exception:
+                logger.exception("Failed to claim a fill job")
+                claimed = False
+
+            if claimed:
+                continue
+
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(
+                    self.wakeup.wait(),
+                    timeout=settings.FILL_JOB_POLL_INTERVAL,
+                )
+
+    async def claim(self) -> bool:
+        """
+        Claim and start one job. Returns whether a job was started.
+        """
+        if self.db is None or len(self.jobs) >= settings.FILL_JOB_MAX_CONCURRENT:
+            return False
+
+        job = await claim_fill_job_query(self.db, settings.FILL_JOB_LEASE)
+        if job is None:
+            return False
+
+        job_id: UUID = job["id"]
+        logger.info("Running fill job %s", job_id)
+
+        task = asyncio.create_task(self.run_job(self.db, job))
+        self.jobs[job_id] = task
+        task.add_done_callback(lambda _: self.jobs.pop(job_id, None))
+        task.add_done_callback(lambda _: self.wakeup.set())
+
+        return True
+
+    async def run_job(self, db: Database, job: Record) -> None:
+        """
+        Fill every model of the job, one worker per embedding column, while
+        a heartbeat keeps the job leased, and record the outcome.
+        """
+        job_id: UUID = job["id"]
+        cursors: dict[str, str] = json.loads(job["cursors"])
+
+        models_by_column: dict[str, list[Model]] = defaultdict(list)
+        for value in job["models"]:
+            model = Model(value)
+            models_by_column[MODEL_EMBEDDINGS_COLUMNS[model]].append(model)
+
+        async def _fill_column(models: list[Model]) -> None:
+            for model in models:
+                cursor = cursors.get(model.value)
+                await self.fill_model(
+                    db,
+                    job,
+                    model,
+                    UUID(cursor) if cursor else None,
+                )
+
+        heartbeat = asyncio.create_task(self.heartbeat(db, job_id))
+
+        try:
+            async with asyncio.TaskGroup() as group:
+                for models in models_by_column.values():
+                    group.create_task(_fill_column(models))
+        except* FillJobCancelledError:
+            logger.info("Fill job %s was cancelled", job_id)
+        except* Exception as e:
+            logger.exception("Fill job %s failed", job_id)
+            await finish_fill_job_query(
+                db,
+                job_id,
+                "failed",
+                "; ".join(repr(error) for error in e.exceptions),
+            )
+        else:
+            logger.info("Fill job %s completed", job_id)
+            await finish_fill_job_query(db, job_id, "completed")
+        finally:
+            heartbeat.cancel()
+
+    async def heartbeat(self, db: Database, job_id: UUID) -> None:
+        """
+        Renew the job's lease until cancelled, and stop the job once it is
+        no longer running.
+        """
+        while True:
+            await asyncio.sleep(settings.FILL_JOB_HEARTBEAT_INTERVAL)
+
+            try:
+                status = await renew_fill_job_lease_query(
+                    db,
+                    job_id,
+                    settings.FILL_JOB_LEASE,
+                )
+            except Exception:
+                logger.exception("Failed to renew the lease of fill job %s", job_id)
+                continue
+
+            if status != "running":
+                logger.info("Fill job %s is no longer running, stopping it", job_id)
+                self.cancel(job_id)
+                return
+
+    async def fill_model(
+        self,
+        db: Database,
+        job: Record,
+        model: Model,
+        cursor: UUID | None,
+    ) -> None:
+        """
+        Embed the job's questions for one model in batches, starting after the
+        cursor, and record each batch's events and new cursor.
+        """
+        while True:
+            rows = await get_fill_rows_query(
+                db,
+                model,
+                questions=job["questions"],
+                all_questions=job["all_questions"],
+                after=cursor,
+                limit=settings.EMBEDDINGS_FILL_BATCH_SIZE,
+            )
+            if not rows:
+                return
+
+            result = "ok"
+            error_detail = ""
+
+            try:
+                await embed_question_rows(db, model, rows)
+            except Exception as e:
+                result = "error"
+                error_detail = repr(e)
+
+            cursor = rows[-1]["id"]
+            status = await record_fill_batch_query(
+                db,
+                job["id"],
+                model,
+                cursor,
+                [
+                    {
+                        "status": result,
+                        "error": error_detail,
+                        "model": model.value,
+                        "id": str(row["id"]),
+                        "name": row["name"],
+                        "ts": datetime.now(UTC).isoformat() + "Z",
+                    }
+                    for row in rows
+                ],
+                failed=len(rows) if result == "error" else 0,
+                lease=settings.FILL_JOB_LEASE,
+            )
+
+            if status != "running":
+                raise FillJobCancelledError
+
+    def stats(self) -> dict[str, int | float]:
+        """
+        Return the number of jobs running in this worker.
+        """
+        return {
+            "running": len(self.jobs),
+            "max_concurrent": settings.FILL_JOB_MAX_CONCURRENT,
+        }
+
+
+fill_job_runner = FillJobRunner()
@@ -12,12 +12,23 @@ from pydantic import SecretStr
 from app.llms.agents import create_agent_token_generator, stream_sync_gen_as_sse
 from app.llms.mcp import build_mcp_client
 from app.llms.models import Model
+from app.utils.rate_limit import ProviderRateLimiter, estimate_tokens
 from app.utils.settings import Settings
 
 logger = logging.getLogger(__name__)
 
 settings = Settings()
 
+google_rate_limiter = ProviderRateLimiter(
+    "Google",
+    requests_per_minute=settings.GOOGLE_REQUESTS_PER_MINUTE,
+    tokens_per_minute=settings.GOOGLE_TOKENS_PER_MINUTE,
+    processes=settings.WORKERS,
+    max_retries=settings.RATE_LIMIT_MAX_RETRIES,
+    backoff_base=settings.RATE_LIMIT_BACKOFF_BASE,
+    backoff_max=settings.RATE_LIMIT_BACKOFF_MAX,
+)
+
 # Model, temperature, top_p, max_tokens -> LLM
 google_llm_clients: dict[tuple[str, float, float, int], ChatGoogleGenerativeAI] = {}
 google_embedders: dict[str, GoogleGenerativeAIEmbeddings] = {}
@@ -31,9 +42,13 @@ def get_google_embedder(model: Model) -> GoogleGenerativeAIEmbeddings:
     key = model.value
 
     if key not in google_embedders:
+        # Questions have always been embedded one by one with embed_query, so
+        # batches pin the same task type instead of embed_documents' default
+        # RETRIEVAL_DOCUMENT, keeping every stored vector comparable
         google_embedders[key] = GoogleGenerativeAIEmbeddings(
             model=model.value,
             api_key=SecretStr(settings.GOOGLE_API_KEY),
+            task_type="RETRIEVAL_QUERY",
         )
 
     return google_embedders[key]
@@ -95,9 +110,15 @@ async def generate_google_embeddings(
     emb = get_google_embedder(model)
 
     if isinstance(text, str):
-        return await asyncio.to_thread(emb.embed_query, text)
+        return await google_rate_limiter.call(
+            lambda: asyncio.to_thread(emb.embed_query, text),
+            tokens=estimate_tokens(text),
+        )
 
-    return await asyncio.to_thread(emb.embed_documents, text)
+    return await google_rate_limiter.call(
+        lambda: asyncio.to_thread(emb.embed_documents, text),
+        tokens=estimate_tokens(text),
+    )
 
 
 def stream_google_response(
@@ -160,6 +181,10 @@ async def stream_google_agent_response(
         model.value,
     )
 
+    await google_rate_limiter.acquire(
+        estimate_tokens([system_prompt, user_prompt]) + max_tokens,
+    )
+
     try:
         llm = get_google_llm(model, temperature, top_p, max_tokens)
 
@@ -179,7 +204,12 @@ async def stream_google_agent_response(
         ]
 
         return StreamingResponse(
-            create_agent_token_generator(agent, messages),
+            create_agent_token_generator(
+                agent,
+                messages,
+                provider="google",
+                rate_limiter=google_rate_limiter,
+            ),
             media_type="text/event-stream",
         )
 
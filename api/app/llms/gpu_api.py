@@ -1,17 +1,128 @@
 import asyncio
+import codecs
+import importlib.util
 import logging
 from collections.abc import AsyncGenerator
 
 import httpx
 from fastapi.responses import StreamingResponse
 
+from app.constants.defaults import STREAM_ERROR_MESSAGE
 from app.llms.models import GPU_API_MODELS, Model
+from app.utils.metrics import PROVIDER_ERRORS, observe_provider_call
 from app.utils.settings import Settings
 
 logger = logging.getLogger(__name__)
 
 settings = Settings()
 
+gpu_api_client: httpx.AsyncClient | None = None
+gpu_api_transport: httpx.AsyncHTTPTransport | None = None
+gpu_api_requests_total = 0
+
+
+async def _count_request(request: httpx.Request) -> None:
+    global gpu_api_requests_total  # noqa: PLW0603
+
+    gpu_api_requests_total += 1
+
+
+def init_gpu_api_client() -> httpx.AsyncClient:
+    """
+    Return the app-wide pooled HTTP client for the GPU API service.
+    If the client is not already created, it initializes a new one with the
+    configured connection limits, keep-alive and (optionally) HTTP/2.
+    """
+    global gpu_api_client, gpu_api_transport  # noqa: PLW0603
+
+    if gpu_api_client is not None:
+        return gpu_api_client
+
+    http2 = settings.GPU_API_HTTP2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning(
+            "HTTP/2 requested for the GPU API, but the 'h2' package is not installed. Using HTTP/1.1",
+        )
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=settings.GPU_API_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.GPU_API_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.GPU_API_KEEPALIVE_EXPIRY,
+    )
+
+    logger.info(
+        "Initializing GPU API client with limits: %s, HTTP/2: %s",
+        limits,
+        http2,
+    )
+
+    gpu_api_transport = httpx.AsyncHTTPTransport(limits=limits, http2=http2)
+    gpu_api_client = httpx.AsyncClient(
+        base_url=settings.GPU_API_URL,
+        transport=gpu_api_transport,
+        timeout=300,
+        event_hooks={"request": [_count_request]},
+    )
+
+    return gpu_api_client
+
+
+def get_gpu_api_client() -> httpx.AsyncClient:
+    """
+    Return the pooled GPU API client, initializing it if the lifespan has not.
+    """
+    if gpu_api_client is None:
+        logger.warning("GPU API client not initialized, calling init_gpu_api_client()")
+
+    return init_gpu_api_client()
+
+
+async def close_gpu_api_client() -> None:
+    """
+    Close the pooled GPU API client and its connections.
+    """
+    global gpu_api_client, gpu_api_transport  # noqa: PLW0603
+
+    if gpu_api_client is not None:
+        logger.info("Closing GPU API client")
+        await gpu_api_client.aclose()
+        gpu_api_client = None
+        gpu_api_transport = None
+
+
+def get_gpu_api_client_stats() -> dict[str, int | float]:
+    """
+    Return connection pool statistics for the GPU API client.
+    """
+    stats: dict[str, int | float] = {
+        "max_connections": settings.GPU_API_MAX_CONNECTIONS,
+        "max_keepalive_connections": settings.GPU_API_MAX_KEEPALIVE_CONNECTIONS,
+        "requests": gpu_api_requests_total,
+        "connections": 0,
+        "idle_connections": 0,
+        "active_connections": 0,
+    }
+
+    if gpu_api_transport is None:
+        return stats
+
+    # httpx does not expose its connection pool, so this reads the transport's
+    # private httpcore pool. Should an httpx upgrade change that, the counts
+    # are left at 0 rather than failing the stats
+    try:
+        connections = list(gpu_api_transport._pool.connections)  # noqa: SLF001
+        idle = sum(1 for connection in connections if connection.is_idle())
+    except AttributeError:
+        logger.debug("GPU API connection pool is not inspectable")
+        return stats
+
+    stats["connections"] = len(connections)
+    stats["idle_connections"] = idle
+    stats["active_connections"] = len(connections) - idle
+
+    return stats
+
 
 async def generate_gpu_api_embeddings(
     text: str | list[str],
@@ -26,26 +137,58 @@ async def generate_gpu_api_embeddings(
         model.value,
     )
 
-    gpu_api_url = f"{settings.GPU_API_URL}/embeddings/embed"
-
     payload = {
         "input": text,
         "embeddings_model": GPU_API_MODELS[model],
     }
 
-    async with httpx.AsyncClient(timeout=300) as client:
-        response = await client.post(
-            gpu_api_url,
+    response = await get_gpu_api_client().post(
+        "/embeddings/embed",
+        json=payload,
+        headers={"Content-Type": "application/json"},
+    )
+
+    response.raise_for_status()
+
+    result = response.json()
+    embeddings = result.get("embeddings")
+
+    return embeddings
+
+
+async def rerank_with_gpu_api(
+    query: str,
+    documents: list[str],
+    *,
+    top_n: int | None = None,
+) -> list[tuple[int, float]]:
+    """
+    Re-rank documents by their relevance to the query using the GPU API service.
+    Returns (index, score) pairs, most relevant first; the documents aren't
+    sent back.
+    """
+    logger.info(
+        "Re-ranking %d documents with the GPU API",
+        len(documents),
+    )
+
+    payload = {
+        "query": query,
+        "documents": documents,
+        "top_n": top_n,
+        "return_documents": False,
+    }
+
+    with observe_provider_call("gpu-api", "rerank"):
+        response = await get_gpu_api_client().post(
+            "/rerank/",
             json=payload,
-            headers={"Content-Type": "application/json"},
+            timeout=30.0,
         )
 
         response.raise_for_status()
 
-        result = response.json()
-        embeddings = result.get("embeddings")
-
-        return embeddings
+    return [(result["index"], result["score"]) for result in response.json()["results"]]
 
 
 def stream_gpu_api_response(
@@ -66,8 +209,6 @@ def stream_gpu_api_response(
         model.value,
     )
 
-    gpu_api_url = f"{settings.GPU_API_URL}/stream/"
-
     payload = {
         "prompt": user_prompt,
         "inference_model": model.value,
@@ -79,15 +220,12 @@ def stream_gpu_api_response(
 
     async def stream_from_gpu_api() -> AsyncGenerator[str]:
         try:
-            async with (
-                httpx.AsyncClient(timeout=300) as client,
-                client.stream(
-                    "POST",
-                    gpu_api_url,
-                    json=payload,
-                    headers={"Content-Type": "application/json"},
-                ) as response,
-            ):
+            async with get_gpu_api_client().stream(
+                "POST",
+                "/stream/",
+                json=payload,
+                headers={"Content-Type": "application/json"},
+            ) as response:
                 if response.status_code != 200:
                     error_text = await response.aread()
                     logger.error(
@@ -95,23 +233,30 @@ def stream_gpu_api_response(
                         response.status_code,
                         error_text.decode(),
                     )
-                    yield "data: An error occurred while processing your request. Please try again.\n\n"
+                    PROVIDER_ERRORS.labels(provider="gpu-api", operation="stream").inc()
+                    yield f"data: {STREAM_ERROR_MESSAGE}\n\n"
                     return
 
+                # Tokens arrive one at a time, so a multi-byte character can
+                # be split across chunks
+                decoder = codecs.getincrementaldecoder("utf-8")()
                 async for chunk in response.aiter_bytes():
-                    if chunk:
-                        yield chunk.decode("utf-8")
+                    text = decoder.decode(chunk)
+                    if text:
+                        yield text
 
         except httpx.RequestError:
             logger.exception("Connection error to GPU API")
-            yield "data: An error occurred while processing your request. Please try again.\n\n"
+            PROVIDER_ERRORS.labels(provider="gpu-api", operation="stream").inc()
+            yield f"data: {STREAM_ERROR_MESSAGE}\n\n"
         except asyncio.CancelledError:
             logger.exception("Streaming cancelled from GPU API")
 
             raise
         except Exception:
             logger.exception("Unexpected error while streaming from GPU API")
-            yield "data: An error occurred while processing your request. Please try again.\n\n"
+            PROVIDER_ERRORS.labels(provider="gpu-api", operation="stream").inc()
+            yield f"data: {STREAM_ERROR_MESSAGE}\n\n"
 
     return StreamingResponse(
         stream_from_gpu_api(),
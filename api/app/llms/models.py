@@ -44,6 +44,15 @@ MODEL_EMBEDDINGS_COLUMNS: dict[Model, str] = {
     Model.MULTILINGUAL_E5_LARGE: "embedding_multilingual_e5_large",
 }
 
+EMBEDDING_MODEL_PROVIDERS: dict[Model, str] = {
+    Model.LLAMA_3_3_70B: "ollama",
+    Model.BGE_M3: "ollama",
+    Model.BGE_M3_LOCAL: "gpu-api",
+    Model.TEXT_EMBEDDING_3_LARGE: "openai",
+    Model.GEMINI_EMBEDDING_001: "google",
+    Model.MULTILINGUAL_E5_LARGE: "gpu-api",
+}
+
 GPU_API_MODELS: dict[Model, str] = {
     Model.BGE_M3_LOCAL: "BAAI/bge-m3",
     Model.MULTILINGUAL_E5_LARGE: "intfloat/multilingual-e5-large",
@@ -165,7 +165,7 @@ async def stream_ollama_agent_response(
         ]
 
         return StreamingResponse(
-            create_agent_token_generator(agent, messages),
+            create_agent_token_generator(agent, messages, provider="ollama"),
             media_type="text/event-stream",
         )
 
@@ -12,14 +12,26 @@ from app.llms.agents import create_agent_token_generator, stream_sync_gen_as_sse
 from app.llms.mcp import build_mcp_client
 from app.llms.models import Model
 from app.llms.prompts import stitch_system_user
+from app.utils.metrics import observe_provider_call
+from app.utils.rate_limit import ProviderRateLimiter, estimate_tokens
 from app.utils.settings import Settings
 
 logger = logging.getLogger(__name__)
 
 settings = Settings()
 
-# Model, temperature, top_p, max_tokens -> LLM
-openai_llm_clients: dict[tuple[str, float, float, int], ChatOpenAI] = {}
+openai_rate_limiter = ProviderRateLimiter(
+    "OpenAI",
+    requests_per_minute=settings.OPENAI_REQUESTS_PER_MINUTE,
+    tokens_per_minute=settings.OPENAI_TOKENS_PER_MINUTE,
+    processes=settings.WORKERS,
+    max_retries=settings.RATE_LIMIT_MAX_RETRIES,
+    backoff_base=settings.RATE_LIMIT_BACKOFF_BASE,
+    backoff_max=settings.RATE_LIMIT_BACKOFF_MAX,
+)
+
+# Model, temperature, top_p, max_tokens, max_retries -> LLM
+openai_llm_clients: dict[tuple[str, float, float, int, int | None], ChatOpenAI] = {}
 openai_embedders: dict[str, OpenAIEmbeddings] = {}
 
 
@@ -31,9 +43,11 @@ def get_openai_embedder(model: Model) -> OpenAIEmbeddings:
     key = model.value
 
     if key not in openai_embedders:
+        # Retries are left to openai_rate_limiter, which every call goes through
         openai_embedders[key] = OpenAIEmbeddings(
             model=model.value,
             api_key=SecretStr(settings.OPENAI_API_KEY),  # type: ignore[call-arg]
+            max_retries=0,
         )
 
     return openai_embedders[key]
@@ -44,12 +58,16 @@ def get_openai_llm(
     temperature: float,
     top_p: float,
     max_tokens: int,
+    *,
+    max_retries: int | None = None,
 ) -> ChatOpenAI:
     """
     Return a singleton ChatOpenAI instance for the specified model and sampling parameters.
     If the model and parameters are not already in the cache, create a new instance.
+    `max_retries` overrides the client's own retries, e.g. with 0 for calls
+    retried by `openai_rate_limiter`.
     """
-    key = (model.value, temperature, top_p, max_tokens)
+    key = (model.value, temperature, top_p, max_tokens, max_retries)
 
     if key not in openai_llm_clients:
         openai_llm_clients[key] = ChatOpenAI(
@@ -59,6 +77,7 @@ def get_openai_llm(
             top_p=top_p,
             streaming=True,
             max_tokens=max_tokens,  # type: ignore[call-arg]
+            max_retries=max_retries,
         )
 
     return openai_llm_clients[key]
@@ -95,9 +114,15 @@ async def generate_openai_embeddings(
     emb = get_openai_embedder(model)
 
     if isinstance(text, str):
-        return await asyncio.to_thread(emb.embed_query, text)
+        return await openai_rate_limiter.call(
+            lambda: asyncio.to_thread(emb.embed_query, text),
+            tokens=estimate_tokens(text),
+        )
 
-    return await asyncio.to_thread(emb.embed_documents, text)
+    return await openai_rate_limiter.call(
+        lambda: asyncio.to_thread(emb.embed_documents, text),
+        tokens=estimate_tokens(text),
+    )
 
 
 def stream_openai_response(
@@ -148,6 +173,10 @@ async def stream_openai_agent_response(
         model.value,
     )
 
+    await openai_rate_limiter.acquire(
+        estimate_tokens([system_prompt, user_prompt]) + max_tokens,
+    )
+
     try:
         llm = get_openai_llm(model, temperature, top_p, max_tokens)
 
@@ -167,7 +196,12 @@ async def stream_openai_agent_response(
         ]
 
         return StreamingResponse(
-            create_agent_token_generator(agent, messages),
+            create_agent_token_generator(
+                agent,
+                messages,
+                provider="openai",
+                rate_limiter=openai_rate_limiter,
+            ),
             media_type="text/event-stream",
         )
 
@@ -194,10 +228,10 @@ async def transform_query_with_openai(
     temperature: float,
     top_p: float,
     max_tokens: int,
-) -> str:
+) -> str | None:
     """
     Transform a query using the specified OpenAI model and system prompt.
-    If the transformation fails, return the original query.
+    If the transformation fails, return None.
     """
 
     logger.info(
@@ -207,16 +241,20 @@ async def transform_query_with_openai(
     )
 
     try:
-        llm = get_openai_llm(model, temperature, top_p, max_tokens)
+        llm = get_openai_llm(model, temperature, top_p, max_tokens, max_retries=0)
 
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": query},
         ]
 
-        response = await llm.ainvoke(messages)
+        with observe_provider_call("openai", "transform"):
+            response = await openai_rate_limiter.call(
+                lambda: llm.ainvoke(messages),
+                tokens=estimate_tokens([system_prompt, query]) + max_tokens,
+            )
         return response.content.strip()  # type: ignore[union-attr]
     except Exception:
-        logger.exception("Query transformation failed: %s. Using original query.")
+        logger.exception("Query transformation failed")
 
-        return query
+        return None
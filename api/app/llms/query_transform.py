@@ -3,9 +3,27 @@ import logging
 from app.llms.models import Model
 from app.llms.openai import transform_query_with_openai
 from app.llms.prompts import DEFAULT_QUERY_TRANSFORM_SYSTEM_PROMPT
+from app.utils.cache import LRUCache
+from app.utils.settings import Settings
 
 logger = logging.getLogger(__name__)
 
+settings = Settings()
+
+# Model, system prompt, normalized query -> transformed query
+query_transform_cache: LRUCache[tuple[str, str, str], str] = LRUCache(
+    maxsize=settings.QUERY_TRANSFORM_CACHE_SIZE,
+    ttl=settings.QUERY_TRANSFORM_CACHE_TTL,
+    name="query_transform",
+)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query for cache lookups by collapsing whitespace and case.
+    """
+    return " ".join(query.split()).casefold()
+
 
 async def transform_query(
     query: str,
@@ -15,12 +33,21 @@ async def transform_query(
     temperature: float,
     top_p: float,
     max_tokens: int,
+    use_cache: bool = True,
 ) -> str:
     logger.info(
         "Transforming query: '%s'",
         query,
     )
 
+    cache_key = (model.value, system_prompt, normalize_query(query))
+
+    if use_cache:
+        cached = query_transform_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Query transform cache hit for query: '%s'", query)
+            return cached
+
     match model:
         case (
             Model.GPT_4O_MINI
@@ -30,7 +57,7 @@ async def transform_query(
             | Model.GPT_5_MINI
             | Model.GPT_5_NANO
         ):
-            return await transform_query_with_openai(
+            transformed = await transform_query_with_openai(
                 query,
                 model,
                 system_prompt=system_prompt,
@@ -41,3 +68,12 @@ async def transform_query(
 
         case _:
             raise ValueError(f"Unsupported model: {model}")
+
+    if transformed is None:
+        logger.info("Using the original query: '%s'", query)
+        return query
+
+    if use_cache:
+        query_transform_cache.set(cache_key, transformed)
+
+    return transformed
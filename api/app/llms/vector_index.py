@@ -0,0 +1,417 @@
+import asyncio
+import contextlib
+import logging
+import time
+from typing import Self
+from uuid import UUID
+
+import numpy as np
+
+from app.data.connection import Database
+from app.data.notifications import NotificationListener
+from app.data.questions import (
+    EMBEDDING_COLUMNS,
+    get_question_rows_query,
+    row_to_question,
+)
+from app.llms.models import MODEL_EMBEDDINGS_COLUMNS, Model
+from app.schemas.questions import QuestionSchema
+from app.utils.database import Vector
+from app.utils.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+settings = Settings()
+
+QUESTION_CHANGES_CHANNEL = "question_changes"
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    Scale each row to unit length, leaving all-zero rows as they are.
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+
+    return matrix / norms
+
+
+class VectorIndex:
+    """
+    Exact cosine index over one embedding column: question ids and a matrix
+    of their unit-length float32 vectors. Indexes are immutable; updates
+    build a new one.
+    """
+
+    def __init__(self, ids: list[UUID], matrix: np.ndarray) -> None:
+        """
+        Create an index from ids and their already normalized vectors.
+        """
+        self.ids: list[UUID] = ids
+        self.matrix: np.ndarray = matrix
+        self.positions: dict[UUID, int] = {
+            question_id: i for i, question_id in enumerate(ids)
+        }
+
+    @classmethod
+    def build(cls, vectors: dict[UUID, np.ndarray]) -> Self | None:
+        """
+        Build an index from raw vectors, or return None if there are none.
+        """
+        if not vectors:
+            return None
+
+        ids = list(vectors)
+        matrix = np.stack([vectors[question_id] for question_id in ids])
+
+        return cls(ids, normalize_rows(matrix.astype(np.float32, copy=False)))
+
+    @property
+    def dimensions(self) -> int:
+        return int(self.matrix.shape[1])
+
+    def get(self, question_id: UUID) -> np.ndarray | None:
+        """
+        Return the question's normalized vector, if it is indexed.
+        """
+        position = self.positions.get(question_id)
+        return self.matrix[position] if position is not None else None
+
+    def update(self, vectors: dict[UUID, np.ndarray | None]) -> Self | None:
+        """
+        Build an index with the given questions' normalized vectors replaced,
+        or removed where None. Returns None if no vectors are left.
+        """
+        keep = [
+            i for i, question_id in enumerate(self.ids) if question_id not in vectors
+        ]
+        added = {
+            question_id: vector
+            for question_id, vector in vectors.items()
+            if vector is not None
+        }
+
+        ids = [self.ids[i] for i in keep] + list(added)
+        if not ids:
+            return None
+
+        matrix = self.matrix[keep]
+        if added:
+            matrix = np.concatenate([matrix, np.stack(list(added.values()))])
+
+        return type(self)(ids, matrix)
+
+    def search(
+        self,
+        query: Vector,
+        *,
+        limit: int,
+        threshold: float,
+    ) -> list[tuple[UUID, float]]:
+        """
+        Return up to `limit` (id, cosine distance) pairs closer than
+        `threshold`, closest first.
+        """
+        vector = np.asarray(query, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0 or limit <= 0:
+            return []
+
+        distances = 1.0 - self.matrix @ (vector / norm)
+
+        if limit < len(distances):
+            candidates = np.argpartition(distances, limit)[:limit]
+        else:
+            candidates = np.arange(len(distances))
+        candidates = candidates[np.argsort(distances[candidates])]
+
+        return [
+            (self.ids[i], float(distances[i]))
+            for i in candidates
+            if distances[i] < threshold
+        ]
+
+
+class QuestionIndex:
+    """
+    In-memory copy of the questions with a `VectorIndex` per embedding
+    column, so retrieval runs as one matrix product instead of a Postgres
+    query. It is loaded at startup and kept fresh through notifications on
+    `question_changes`: changed questions are re-read in debounced batches,
+    and only the columns whose vectors changed are rebuilt. Everything is
+    reloaded whenever the listener (re)connects. Only the normalized vectors
+    are kept in memory.
+
+    With external vectors, only the questions are read from the database and
+    the indexes are swapped in from a shared snapshot (see `vector_snapshots`).
+    """
+
+    def __init__(self) -> None:
+        """
+        Create an empty index; call `start` to load it.
+        """
+        self.db: Database | None = None
+        self.questions: dict[UUID, QuestionSchema] = {}
+        self.indexes: dict[str, VectorIndex] = {}
+        self.external_vectors: bool = False
+        self.ready: bool = False
+        self.vectors_ready: bool = False
+
+        self.pending: set[UUID] = set()
+        self.reload_requested: bool = False
+        self.wakeup = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+        self.refreshes: int = 0
+        self.swaps: int = 0
+        self.loaded_at: float = 0.0
+
+    async def start(
+        self,
+        db: Database,
+        listener: NotificationListener,
+        *,
+        external_vectors: bool = False,
+    ) -> None:
+        """
+        Subscribe to question changes and load the index. Start the listener
+        after this: once it is listening it requests a reload, which picks up
+        any change committed between the load and LISTEN. With
+        `external_vectors`, the indexes are provided through `swap`.
+        """
+        self.db = db
+        self.external_vectors = external_vectors
+        listener.subscribe(QUESTION_CHANGES_CHANNEL, self.notify)
+        listener.on_connect(self.request_reload)
+
+        try:
+            await self.load()
+        except Exception:
+            logger.exception("Failed to load the question index")
+            self.request_reload()
+
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.task
+            self.task = None
+
+    def notify(self, payload: str) -> None:
+        """
+        Queue a changed question for refresh.
+        """
+        try:
+            self.pending.add(UUID(payload))
+        except ValueError:
+            logger.warning("Ignoring malformed question notification: %s", payload)
+            return
+
+        self.wakeup.set()
+
+    def request_reload(self) -> None:
+        """
+        Queue a full reload, e.g. after notifications may have been missed.
+        """
+        self.reload_requested = True
+        self.wakeup.set()
+
+    async def run(self) -> None:
+        """
+        Apply queued changes in debounced batches until cancelled.
+        """
+        while True:
+            await self.wakeup.wait()
+            await asyncio.sleep(settings.VECTOR_INDEX_REFRESH_DEBOUNCE)
+            self.wakeup.clear()
+
+            reload_requested, self.reload_requested = self.reload_requested, False
+            pending, self.pending = self.pending, set()
+
+            try:
+                if reload_requested:
+                    await self.load()
+                elif pending:
+                    await self.refresh(pending)
+            except Exception:
+                logger.exception("Failed to refresh the question index")
+                self.reload_requested |= reload_requested
+                self.pending |= pending
+                await asyncio.sleep(settings.VECTOR_INDEX_REFRESH_DEBOUNCE)
+                self.wakeup.set()
+
+    async def load(self) -> None:
+        """
+        Replace the index with every question currently in the database.
+        """
+        if self.db is None:
+            return
+
+        rows = await get_question_rows_query(
+            self.db,
+            include_embeddings=not self.external_vectors,
+        )
+
+        self.questions = {row["id"]: row_to_question(row) for row in rows}
+
+        if not self.external_vectors:
+            for column in EMBEDDING_COLUMNS:
+                self.set_index(
+                    column,
+                    VectorIndex.build(
+                        {
+                            row["id"]: np.asarray(row[column], dtype=np.float32)
+                            for row in rows
+                            if row[column] is not None
+                        },
+                    ),
+                )
+            self.vectors_ready = True
+        self.ready = True
+        self.loaded_at = time.time()
+
+        logger.info("Loaded %d questions into the question index", len(rows))
+
+    async def refresh(self, question_ids: set[UUID]) -> None:
+        """
+        Re-read the changed questions; ones no longer in the database are
+        removed. Only the indexes whose vectors changed are rebuilt.
+        """
+        if self.db is None:
+            return
+
+        rows = await get_question_rows_query(
+            self.db,
+            list(question_ids),
+            include_embeddings=not self.external_vectors,
+        )
+
+        for question_id in question_ids:
+            self.questions.pop(question_id, None)
+        for row in rows:
+            self.questions[row["id"]] = row_to_question(row)
+
+        if not self.external_vectors:
+            rows_by_id = {row["id"]: row for row in rows}
+            for column in EMBEDDING_COLUMNS:
+                self.update_column(
+                    column,
+                    {
+                        question_id: (
+                            rows_by_id[question_id][column]
+                            if question_id in rows_by_id
+                            else None
+                        )
+                        for question_id in question_ids
+                    },
+                )
+        self.refreshes += 1
+
+        logger.debug("Refreshed %d questions in the question index", len(question_ids))
+
+    def update_column(
+        self,
+        column: str,
+        vectors: dict[UUID, Vector | None],
+    ) -> None:
+        """
+        Apply the questions' current vectors (None if they have none) to the
+        column's index, rebuilding it only if any of them changed.
+        """
+        index = self.indexes.get(column)
+
+        changed: dict[UUID, np.ndarray | None] = {}
+        for question_id, vector in vectors.items():
+            current = index.get(question_id) if index is not None else None
+
+            if vector is None:
+                if current is not None:
+                    changed[question_id] = None
+                continue
+
+            normalized = normalize_rows(np.asarray([vector], dtype=np.float32))[0]
+            if current is None or not np.allclose(current, normalized):
+                changed[question_id] = normalized
+
+        if not changed:
+            return
+
+        if index is None:
+            added = {
+                question_id: vector
+                for question_id, vector in changed.items()
+                if vector is not None
+            }
+            self.set_index(column, VectorIndex.build(added))
+        else:
+            self.set_index(column, index.update(changed))
+
+    def set_index(self, column: str, index: VectorIndex | None) -> None:
+        if index is None:
+            self.indexes.pop(column, None)
+        else:
+            self.indexes[column] = index
+
+    def swap(self, indexes: dict[str, VectorIndex]) -> None:
+        """
+        Replace every index at once with externally built ones.
+        """
+        self.indexes = indexes
+        self.vectors_ready = True
+        self.swaps += 1
+
+    def search(
+        self,
+        query: Vector,
+        model: Model,
+        *,
+        limit: int = 8,
+        threshold: float = 0.5,
+    ) -> list[QuestionSchema] | None:
+        """
+        Return the closest questions, like `get_closest_questions`, or None if
+        the index cannot answer and the database should be queried instead.
+        """
+        if not self.ready or not self.vectors_ready:
+            return None
+
+        index = self.indexes.get(MODEL_EMBEDDINGS_COLUMNS[model])
+        if index is None:
+            return []
+
+        if len(query) != index.dimensions:
+            logger.warning(
+                "Query has %d dimensions, index for %s has %d",
+                len(query),
+                model,
+                index.dimensions,
+            )
+            return None
+
+        # A snapshot can briefly lag behind the questions, so skip deleted ones
+        return [
+            self.questions[question_id].model_copy(update={"distance": distance})
+            for question_id, distance in index.search(
+                query,
+                limit=limit,
+                threshold=threshold,
+            )
+            if question_id in self.questions
+        ]
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "ready": int(self.ready),
+            "questions": len(self.questions),
+            "vectors": sum(len(index.ids) for index in self.indexes.values()),
+            "bytes": sum(index.matrix.nbytes for index in self.indexes.values()),
+            "pending": len(self.pending),
+            "refreshes": self.refreshes,
+            "swaps": self.swaps,
+            "loaded_at": self.loaded_at,
+        }
+
+
+question_index = QuestionIndex()
@@ -0,0 +1,392 @@
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import shutil
+import socket
+import time
+from pathlib import Path
+from typing import Any
+from uuid import UUID
+
+import numpy as np
+from asyncpg import Connection, connect
+
+from app.data.connection import Database
+from app.data.notifications import NotificationListener
+from app.data.questions import (
+    EMBEDDING_COLUMNS,
+    get_embedding_vectors_query,
+    get_embeddings_fingerprint_query,
+)
+from app.llms.vector_index import (
+    QUESTION_CHANGES_CHANNEL,
+    QuestionIndex,
+    VectorIndex,
+    normalize_rows,
+)
+from app.utils.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+settings = Settings()
+
+VECTOR_SNAPSHOTS_CHANNEL = "vector_snapshots"
+
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+
+type Matrices = dict[str, tuple[list[UUID], np.ndarray]]
+
+# Snapshot layout, one directory per version:
+#
+#   <dir>/CURRENT                      name of the version workers should map
+#   <dir>/<version>/manifest.json      fingerprint, creation time, per-column shapes
+#   <dir>/<version>/<column>.npy       unit-length float32 matrix, one row per question
+#   <dir>/<version>/<column>.ids.json  question ids, the id at offset i owns row i
+
+
+def _write_file(path: Path, data: bytes | np.ndarray) -> None:
+    with path.open("wb") as f:
+        if isinstance(data, np.ndarray):
+            np.save(f, data, allow_pickle=False)
+        else:
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_current_version(directory: Path) -> str | None:
+    """
+    Return the version the CURRENT pointer names, if any.
+    """
+    try:
+        version = (directory / CURRENT_FILE).read_text().strip()
+    except FileNotFoundError:
+        return None
+
+    return version or None
+
+
+def read_manifest(directory: Path, version: str) -> dict[str, Any] | None:
+    try:
+        return json.loads((directory / version / MANIFEST_FILE).read_text())
+    except FileNotFoundError:
+        return None
+
+
+def write_snapshot(
+    directory: Path,
+    matrices: Matrices,
+    *,
+    fingerprint: str,
+) -> str:
+    """
+    Write a new snapshot version and point CURRENT at it. The version is
+    written to a temporary directory that is renamed into place, and CURRENT
+    is replaced atomically, so readers never see a partial snapshot.
+    """
+    version = str(time.time_ns())
+    staging = directory / f".{version}.tmp"
+    staging.mkdir(parents=True)
+
+    manifest: dict[str, Any] = {
+        "version": version,
+        "fingerprint": fingerprint,
+        "created_at": time.time(),
+        "columns": {},
+    }
+
+    for column, (ids, matrix) in matrices.items():
+        _write_file(staging / f"{column}.npy", matrix)
+        _write_file(
+            staging / f"{column}.ids.json",
+            json.dumps([str(question_id) for question_id in ids]).encode(),
+        )
+        manifest["columns"][column] = {
+            "count": len(ids),
+            "dimensions": int(matrix.shape[1]),
+        }
+
+    _write_file(staging / MANIFEST_FILE, json.dumps(manifest).encode())
+    staging.rename(directory / version)
+
+    pointer = directory / f".{CURRENT_FILE}.tmp"
+    _write_file(pointer, version.encode())
+    pointer.replace(directory / CURRENT_FILE)
+
+    return version
+
+
+def load_snapshot(directory: Path, version: str) -> dict[str, VectorIndex]:
+    """
+    Memory-map a snapshot version read-only and return an index per column.
+    The pages are shared by every process mapping the same version.
+    """
+    manifest = read_manifest(directory, version)
+    if manifest is None:
+        msg = f"Snapshot {version} has no manifest"
+        raise FileNotFoundError(msg)
+
+    indexes: dict[str, VectorIndex] = {}
+    for column, shape in manifest["columns"].items():
+        matrix = np.load(directory / version / f"{column}.npy", mmap_mode="r")
+        ids = [
+            UUID(value)
+            for value in json.loads(
+                (directory / version / f"{column}.ids.json").read_text(),
+            )
+        ]
+
+        expected = (shape["count"], shape["dimensions"])
+        if matrix.shape != expected or len(ids) != expected[0]:
+            msg = f"Snapshot {version} is inconsistent for {column}"
+            raise ValueError(msg)
+
+        indexes[column] = VectorIndex(ids, matrix)
+
+    return indexes
+
+
+def prune_snapshots(directory: Path, *, keep: int) -> None:
+    """
+    Delete all but the newest `keep` versions and leftover staging directories.
+    Workers still mapping a deleted version keep their pages until they swap.
+    """
+    current = read_current_version(directory)
+    versions = sorted(
+        (path for path in directory.iterdir() if path.is_dir()),
+        key=lambda path: path.name,
+    )
+    stale = [path for path in versions if path.name.startswith(".")]
+    published = [path for path in versions if not path.name.startswith(".")]
+    stale.extend(published[: max(len(published) - keep, 0)])
+
+    for path in stale:
+        if path.name != current:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class VectorSnapshots:
+    """
+    Share the question index vectors between the workers of one host through
+    memory-mapped snapshots. One worker per host, elected with a Postgres
+    advisory lock, exports a new snapshot after questions change; every
+    worker maps the version CURRENT points to and swaps it into the question
+    index when a newer one is announced on `vector_snapshots` (or noticed by
+    polling), without a restart.
+    """
+
+    def __init__(self) -> None:
+        """
+        Create an idle instance; call `start` to map and publish snapshots.
+        """
+        self.db: Database | None = None
+        self.dsn: str = ""
+        self.index: QuestionIndex | None = None
+        self.directory = Path(settings.VECTOR_SNAPSHOT_DIR)
+        self.lock_key = f"{VECTOR_SNAPSHOTS_CHANNEL}:{socket.gethostname()}"
+
+        self.lock_conn: Connection | None = None
+        self.version: str | None = None
+        self.dirty: bool = True
+        self.wakeup = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+        self.exports: int = 0
+        self.swaps: int = 0
+        self.last_export_seconds: float = 0.0
+
+    @property
+    def leader(self) -> bool:
+        return self.lock_conn is not None and not self.lock_conn.is_closed()
+
+    async def start(
+        self,
+        db: Database,
+        listener: NotificationListener,
+        index: QuestionIndex,
+        *,
+        dsn: str,
+    ) -> None:
+        """
+        Map the current snapshot, if there is one, and start watching for and
+        publishing new ones. Subscribe before the listener is started.
+        """
+        self.db = db
+        self.dsn = dsn
+        self.index = index
+
+        listener.subscribe(QUESTION_CHANGES_CHANNEL, self.mark_dirty)
+        listener.subscribe(VECTOR_SNAPSHOTS_CHANNEL, lambda _: self.wakeup.set())
+        listener.on_connect(self.mark_dirty)
+
+        await asyncio.to_thread(self.directory.mkdir, parents=True, exist_ok=True)
+        try:
+            await self.swap_to_current()
+        except Exception:
+            logger.exception("Failed to map the current vector snapshot")
+
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.task
+            self.task = None
+
+        await self.release_leadership()
+
+    def mark_dirty(self, _: str | None = None) -> None:
+        """
+        Note that the snapshot may be outdated; only the leader acts on it.
+        """
+        self.dirty = True
+        if self.leader:
+            self.wakeup.set()
+
+    async def run(self) -> None:
+        """
+        Swap to newer snapshots and, while leader, export them, until cancelled.
+        """
+        while True:
+            try:
+                await self.swap_to_current()
+
+                if await self.acquire_leadership() and self.dirty:
+                    await asyncio.sleep(settings.VECTOR_SNAPSHOT_EXPORT_DEBOUNCE)
+                    self.dirty = False
+                    await self.export()
+                    continue
+            except Exception:
+                logger.exception("Vector snapshot maintenance failed")
+
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(
+                    self.wakeup.wait(),
+                    timeout=settings.VECTOR_SNAPSHOT_POLL_INTERVAL,
+                )
+            self.wakeup.clear()
+
+    async def acquire_leadership(self) -> bool:
+        """
+        Try to take this host's advisory lock on a dedicated connection; the
+        lock is held until that connection closes.
+        """
+        if self.leader:
+            return True
+
+        await self.release_leadership()
+
+        conn = await connect(dsn=self.dsn)
+        try:
+            locked = await conn.fetchval(
+                "SELECT pg_try_advisory_lock(hashtext($1))",
+                self.lock_key,
+            )
+        except Exception:
+            await conn.close()
+            raise
+
+        if not locked:
+            await conn.close()
+            return False
+
+        self.lock_conn = conn
+        self.dirty = True
+        logger.info("Elected to export vector snapshots")
+
+        return True
+
+    async def release_leadership(self) -> None:
+        if self.lock_conn is not None:
+            with contextlib.suppress(Exception):
+                await self.lock_conn.close()
+        self.lock_conn = None
+
+    async def swap_to_current(self) -> None:
+        """
+        Map the version CURRENT points to, if it is not the one in use.
+        """
+        version = await asyncio.to_thread(read_current_version, self.directory)
+        if version is None or version == self.version or self.index is None:
+            return
+
+        indexes = await asyncio.to_thread(load_snapshot, self.directory, version)
+        self.index.swap(indexes)
+        self.version = version
+        self.swaps += 1
+
+        logger.info("Mapped vector snapshot %s", version)
+
+    async def export(self) -> None:
+        """
+        Export the embeddings into a new snapshot and announce it, unless the
+        current snapshot already matches the database.
+        """
+        if self.db is None:
+            return
+
+        started = time.perf_counter()
+        fingerprint = await get_embeddings_fingerprint_query(self.db)
+
+        if self.version is not None:
+            manifest = await asyncio.to_thread(
+                read_manifest,
+                self.directory,
+                self.version,
+            )
+            if manifest is not None and manifest["fingerprint"] == fingerprint:
+                return
+
+        matrices: Matrices = {}
+        for column in EMBEDDING_COLUMNS:
+            rows = await get_embedding_vectors_query(self.db, column)
+            if not rows:
+                continue
+
+            matrix = np.stack(
+                [np.asarray(row["embedding"], dtype=np.float32) for row in rows],
+            )
+            matrices[column] = ([row["id"] for row in rows], normalize_rows(matrix))
+
+        version = await asyncio.to_thread(
+            write_snapshot,
+            self.directory,
+            matrices,
+            fingerprint=fingerprint,
+        )
+        await asyncio.to_thread(
+            prune_snapshots,
+            self.directory,
+            keep=settings.VECTOR_SNAPSHOT_KEEP,
+        )
+
+        self.exports += 1
+        self.last_export_seconds = time.perf_counter() - started
+        logger.info(
+            "Exported vector snapshot %s in %.2fs",
+            version,
+            self.last_export_seconds,
+        )
+
+        await self.swap_to_current()
+        await self.db.execute(
+            "SELECT pg_notify($1, $2)",
+            VECTOR_SNAPSHOTS_CHANNEL,
+            version,
+        )
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "leader": int(self.leader),
+            "version": int(self.version) if self.version else 0,
+            "exports": self.exports,
+            "swaps": self.swaps,
+            "last_export_seconds": round(self.last_export_seconds, 3),
+        }
+
+
+vector_snapshots = VectorSnapshots()
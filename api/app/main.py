@@ -9,12 +9,22 @@ from fastapi.responses import JSONResponse
 from starlette.middleware.cors import CORSMiddleware
 
 from app.api.chat import router as chat_router
+from app.api.fill_jobs import router as fill_jobs_router
 from app.api.health import router as health_router
 from app.api.links import router as links_router
+from app.api.metrics import router as metrics_router
 from app.api.questions import router as questions_router
 from app.data.connection import Database
+from app.data.notifications import NotificationListener
 from app.llms.context import RetrievalError
+from app.llms.embedding_queue import embedding_queue
+from app.llms.embeddings_cache import embeddings_cache
+from app.llms.fill_jobs import fill_job_runner
+from app.llms.gpu_api import close_gpu_api_client, init_gpu_api_client
+from app.llms.vector_index import question_index
+from app.llms.vector_snapshots import vector_snapshots
 from app.utils.logger import setup_logging
+from app.utils.metrics import MetricsMiddleware
 from app.utils.settings import Settings
 
 logger = logging.getLogger(__name__)
@@ -27,15 +37,54 @@ setup_logging(level=settings.LOG_LEVEL)
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None]:
     """
-    App startup/shutdown: init DB and run migrations.
+    App startup/shutdown: init DB, caches, indexes, the GPU API client and
+    background workers.
     """
     db = Database(dsn=settings.DATABASE_URL)
     app.state.db = db
 
     await db.init()
 
+    init_gpu_api_client()
+
+    if settings.EMBEDDINGS_CACHE_PERSIST:
+        embeddings_cache.attach(db)
+
+    if settings.EMBEDDING_QUEUE_ENABLED:
+        embedding_queue.start(db)
+
+    if settings.FILL_JOBS_ENABLED:
+        fill_job_runner.start(db)
+
+    listener = NotificationListener(dsn=settings.DATABASE_URL)
+    app.state.listener = listener
+
+    if settings.VECTOR_INDEX_ENABLED:
+        await question_index.start(
+            db,
+            listener,
+            external_vectors=settings.VECTOR_SNAPSHOTS_ENABLED,
+        )
+
+        if settings.VECTOR_SNAPSHOTS_ENABLED:
+            await vector_snapshots.start(
+                db,
+                listener,
+                question_index,
+                dsn=settings.DATABASE_URL,
+            )
+
+    if listener.handlers:
+        await listener.start()
+
     yield
 
+    await listener.stop()
+    await vector_snapshots.stop()
+    await question_index.stop()
+    await fill_job_runner.stop()
+    await embedding_queue.stop()
+    await close_gpu_api_client()
     await db.disconnect()
 
 
@@ -67,9 +116,12 @@ def make_app(settings: Settings) -> FastAPI:
         allow_headers=["*"],
         expose_headers=settings.EXPOSE_HEADERS,
     )
+    app.add_middleware(MetricsMiddleware)
 
     app.include_router(health_router)
+    app.include_router(metrics_router)
     app.include_router(questions_router)
+    app.include_router(fill_jobs_router)
     app.include_router(links_router)
     app.include_router(chat_router)
 
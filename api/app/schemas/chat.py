@@ -28,6 +28,15 @@ class ChatSchema(BaseModel):
             "Must be one of the values in `app.llms.models.Model`."
         ),
     )
+    fusion_embeddings_models: list[Model] | None = Field(
+        None,
+        examples=[[Model.BGE_M3.value, Model.TEXT_EMBEDDING_3_LARGE.value]],
+        description=(
+            "Embedding models to retrieve with concurrently, fusing their rankings. "
+            "Overrides `embeddings_model` for retrieval; a model that fails or "
+            "times out is left out."
+        ),
+    )
     inference_model: Model = Field(
         DEFAULT_INFERENCE_MODEL,
         examples=[DEFAULT_INFERENCE_MODEL.value],
@@ -76,3 +85,43 @@ class ChatSchema(BaseModel):
             "If True, the system will re-rank documents before generating a response."
         ),
     )
+    speculative_retrieval: bool = Field(
+        False,
+        examples=[True],
+        description=(
+            "Whether to search with the raw query while the query rewrite is still running. "
+            "If the rewrite is slower than the configured budget, the raw query results are used."
+        ),
+    )
+    hybrid_retrieval: bool = Field(
+        False,
+        examples=[True],
+        description=(
+            "Whether to combine full-text matches with the vector search results. "
+            "Helps with exact terms such as course codes, and re-ranks fewer candidates."
+        ),
+    )
+    use_cache: bool = Field(
+        True,
+        examples=[True],
+        description=(
+            "Whether cached intermediate results (such as rewritten queries) may be reused. "
+            "Set to False to force every step of the pipeline to run."
+        ),
+    )
+    use_vector_index: bool = Field(
+        True,
+        examples=[True],
+        description=(
+            "Whether to search the in-memory vector index, when it is enabled on the "
+            "server, instead of querying the database."
+        ),
+    )
+    include_timings: bool = Field(
+        False,
+        examples=[False],
+        description=(
+            "Whether to start the stream with a `timings` event holding the "
+            "duration of each retrieval stage, before the first token."
+        ),
+    )
@@ -0,0 +1,65 @@
+from datetime import datetime
+from typing import Literal
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+type FillJobStatus = Literal["pending", "running", "completed", "failed", "cancelled"]
+
+FILL_JOB_TERMINAL_STATUSES: frozenset[str] = frozenset(
+    {"completed", "failed", "cancelled"},
+)
+
+
+class FillJobSchema(BaseModel):
+    id: UUID = Field(
+        examples=["3fa85f64-5717-4562-b3fc-2c963f66afa6"],
+        description="Unique identifier for the fill job",
+    )
+    status: FillJobStatus = Field(
+        examples=["running"],
+        description="Current state of the job",
+    )
+    models: list[str] = Field(
+        examples=[["bge-m3:latest"]],
+        description="Embedding models the job fills",
+    )
+    questions: list[str] | None = Field(
+        default=None,
+        examples=[["reset-password"]],
+        description="Question names the job is limited to, if any",
+    )
+    all_questions: bool = Field(
+        examples=[False],
+        description="Whether every question is re-embedded, not only missing or stale ones",
+    )
+    total: int = Field(
+        examples=[120],
+        description="Number of question-model combinations to process",
+    )
+    processed: int = Field(
+        examples=[64],
+        description="Number of question-model combinations processed so far",
+    )
+    failed: int = Field(
+        examples=[0],
+        description="Number of processed combinations that failed",
+    )
+    error: str | None = Field(
+        default=None,
+        examples=[None],
+        description="Error that stopped the job, if it failed",
+    )
+    created_at: datetime = Field(
+        examples=["2025-06-05T14:48:00Z"],
+        description="UTC timestamp when the job was created",
+    )
+    updated_at: datetime = Field(
+        examples=["2025-06-05T14:49:00Z"],
+        description="UTC timestamp of the job's last progress",
+    )
+    finished_at: datetime | None = Field(
+        default=None,
+        examples=[None],
+        description="UTC timestamp when the job finished, if it has",
+    )
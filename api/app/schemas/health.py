@@ -31,3 +31,14 @@ class HealthResponse(BaseModel):
         description="UTC ISO-8601 timestamp of the check",
     )
     dependencies: dict[str, DependencyStatus]
+
+
+class StatsResponse(BaseModel):
+    timestamp: datetime = Field(
+        examples=["2025-06-05T12:34:56Z"],
+        description="UTC ISO-8601 timestamp of the snapshot",
+    )
+    stats: dict[str, dict[str, int | float]] = Field(
+        examples=[{"gpu_api_http": {"connections": 2, "idle_connections": 1}}],
+        description="Counters for each cache and connection pool of this worker",
+    )
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Literal
 from uuid import UUID
 
 from pydantic import BaseModel, Field, HttpUrl
@@ -43,6 +44,18 @@ class QuestionSchema(BaseModel):
         examples=[0.123456],
         description="Distance metric for similarity search, if applicable",
     )
+    embeddings: dict[str, list[float]] | None = Field(
+        default=None,
+        examples=[{"embedding_bge_m3": [0.12, -0.05, 0.34]}],
+        description="Embedding vectors keyed by column, only included when requested",
+    )
+
+
+class UnfilledQuestionSchema(QuestionSchema):
+    reason: Literal["missing", "stale"] = Field(
+        examples=["stale"],
+        description="Whether the embedding is missing or was computed from older text",
+    )
 
 
 class CreateQuestionSchema(BaseModel):
@@ -102,7 +115,7 @@ class FillEmbeddingsSchema(BaseModel):
     all_questions: bool = Field(
         default=False,
         examples=[False],
-        description="Whether to regenerate _all_ embeddings vs. only missing ones",
+        description="Whether to regenerate _all_ embeddings vs. only missing or stale ones",
     )
     all_models: bool = Field(
         default=False,
@@ -0,0 +1,105 @@
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+
+from app.utils.metrics import CACHE_LOOKUPS
+
+
+class LRUCache[K: Hashable, V]:
+    """
+    Bounded in-memory LRU cache with an optional per-entry TTL.
+    Keeps hit/miss counters so callers can report cache effectiveness.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float | None = None,
+        name: str | None = None,
+    ) -> None:
+        """
+        Create a cache holding at most `maxsize` entries.
+        Entries older than `ttl` seconds are treated as misses; `None` disables expiry.
+        Named caches also report their lookups to the `cache_lookups` metric.
+        """
+        self.maxsize: int = maxsize
+        self.ttl: float | None = ttl
+        self.name: str | None = name
+        self.hits: int = 0
+        self.misses: int = 0
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def get(self, key: K) -> V | None:
+        """
+        Return the cached value for the key (or None), refreshing its LRU position.
+        """
+        entry = self._data.get(key)
+
+        if entry is None:
+            self._record(hit=False)
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self._record(hit=False)
+            return None
+
+        self._data.move_to_end(key)
+        self._record(hit=True)
+        return value
+
+    def _record(self, *, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+        if self.name is not None:
+            CACHE_LOOKUPS.labels(cache=self.name, result="hit" if hit else "miss").inc()
+
+    def set(self, key: K, value: V) -> None:
+        """
+        Store a value, evicting the least recently used entries beyond `maxsize`.
+        """
+        if self.maxsize <= 0:
+            return
+
+        expires_at = (
+            time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        )
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K) -> V | None:
+        """
+        Remove a key from the cache and return its value (or None).
+        """
+        entry = self._data.pop(key, None)
+        return entry[1] if entry is not None else None
+
+    def clear(self) -> None:
+        """
+        Drop all entries. Counters are kept.
+        """
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict[str, int | float]:
+        """
+        Return size and hit/miss counters for the cache.
+        """
+        lookups = self.hits + self.misses
+
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -1,2 +1,70 @@
-def embedding_to_pgvector(embedding: list[float]) -> str:
-    return "[" + ",".join(str(x) for x in embedding) + "]"
+import logging
+import struct
+from collections.abc import Sequence
+from functools import partial
+
+import numpy as np
+from asyncpg import Connection
+
+logger = logging.getLogger(__name__)
+
+type Vector = np.ndarray | Sequence[float]
+
+# pgvector binary wire format: int16 dimensions, int16 unused, then the
+# values in network byte order (float32 for vector, float16 for halfvec)
+_VECTOR_HEADER = struct.Struct("!hh")
+_VECTOR_DTYPES: dict[str, np.dtype] = {
+    "vector": np.dtype(">f4"),
+    "halfvec": np.dtype(">f2"),
+}
+
+
+def encode_vector(value: Vector, dtype: np.dtype) -> bytes:
+    """
+    Encode a vector to the pgvector binary format.
+    """
+    array = np.asarray(value, dtype=dtype)
+    if array.ndim != 1:
+        msg = f"Expected a one-dimensional vector, got shape {array.shape}"
+        raise ValueError(msg)
+
+    return _VECTOR_HEADER.pack(array.shape[0], 0) + array.tobytes()
+
+
+def decode_vector(data: bytes, dtype: np.dtype) -> np.ndarray:
+    """
+    Decode a vector from the pgvector binary format to a float32 array.
+    """
+    dims, _ = _VECTOR_HEADER.unpack_from(data)
+    array = np.frombuffer(data, dtype=dtype, count=dims, offset=_VECTOR_HEADER.size)
+
+    return array.astype(np.float32)
+
+
+async def register_vector_codecs(conn: Connection) -> None:
+    """
+    Register binary codecs for the pgvector types on a new connection.
+    """
+    rows = await conn.fetch(
+        """
+        SELECT t.typname, n.nspname
+        FROM pg_type t
+        JOIN pg_namespace n ON n.oid = t.typnamespace
+        WHERE t.typname = ANY($1::text[])
+        """,
+        list(_VECTOR_DTYPES),
+    )
+
+    if not rows:
+        logger.warning("pgvector types not found; vector codecs not registered")
+        return
+
+    for row in rows:
+        dtype = _VECTOR_DTYPES[row["typname"]]
+        await conn.set_type_codec(
+            row["typname"],
+            schema=row["nspname"],
+            encoder=partial(encode_vector, dtype=dtype),
+            decoder=partial(decode_vector, dtype=dtype),
+            format="binary",
+        )
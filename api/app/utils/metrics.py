@@ -0,0 +1,196 @@
+import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time until the response is fully sent, by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+SSE_STREAMS_ACTIVE = Gauge(
+    "sse_streams_active",
+    "Server-Sent Events streams currently being sent",
+    ["route"],
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Connections open in the asyncpg pool",
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_CONNECTIONS_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "Connections of the asyncpg pool currently acquired",
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_MAX_CONNECTIONS = Gauge(
+    "db_pool_max_connections",
+    "Maximum size of the asyncpg pool",
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_ACQUIRE_SECONDS = Histogram(
+    "db_pool_acquire_seconds",
+    "Time spent waiting for a connection from the asyncpg pool",
+    buckets=LATENCY_BUCKETS,
+)
+
+PROVIDER_REQUEST_SECONDS = Histogram(
+    "provider_request_duration_seconds",
+    "Duration of calls to model providers",
+    ["provider", "operation"],
+    buckets=LATENCY_BUCKETS,
+)
+
+PROVIDER_ERRORS = Counter(
+    "provider_errors",
+    "Failed calls to model providers",
+    ["provider", "operation"],
+)
+
+CACHE_LOOKUPS = Counter(
+    "cache_lookups",
+    "Lookups in the in-process caches",
+    ["cache", "result"],
+)
+
+CHAT_STAGE_SECONDS = Histogram(
+    "chat_stage_seconds",
+    "Duration of each stage of the chat pipeline",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+CHAT_TIME_TO_FIRST_TOKEN_SECONDS = Histogram(
+    "chat_time_to_first_token_seconds",
+    "Time from starting generation to the first streamed token",
+    ["model"],
+    buckets=LATENCY_BUCKETS,
+)
+
+CHAT_TOKENS_PER_SECOND = Histogram(
+    "chat_tokens_per_second",
+    "Estimated generation throughput after the first token",
+    ["model"],
+    buckets=(1, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500),
+)
+
+
+@contextmanager
+def observe_provider_call(provider: str, operation: str) -> Iterator[None]:
+    """
+    Time a provider call, counting it as an error if it raises.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        PROVIDER_ERRORS.labels(provider=provider, operation=operation).inc()
+        raise
+    finally:
+        PROVIDER_REQUEST_SECONDS.labels(
+            provider=provider,
+            operation=operation,
+        ).observe(time.perf_counter() - started)
+
+
+def render_metrics() -> bytes:
+    """
+    Render every metric in the Prometheus text format. Under gunicorn, the
+    values of all workers are aggregated from PROMETHEUS_MULTIPROC_DIR.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return generate_latest(REGISTRY)
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+
+    return generate_latest(registry)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency by route template and the
+    number of open SSE streams.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+        stream_route: str | None = None
+
+        async def _send(message: Message) -> None:
+            nonlocal status_code, stream_route
+
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                content_type = dict(message.get("headers", [])).get(
+                    b"content-type",
+                    b"",
+                )
+                if content_type.startswith(b"text/event-stream"):
+                    stream_route = get_route(scope)
+                    SSE_STREAMS_ACTIVE.labels(route=stream_route).inc()
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            if stream_route is not None:
+                SSE_STREAMS_ACTIVE.labels(route=stream_route).dec()
+
+            HTTP_REQUEST_SECONDS.labels(
+                method=scope["method"],
+                route=get_route(scope),
+                status=str(status_code),
+            ).observe(time.perf_counter() - started)
+
+
+def get_route(scope: Scope) -> str:
+    """
+    Return the matched route's path template, so ids don't explode the
+    label cardinality.
+    """
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
@@ -0,0 +1,307 @@
+import asyncio
+import logging
+import random
+import re
+import time
+from collections.abc import Awaitable, Callable, Iterator
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+HTTP_TOO_MANY_REQUESTS = 429
+
+# Google reports the delay in the error message rather than a header
+_RETRY_IN_PATTERN = re.compile(r"retry in (\d+(?:\.\d+)?)\s*s", re.IGNORECASE)
+
+
+def estimate_tokens(text: str | list[str]) -> int:
+    """
+    Roughly estimate the number of tokens in the text (about 4 characters per token).
+    """
+    length = len(text) if isinstance(text, str) else sum(len(t) for t in text)
+    return max(length // 4, 1)
+
+
+def _exception_chain(exc: BaseException) -> Iterator[BaseException]:
+    seen: set[int] = set()
+    current: BaseException | None = exc
+
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        yield current
+        current = current.__cause__ or current.__context__
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """
+    Return whether the exception, or one it was raised from, is an HTTP 429.
+    """
+    for error in _exception_chain(exc):
+        for attribute in ("status_code", "code"):
+            if getattr(error, attribute, None) == HTTP_TOO_MANY_REQUESTS:
+                return True
+
+        response = getattr(error, "response", None)
+        if getattr(response, "status_code", None) == HTTP_TOO_MANY_REQUESTS:
+            return True
+
+        if "RESOURCE_EXHAUSTED" in str(error):
+            return True
+
+    return False
+
+
+def get_retry_after(exc: BaseException) -> float | None:
+    """
+    Return the delay in seconds the provider asked for, if any.
+    """
+    for error in _exception_chain(exc):
+        headers = getattr(getattr(error, "response", None), "headers", None)
+
+        if headers is not None:
+            retry_after_ms = headers.get("retry-after-ms")
+            if retry_after_ms:
+                try:
+                    return float(retry_after_ms) / 1000
+                except ValueError:
+                    pass
+
+            retry_after = headers.get("retry-after")
+            if retry_after:
+                try:
+                    return float(retry_after)
+                except ValueError:
+                    pass
+
+                try:
+                    retry_at = parsedate_to_datetime(retry_after)
+                    return max((retry_at - datetime.now(UTC)).total_seconds(), 0.0)
+                except (TypeError, ValueError):
+                    pass
+
+        match = _RETRY_IN_PATTERN.search(str(error))
+        if match:
+            return float(match.group(1))
+
+    return None
+
+
+def per_process_limit(limit: int, processes: int) -> int:
+    """
+    Return one process's share of a limit, keeping disabled limits disabled
+    and enabled ones at 1 or more.
+    """
+    if limit <= 0:
+        return limit
+
+    return max(limit // max(processes, 1), 1)
+
+
+class TokenBucket:
+    """
+    Bucket holding up to `capacity` units, refilled continuously so that
+    `capacity` units become available per minute.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        """
+        Create a full bucket. A capacity of 0 or less disables the limit.
+        """
+        self.capacity: int = capacity
+        self.available: float = float(capacity)
+        self.updated_at: float = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def refill(self, now: float, rate_factor: float) -> None:
+        """
+        Add the units accrued since the last refill, scaled by `rate_factor`.
+        """
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        self.available = min(
+            self.capacity,
+            self.available + elapsed * self.capacity / 60 * rate_factor,
+        )
+
+    def wait_time(self, amount: float, rate_factor: float) -> float:
+        """
+        Return the seconds until `amount` units are available.
+        """
+        if not self.enabled or self.available >= amount:
+            return 0.0
+
+        return (amount - self.available) / (self.capacity / 60 * rate_factor)
+
+
+class ProviderRateLimiter:
+    """
+    Client-side rate limiter for one provider, with token buckets for requests
+    per minute and tokens per minute. Calls wait until both buckets have room.
+    On a 429 the provider is paused for its Retry-After (or an exponential
+    backoff) and the refill rate is halved; successful calls restore it
+    gradually.
+
+    The buckets live in the process, so with several processes each one gets
+    an equal share of the limits. Clients whose calls go through `call`
+    should not retry on their own, or a call is retried twice over.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        processes: int = 1,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+    ) -> None:
+        """
+        Create a limiter enforcing this process's share of limits shared by
+        `processes` processes. A limit of 0 or less disables that bucket.
+        """
+        self.name: str = name
+        self.requests = TokenBucket(per_process_limit(requests_per_minute, processes))
+        self.tokens = TokenBucket(per_process_limit(tokens_per_minute, processes))
+        self.max_retries: int = max_retries
+        self.backoff_base: float = backoff_base
+        self.backoff_max: float = backoff_max
+
+        self.lock = asyncio.Lock()
+        self.rate_factor: float = 1.0
+        self.blocked_until: float = 0.0
+        self.consecutive_throttles: int = 0
+
+        self.throttled: int = 0
+        self.retries: int = 0
+        self.waits: int = 0
+        self.wait_seconds: float = 0.0
+
+    async def acquire(self, tokens: int = 1) -> None:
+        """
+        Wait until a request of about `tokens` tokens may be sent, and take it
+        from the buckets. Requests are admitted in arrival order.
+        """
+        # A request larger than the whole bucket would otherwise never fit
+        if self.tokens.enabled:
+            tokens = min(tokens, self.tokens.capacity)
+
+        async with self.lock:
+            waited = False
+            while True:
+                now = time.monotonic()
+                self.requests.refill(now, self.rate_factor)
+                self.tokens.refill(now, self.rate_factor)
+
+                delay = max(
+                    self.blocked_until - now,
+                    self.requests.wait_time(1, self.rate_factor),
+                    self.tokens.wait_time(tokens, self.rate_factor),
+                )
+                if delay <= 0:
+                    break
+
+                waited = True
+                self.wait_seconds += delay
+                await asyncio.sleep(delay)
+
+            if waited:
+                self.waits += 1
+
+            if self.requests.enabled:
+                self.requests.available -= 1
+            if self.tokens.enabled:
+                self.tokens.available -= tokens
+
+    def record_success(self) -> None:
+        """
+        Gradually restore the refill rate after throttling.
+        """
+        self.consecutive_throttles = 0
+        self.rate_factor = min(self.rate_factor + 0.05, 1.0)
+
+    def record_throttle(self, retry_after: float | None) -> float:
+        """
+        Pause the provider after a 429 and halve the refill rate. Returns the
+        pause in seconds.
+        """
+        self.throttled += 1
+        self.consecutive_throttles += 1
+        self.rate_factor = max(self.rate_factor / 2, 0.1)
+
+        if retry_after is None:
+            backoff = self.backoff_base * 2 ** (self.consecutive_throttles - 1)
+            retry_after = min(backoff, self.backoff_max) * random.uniform(0.8, 1.2)  # noqa: S311
+
+        self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+        return retry_after
+
+    def observe_error(self, exc: BaseException) -> None:
+        """
+        Feed an error from a call made outside `call` (e.g. a stream) into the
+        adaptive backoff.
+        """
+        if is_rate_limit_error(exc):
+            self.record_throttle(get_retry_after(exc))
+
+    async def call[T](
+        self,
+        func: Callable[[], Awaitable[T]],
+        *,
+        tokens: int = 1,
+    ) -> T:
+        """
+        Run `func` within the limits, retrying it when the provider answers
+        with a 429. Other errors, and the last 429, are raised.
+        """
+        attempt = 0
+        while True:
+            await self.acquire(tokens)
+
+            try:
+                result = await func()
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt >= self.max_retries:
+                    raise
+
+                attempt += 1
+                self.retries += 1
+                delay = self.record_throttle(get_retry_after(e))
+                logger.warning(
+                    "%s rate limited, retrying in %.1fs (attempt %d/%d)",
+                    self.name,
+                    delay,
+                    attempt,
+                    self.max_retries,
+                )
+                continue
+
+            self.record_success()
+            return result
+
+    def stats(self) -> dict[str, int | float]:
+        """
+        Return the current throttle state and counters.
+        """
+        now = time.monotonic()
+        self.requests.refill(now, self.rate_factor)
+        self.tokens.refill(now, self.rate_factor)
+
+        return {
+            "requests_per_minute": self.requests.capacity,
+            "tokens_per_minute": self.tokens.capacity,
+            "available_requests": round(self.requests.available, 2),
+            "available_tokens": round(self.tokens.available, 2),
+            "rate_factor": round(self.rate_factor, 3),
+            "blocked_for": round(max(self.blocked_until - now, 0.0), 3),
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "waits": self.waits,
+            "wait_seconds": round(self.wait_seconds, 3),
+        }
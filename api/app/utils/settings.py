@@ -1,5 +1,7 @@
 from pydantic_settings import BaseSettings
 
+from app.llms.models import MODEL_EMBEDDINGS_COLUMNS, Model
+
 
 class Settings(BaseSettings):
     """
@@ -12,7 +14,14 @@ class Settings(BaseSettings):
 
     LOG_LEVEL: str = "INFO"
 
+    # Number of processes serving the API; gunicorn.conf.py sets it for its workers
+    WORKERS: int = 1
+
     GPU_API_URL: str = "http://gpu-api:8888"
+    GPU_API_MAX_CONNECTIONS: int = 100
+    GPU_API_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    GPU_API_KEEPALIVE_EXPIRY: float = 30.0
+    GPU_API_HTTP2: bool = False
     MCP_HTTP_URLS: str = ""
     MCP_SSE_URLS: str = ""
 
@@ -23,6 +32,80 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str = "your_openai_api_key_here"
     GOOGLE_API_KEY: str = "your_google_api_key_here"
 
+    # Client-side provider limits for the whole deployment, split evenly between
+    # the WORKERS processes since each enforces its own share; 0 disables a limit
+    OPENAI_REQUESTS_PER_MINUTE: int = 500
+    OPENAI_TOKENS_PER_MINUTE: int = 1_000_000
+    GOOGLE_REQUESTS_PER_MINUTE: int = 150
+    GOOGLE_TOKENS_PER_MINUTE: int = 1_000_000
+    RATE_LIMIT_MAX_RETRIES: int = 5
+    RATE_LIMIT_BACKOFF_BASE: float = 1.0
+    RATE_LIMIT_BACKOFF_MAX: float = 60.0
+
+    QUERY_TRANSFORM_CACHE_SIZE: int = 1024
+    QUERY_TRANSFORM_CACHE_TTL: float = 3600.0
+    QUERY_TRANSFORM_BUDGET: float = 1.5
+
+    RETRIEVAL_RRF_K: int = 60
+    HYBRID_INITIAL_K: int = 15
+    RETRIEVAL_MODEL_TIMEOUT: float = 3.0
+    RETRIEVAL_MODEL_TIMEOUTS: dict[Model, float] = {}
+    # Re-ranked documents scoring below this are dropped from the context
+    RERANK_MIN_SCORE: float | None = None
+
+    EMBEDDINGS_CACHE_SIZE: int = 2048
+    EMBEDDINGS_CACHE_PERSIST: bool = False
+    EMBEDDINGS_CACHE_TTL: float = 2592000.0
+    EMBEDDINGS_CACHE_PRUNE_INTERVAL: float = 3600.0
+    EMBEDDINGS_FILL_BATCH_SIZE: int = 32
+    EMBEDDINGS_FILL_PROVIDER_CONCURRENCY: dict[str, int] = {
+        "ollama": 1,
+        "openai": 2,
+        "google": 2,
+        "gpu-api": 1,
+    }
+
+    EMBEDDING_QUEUE_ENABLED: bool = True
+    EMBEDDING_QUEUE_MODELS: list[Model] = list(MODEL_EMBEDDINGS_COLUMNS)
+    EMBEDDING_QUEUE_BATCH_SIZE: int = 64
+    EMBEDDING_QUEUE_DEBOUNCE: float = 2.0
+    EMBEDDING_QUEUE_POLL_INTERVAL: float = 10.0
+    EMBEDDING_QUEUE_LEASE: float = 300.0
+    EMBEDDING_QUEUE_MAX_ATTEMPTS: int = 5
+    EMBEDDING_QUEUE_RETRY_DELAY: float = 30.0
+
+    VECTOR_INDEX_ENABLED: bool = False
+    VECTOR_INDEX_REFRESH_DEBOUNCE: float = 0.5
+
+    # Share the index vectors between workers through memory-mapped snapshots;
+    # requires VECTOR_INDEX_ENABLED and a directory all workers can read
+    VECTOR_SNAPSHOTS_ENABLED: bool = False
+    VECTOR_SNAPSHOT_DIR: str = "/tmp/vector-snapshots"  # noqa: S108
+    VECTOR_SNAPSHOT_KEEP: int = 3
+    VECTOR_SNAPSHOT_EXPORT_DEBOUNCE: float = 5.0
+    VECTOR_SNAPSHOT_POLL_INTERVAL: float = 10.0
+
+    # Share one pipeline run between identical concurrent chat requests; by
+    # default only for deterministic (temperature 0) sampling, since sampled
+    # requests would otherwise all get the same answer
+    CHAT_COALESCING_ENABLED: bool = True
+    CHAT_COALESCING_DETERMINISTIC_ONLY: bool = True
+
+    # Replay answers to prompts within ANSWER_CACHE_MAX_DISTANCE (cosine) of
+    # a cached one; answers expire after ANSWER_CACHE_TTL seconds, and only the
+    # newest ANSWER_CACHE_MAX_ENTRIES are kept, since lookups scan the table
+    ANSWER_CACHE_ENABLED: bool = False
+    ANSWER_CACHE_MAX_DISTANCE: float = 0.05
+    ANSWER_CACHE_TTL: float = 86400.0
+    ANSWER_CACHE_MAX_ENTRIES: int = 5000
+
+    FILL_JOBS_ENABLED: bool = True
+    FILL_JOB_MAX_CONCURRENT: int = 1
+    FILL_JOB_LEASE: float = 120.0
+    FILL_JOB_HEARTBEAT_INTERVAL: float = 30.0
+    FILL_JOB_POLL_INTERVAL: float = 15.0
+    FILL_JOB_EVENT_POLL_INTERVAL: float = 1.0
+
     ALLOWED_ORIGINS: list[str] = ["*"]
     EXPOSE_HEADERS: list[str] = ["*"]
 
@@ -0,0 +1,77 @@
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from app.utils.metrics import CHAT_STAGE_SECONDS
+
+
+class StageTimer:
+    """
+    Collect the durations of the stages of one request, in the order they
+    finished. Stages that run more than once (e.g. one embedding per model)
+    are recorded once per run.
+    """
+
+    def __init__(self) -> None:
+        """
+        Create an empty timer; the request starts now.
+        """
+        self.started_at: float = time.perf_counter()
+        self.stages: list[tuple[str, float]] = []
+
+    def record(self, stage: str, seconds: float) -> None:
+        self.stages.append((stage, seconds))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def server_timing(self) -> str:
+        """
+        Format the stages as a Server-Timing header value, in milliseconds.
+        """
+        return ", ".join(
+            f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages
+        )
+
+    def to_dict(self) -> list[dict[str, str | float]]:
+        return [
+            {"stage": stage, "ms": round(seconds * 1000, 1)}
+            for stage, seconds in self.stages
+        ]
+
+
+# Set per request, so nested calls and the tasks they spawn find the same timer
+_current_timer: ContextVar[StageTimer | None] = ContextVar(
+    "current_timer",
+    default=None,
+)
+
+
+def start_timer() -> StageTimer:
+    """
+    Start timing the current request.
+    """
+    timer = StageTimer()
+    _current_timer.set(timer)
+
+    return timer
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """
+    Time the block as `stage`: observe it in the stage histogram and record it
+    on the current request's timer, if there is one. Failed runs are recorded
+    too.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        CHAT_STAGE_SECONDS.labels(stage=stage).observe(seconds)
+
+        timer = _current_timer.get()
+        if timer is not None:
+            timer.record(stage, seconds)
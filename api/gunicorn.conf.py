@@ -1,13 +1,37 @@
 import os
+import shutil
+from pathlib import Path
+
+from gunicorn.arbiter import Arbiter
+from gunicorn.workers.base import Worker
 
 host = os.getenv("HOST", "0.0.0.0")  # noqa: S104
 port = os.getenv("PORT", "8880")
 bind = f"{host}:{port}"
 
-workers = int(os.getenv("WORKERS", "4"))
+# Exported so the workers can split per-deployment limits between themselves
+workers = int(os.environ.setdefault("WORKERS", "4"))
 
 worker_class = "uvicorn.workers.UvicornWorker"
 
 accesslog = "-"
 errorlog = "-"
 loglevel = os.getenv("LOG_LEVEL", "info")
+
+# Workers write their metrics here, so /metrics can aggregate all of them.
+# prometheus_client picks its value storage on first import, so this must be
+# set before anything imports it (see child_exit).
+prometheus_multiproc_dir = Path(
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus-metrics"),  # noqa: S108
+)
+
+
+def on_starting(server: Arbiter) -> None:
+    shutil.rmtree(prometheus_multiproc_dir, ignore_errors=True)
+    prometheus_multiproc_dir.mkdir(parents=True)
+
+
+def child_exit(server: Arbiter, worker: Worker) -> None:
+    from prometheus_client import multiprocess  # noqa: PLC0415
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -68,3 +68,159 @@ ADD COLUMN IF NOT EXISTS embedding_multilingual_e5_large vector (1024);
 CREATE INDEX IF NOT EXISTS question_embedding_multilingual_e5_large_idx ON question USING hnsw (
     embedding_multilingual_e5_large vector_cosine_ops
 );
+
+-- Query embeddings cache
+
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    model TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    embedding BYTEA NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (model, kind, text_hash)
+);
+
+-- Entries unused for EMBEDDINGS_CACHE_TTL are pruned
+ALTER TABLE embedding_cache
+ADD COLUMN IF NOT EXISTS last_used_at TIMESTAMP NOT NULL DEFAULT NOW();
+
+CREATE INDEX IF NOT EXISTS embedding_cache_last_used_at_idx ON embedding_cache (last_used_at);
+
+-- Embedding freshness
+
+ALTER TABLE question
+ADD COLUMN IF NOT EXISTS content_hash TEXT GENERATED ALWAYS AS (
+    md5(name || E'\n' || content)
+) STORED;
+
+-- Maps each embedding column to the content_hash of the text it was computed from
+ALTER TABLE question
+ADD COLUMN IF NOT EXISTS embedding_hashes JSONB NOT NULL DEFAULT '{}'::jsonb;
+
+-- Vectors filled before hashes were tracked are assumed to be current
+UPDATE question
+SET embedding_hashes = embedding_hashes || jsonb_build_object('embedding_llama3_3_70b', content_hash)
+WHERE embedding_llama3_3_70b IS NOT NULL AND NOT embedding_hashes ? 'embedding_llama3_3_70b';
+
+UPDATE question
+SET embedding_hashes = embedding_hashes || jsonb_build_object('embedding_bge_m3', content_hash)
+WHERE embedding_bge_m3 IS NOT NULL AND NOT embedding_hashes ? 'embedding_bge_m3';
+
+UPDATE question
+SET embedding_hashes = embedding_hashes || jsonb_build_object('embedding_text_embedding_3_large', content_hash)
+WHERE embedding_text_embedding_3_large IS NOT NULL AND NOT embedding_hashes ? 'embedding_text_embedding_3_large';
+
+UPDATE question
+SET embedding_hashes = embedding_hashes || jsonb_build_object('embedding_gemini_embedding_001', content_hash)
+WHERE embedding_gemini_embedding_001 IS NOT NULL AND NOT embedding_hashes ? 'embedding_gemini_embedding_001';
+
+UPDATE question
+SET embedding_hashes = embedding_hashes || jsonb_build_object('embedding_multilingual_e5_large', content_hash)
+WHERE embedding_multilingual_e5_large IS NOT NULL AND NOT embedding_hashes ? 'embedding_multilingual_e5_large';
+
+-- Bumped by every embedding write, so rewriting a vector for unchanged text is
+-- still noticed (e.g. by vector snapshots)
+ALTER TABLE question
+ADD COLUMN IF NOT EXISTS embeddings_updated_at TIMESTAMP;
+
+-- Background embedding queue
+
+CREATE TABLE IF NOT EXISTS embedding_job (
+    question_id UUID PRIMARY KEY REFERENCES question (id) ON DELETE CASCADE,
+    enqueued_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    available_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    locked_until TIMESTAMP,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS embedding_job_available_at_idx ON embedding_job (available_at);
+
+-- Detached embedding fill jobs
+
+CREATE TABLE IF NOT EXISTS embedding_fill_job (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid (),
+    status TEXT NOT NULL DEFAULT 'pending',
+    models TEXT [] NOT NULL,
+    questions TEXT [],
+    all_questions BOOLEAN NOT NULL DEFAULT FALSE,
+    total INTEGER NOT NULL DEFAULT 0,
+    processed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    -- Last processed question id per model, to resume after a restart
+    cursors JSONB NOT NULL DEFAULT '{}'::jsonb,
+    error TEXT,
+    locked_until TIMESTAMP,
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW(),
+    finished_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS embedding_fill_job_status_idx ON embedding_fill_job (status);
+
+CREATE TABLE IF NOT EXISTS embedding_fill_event (
+    job_id UUID NOT NULL REFERENCES embedding_fill_job (id) ON DELETE CASCADE,
+    index INTEGER NOT NULL,
+    payload JSONB NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (job_id, index)
+);
+
+-- Question change notifications, used to keep in-memory indexes fresh
+
+CREATE OR REPLACE FUNCTION notify_question_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('question_changes', COALESCE(NEW.id, OLD.id)::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER question_change_notify
+AFTER INSERT OR UPDATE OR DELETE ON question
+FOR EACH ROW EXECUTE FUNCTION notify_question_change();
+
+-- Full-text search for hybrid retrieval; 'simple' keeps codes and names intact
+-- (Postgres has no Macedonian dictionary)
+
+ALTER TABLE question
+ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple', name), 'A')
+    || setweight(to_tsvector('simple', content), 'B')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS question_search_vector_idx ON question USING gin (search_vector);
+
+-- Semantic answer cache, keyed on the query embedding
+
+CREATE TABLE IF NOT EXISTS answer_cache (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid (),
+    embeddings_model TEXT NOT NULL,
+    -- Hash of every request setting besides the prompt the answer depends on
+    answer_key TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    embedding vector NOT NULL,
+    -- The answer's SSE events, as streamed
+    answer TEXT NOT NULL,
+    question_ids UUID [] NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS answer_cache_key_idx ON answer_cache (embeddings_model, answer_key);
+
+-- The embedding has no fixed dimensions and can't be indexed, so lookups scan
+-- the table; it is bounded to ANSWER_CACHE_MAX_ENTRIES, newest first
+CREATE INDEX IF NOT EXISTS answer_cache_created_at_idx ON answer_cache (created_at);
+
+CREATE INDEX IF NOT EXISTS answer_cache_question_ids_idx ON answer_cache USING gin (question_ids);
+
+CREATE OR REPLACE FUNCTION invalidate_answer_cache() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM answer_cache WHERE question_ids @> ARRAY[OLD.id];
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER question_answer_cache_invalidate
+AFTER UPDATE OF name, content, links OR DELETE ON question
+FOR EACH ROW EXECUTE FUNCTION invalidate_answer_cache();
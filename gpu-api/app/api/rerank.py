@@ -1,10 +1,13 @@
-import asyncio
 import logging
 
 from fastapi import APIRouter, status
 
 from app.llms.reranker import rerank_documents
-from app.schemas.rerank import RerankRequestSchema, RerankResponseSchema
+from app.schemas.rerank import (
+    RerankRequestSchema,
+    RerankResponseSchema,
+    RerankResultSchema,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +22,8 @@ router = APIRouter(
     summary="Re-rank documents based on a query",
     description=(
         "Accepts a query and a list of documents, and returns them re-ordered "
-        "by their semantic relevance to the query."
+        "by their semantic relevance to the query, with their scores and "
+        "original indices. Concurrent requests are scored in shared batches."
     ),
     response_model=RerankResponseSchema,
     status_code=status.HTTP_200_OK,
@@ -43,12 +47,26 @@ async def handle_rerank(payload: RerankRequestSchema) -> RerankResponseSchema:
     )
 
     if not payload.documents:
-        return RerankResponseSchema(reranked_documents=[])
+        return RerankResponseSchema(results=[], reranked_documents=[])
 
-    reranked_list = await asyncio.to_thread(
-        rerank_documents,
+    ranked = await rerank_documents(
         payload.query,
         payload.documents,
+        payload.top_n,
     )
 
-    return RerankResponseSchema(reranked_documents=reranked_list)
+    results = [
+        RerankResultSchema(
+            index=index,
+            score=score,
+            document=payload.documents[index] if payload.return_documents else None,
+        )
+        for index, score in ranked
+    ]
+
+    return RerankResponseSchema(
+        results=results,
+        reranked_documents=[
+            result.document for result in results if result.document is not None
+        ],
+    )
@@ -1,4 +1,3 @@
-import asyncio
 import logging
 from typing import overload
 
@@ -7,14 +6,30 @@ from fastapi import HTTPException, status
 from app.llms.bge_m3 import get_bge_m3_embeddings
 from app.llms.models import Model
 from app.llms.multilingual_e5_large import get_multilingual_e5_large_embeddings
+from app.utils.batching import MicroBatcher
+from app.utils.settings import Settings
 
 logger = logging.getLogger(__name__)
 
+settings = Settings()
+
 embedders = {
     Model.BGE_M3: get_bge_m3_embeddings,
     Model.MULTILINGUAL_E5_LARGE: get_multilingual_e5_large_embeddings,
 }
 
+# Queries and documents go through the same forward pass, since neither
+# embedder is configured with query-specific encode arguments
+embedding_batchers: dict[Model, MicroBatcher[str, list[float]]] = {
+    model: MicroBatcher(
+        model.value,
+        embedder,
+        max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+        max_wait=settings.EMBEDDING_BATCH_MAX_WAIT,
+    )
+    for model, embedder in embedders.items()
+}
+
 
 @overload
 async def generate_embeddings(
@@ -35,7 +50,8 @@ async def generate_embeddings(
     model: Model,
 ) -> list[float] | list[list[float]]:
     """
-    Dispatch to the appropriate embedder, offloading blocking calls.
+    Dispatch to the appropriate embedder's batcher, which merges concurrent
+    requests into shared forward passes on a worker thread.
     Raises HTTPException(400) if the model isn't supported.
     """
     logger.info(
@@ -44,15 +60,16 @@ async def generate_embeddings(
         texts,
     )
 
-    embedder = embedders.get(model)
+    batcher = embedding_batchers.get(model)
 
-    if embedder is None:
+    if batcher is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Model {model.value} is not supported for embeddings.",
         )
 
-    def _call() -> list[float] | list[list[float]]:
-        return embedder(texts)
+    if isinstance(texts, str):
+        [embedding] = await batcher.submit([texts])
+        return embedding
 
-    return await asyncio.to_thread(_call)
+    return await batcher.submit(texts)
@@ -0,0 +1,387 @@
+import asyncio
+import logging
+import queue
+import threading
+from collections.abc import AsyncGenerator
+from dataclasses import dataclass, field
+
+import torch
+import torch.nn.functional as F  # noqa: N812
+from transformers import DynamicCache, PreTrainedModel, PreTrainedTokenizerBase
+
+logger = logging.getLogger(__name__)
+
+
+class TextDecoder:
+    """
+    Turn one sequence's generated token ids into text as they arrive. Text
+    ending in an incomplete character is held back until the next token, and
+    the token buffer is flushed at newlines, like transformers' TextStreamer.
+    """
+
+    def __init__(self, tokenizer: PreTrainedTokenizerBase) -> None:
+        self.tokenizer = tokenizer
+        self.tokens: list[int] = []
+        self.printed: int = 0
+
+    def push(self, token: int) -> str:
+        """
+        Add a token and return the text that became printable.
+        """
+        self.tokens.append(token)
+        text = self.tokenizer.decode(self.tokens, skip_special_tokens=True)
+
+        if text.endswith("\ufffd"):
+            return ""
+
+        printable = text[self.printed :]
+        if text.endswith("\n"):
+            self.tokens = []
+            self.printed = 0
+        else:
+            self.printed = len(text)
+
+        return printable
+
+
+@dataclass(eq=False)
+class Sequence:
+    """
+    One request being generated, and the queue its text is delivered to.
+    The queue receives text, then None when done, or the exception that
+    stopped generation.
+    """
+
+    input_ids: torch.Tensor
+    temperature: float
+    top_p: float
+    max_tokens: int
+    decoder: TextDecoder
+    loop: asyncio.AbstractEventLoop
+    output: asyncio.Queue[str | Exception | None] = field(
+        default_factory=asyncio.Queue,
+    )
+    cancelled: threading.Event = field(default_factory=threading.Event)
+    generated: int = 0
+    next_token: int = 0
+
+    def emit(self, item: str | Exception | None) -> None:
+        """
+        Deliver an item to the consumer. Never raises, so a consumer whose
+        event loop is gone can't stop the scheduler; it is cancelled instead.
+        """
+        try:
+            self.loop.call_soon_threadsafe(self.output.put_nowait, item)
+        except Exception:
+            logger.exception("Failed to deliver generated text, cancelling")
+            self.cancelled.set()
+
+
+def sample_tokens(logits: torch.Tensor, sequences: list[Sequence]) -> list[int]:
+    """
+    Pick the next token of each sequence from its logits, with the
+    sequence's own temperature and top-p. A temperature of 0 means greedy.
+    """
+    logits = logits.float()
+    temperatures = torch.tensor(
+        [sequence.temperature for sequence in sequences],
+        device=logits.device,
+    )
+    top_ps = torch.tensor(
+        [sequence.top_p for sequence in sequences],
+        device=logits.device,
+    )
+
+    probs = torch.softmax(logits / temperatures.clamp(min=1e-5).unsqueeze(1), dim=-1)
+    sorted_probs, sorted_ids = probs.sort(dim=-1, descending=True)
+
+    # Keep the smallest set of tokens whose cumulative probability reaches top_p
+    outside = sorted_probs.cumsum(dim=-1) - sorted_probs > top_ps.unsqueeze(1)
+    sorted_probs = sorted_probs.masked_fill(outside, 0.0)
+    sampled = sorted_ids.gather(1, torch.multinomial(sorted_probs, 1)).squeeze(1)
+
+    tokens = torch.where(temperatures > 0, sampled, logits.argmax(dim=-1))
+
+    return tokens.tolist()
+
+
+def pad_cache_left(cache: DynamicCache, amount: int) -> None:
+    for layer in cache.layers:
+        layer.keys = F.pad(layer.keys, (0, 0, amount, 0))
+        layer.values = F.pad(layer.values, (0, 0, amount, 0))
+
+
+class GenerationScheduler:
+    """
+    Continuous batching for one causal LM. A dedicated thread runs every
+    active sequence through one batched decode step at a time, and admits
+    queued requests between steps: each is prefilled on its own and joins
+    the batch, whose KV cache is left-padded to a common length. Finished
+    and cancelled sequences leave the batch at the next step, and each
+    sequence's text is streamed to its own consumer.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model: PreTrainedModel,
+        tokenizer: PreTrainedTokenizerBase,
+        *,
+        max_batch_size: int,
+    ) -> None:
+        """
+        Create the scheduler and start its thread.
+        """
+        self.name: str = name
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size: int = max(max_batch_size, 1)
+
+        # Instruct models often end turns with a token other than the tokenizer's EOS
+        eos_token_id = model.generation_config.eos_token_id
+        eos_token_ids = (
+            eos_token_id if isinstance(eos_token_id, list) else [eos_token_id]
+        )
+        self.eos_token_ids: set[int] = {
+            token_id
+            for token_id in [*eos_token_ids, tokenizer.eos_token_id]
+            if token_id is not None
+        }
+
+        self.pending: queue.Queue[Sequence] = queue.Queue()
+        self.active: list[Sequence] = []
+        self.cache: DynamicCache | None = None
+        self.attention_mask: torch.Tensor | None = None
+        self.stopped: bool = False
+
+        self.thread = threading.Thread(
+            target=self.run,
+            name=f"generation-{name}",
+            daemon=True,
+        )
+        self.thread.start()
+
+    async def generate(
+        self,
+        messages: list[dict[str, str]],
+        *,
+        temperature: float,
+        top_p: float,
+        max_tokens: int,
+    ) -> AsyncGenerator[str]:
+        """
+        Queue a chat completion and yield its text as it is decoded.
+        Generation stops if the consumer stops iterating.
+        """
+        prompt = self.tokenizer.apply_chat_template(
+            messages,
+            tokenize=False,
+            add_generation_prompt=True,
+        )
+
+        sequence = Sequence(
+            input_ids=self.tokenizer(prompt, return_tensors="pt").input_ids,
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens,
+            decoder=TextDecoder(self.tokenizer),
+            loop=asyncio.get_running_loop(),
+        )
+        self.pending.put(sequence)
+
+        # The scheduler fails what it has queued when it stops, but a request
+        # queued after that would wait forever
+        if self.stopped:
+            sequence.cancelled.set()
+            raise RuntimeError(f"{self.name} generation scheduler is not running")
+
+        try:
+            while True:
+                item = await sequence.output.get()
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            sequence.cancelled.set()
+
+    def run(self) -> None:
+        """
+        Admit requests and run decode steps, forever. Should the loop ever
+        exit, every queued and active request is failed.
+        """
+        try:
+            while True:
+                self.admit()
+
+                if not self.active:
+                    continue
+
+                try:
+                    with torch.inference_mode():
+                        self.step()
+                except Exception as e:
+                    logger.exception("%s decode step failed", self.name)
+                    for sequence in self.active:
+                        sequence.emit(e)
+                    self.evict([])
+        finally:
+            logger.critical("%s generation scheduler stopped", self.name)
+            self.stopped = True
+            self.fail_all(
+                RuntimeError(f"{self.name} generation scheduler stopped"),
+            )
+
+    def fail_all(self, error: Exception) -> None:
+        """
+        Fail the active and queued requests with the error.
+        """
+        for sequence in self.active:
+            sequence.emit(error)
+        self.evict([])
+
+        while True:
+            try:
+                self.pending.get_nowait().emit(error)
+            except queue.Empty:
+                return
+
+    def admit(self) -> None:
+        """
+        Prefill queued requests while there is room in the batch. Waits for
+        a request when nothing is being generated.
+        """
+        while len(self.active) < self.max_batch_size:
+            try:
+                sequence = self.pending.get(block=not self.active)
+            except queue.Empty:
+                return
+
+            if sequence.cancelled.is_set():
+                continue
+
+            try:
+                with torch.inference_mode():
+                    self.prefill(sequence)
+            except Exception as e:
+                logger.exception("%s prefill failed", self.name)
+                sequence.emit(e)
+
+    def prefill(self, sequence: Sequence) -> None:
+        """
+        Run the prompt through the model, stream the first token, and add
+        the sequence to the batch.
+        """
+        input_ids = sequence.input_ids.to(self.model.device)
+        outputs = self.model(input_ids=input_ids, use_cache=True)
+
+        [token] = sample_tokens(outputs.logits[:, -1, :], [sequence])
+        if self.accept(sequence, token):
+            return
+
+        cache = outputs.past_key_values
+        mask = torch.ones_like(input_ids)
+
+        if self.cache is None or self.attention_mask is None:
+            self.cache = cache
+            self.attention_mask = mask
+            self.active = [sequence]
+            return
+
+        # Left-pad the shorter of the two so their last tokens line up
+        padding = mask.shape[1] - self.attention_mask.shape[1]
+        if padding < 0:
+            pad_cache_left(cache, -padding)
+            mask = F.pad(mask, (-padding, 0))
+        elif padding > 0:
+            pad_cache_left(self.cache, padding)
+            self.attention_mask = F.pad(self.attention_mask, (padding, 0))
+
+        for batch_layer, layer in zip(self.cache.layers, cache.layers, strict=True):
+            batch_layer.keys = torch.cat([batch_layer.keys, layer.keys])
+            batch_layer.values = torch.cat([batch_layer.values, layer.values])
+        self.attention_mask = torch.cat([self.attention_mask, mask])
+        self.active.append(sequence)
+
+    def step(self) -> None:
+        """
+        Generate one token for every active sequence in a single forward pass.
+        """
+        live = [
+            i
+            for i, sequence in enumerate(self.active)
+            if not sequence.cancelled.is_set()
+        ]
+        if len(live) < len(self.active):
+            self.evict(live)
+        if self.cache is None or self.attention_mask is None:
+            return
+
+        input_ids = torch.tensor(
+            [[sequence.next_token] for sequence in self.active],
+            device=self.model.device,
+        )
+        # Positions skip the left padding
+        position_ids = self.attention_mask.sum(dim=1, keepdim=True)
+        attention_mask = F.pad(self.attention_mask, (0, 1), value=1)
+
+        outputs = self.model(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            position_ids=position_ids,
+            past_key_values=self.cache,
+            use_cache=True,
+        )
+        self.cache = outputs.past_key_values
+        self.attention_mask = attention_mask
+
+        tokens = sample_tokens(outputs.logits[:, -1, :], self.active)
+        unfinished = [
+            i
+            for i, (sequence, token) in enumerate(zip(self.active, tokens, strict=True))
+            if not self.accept(sequence, token)
+        ]
+        if len(unfinished) < len(self.active):
+            self.evict(unfinished)
+
+    def accept(self, sequence: Sequence, token: int) -> bool:
+        """
+        Stream a generated token. Returns whether the sequence is finished.
+        """
+        sequence.generated += 1
+
+        finished = token in self.eos_token_ids
+        if not finished:
+            text = sequence.decoder.push(token)
+            if text:
+                sequence.emit(text)
+
+        if finished or sequence.generated >= sequence.max_tokens:
+            sequence.emit(None)
+            return True
+
+        sequence.next_token = token
+        return False
+
+    def evict(self, keep: list[int]) -> None:
+        """
+        Keep only the sequences at the `keep` positions of the batch.
+        """
+        if not keep or self.cache is None or self.attention_mask is None:
+            self.active = []
+            self.cache = None
+            self.attention_mask = None
+            return
+
+        index = torch.tensor(keep, device=self.attention_mask.device)
+        self.attention_mask = self.attention_mask[index]
+        self.active = [self.active[i] for i in keep]
+
+        # Drop the columns that are padding for every remaining sequence
+        start = int(self.attention_mask.any(dim=0).int().argmax())
+        self.attention_mask = self.attention_mask[:, start:]
+
+        for layer in self.cache.layers:
+            layer.keys = layer.keys[index, :, start:]
+            layer.values = layer.values[index, :, start:]
@@ -1,64 +1,58 @@
+import asyncio
 import logging
+import threading
 from collections.abc import AsyncGenerator
 
 import torch
-from langchain_huggingface import HuggingFacePipeline
 from transformers import AutoModelForCausalLM, AutoTokenizer
-from transformers.pipelines import pipeline
+
+from app.llms.generation import GenerationScheduler
+from app.utils.settings import Settings
 
 logger = logging.getLogger(__name__)
 
-_pipelines: dict[tuple[float, float, int], HuggingFacePipeline] = {}
+settings = Settings()
 
+_scheduler: GenerationScheduler | None = None
+_scheduler_lock = threading.Lock()
 
-def get_qwen2_5_7b_pipeline(
-    temperature: float,
-    top_p: float,
-    max_tokens: int,
-) -> HuggingFacePipeline:
+
+def get_qwen2_5_7b_scheduler() -> GenerationScheduler:
     """
-    Retrieves or initializes a HuggingFace pipeline for the Qwen2.5-7B model
-    with the specified parameters.
+    Retrieves or initializes the generation scheduler for the Qwen2.5-7B model.
+    The model and tokenizer are loaded once and shared by every request;
+    sampling parameters are passed per generation.
     """
-    logger.info(
-        "Initializing Qwen2.5-7B pipeline with temperature: %s, top_p: %s, max_tokens: %s",
-        temperature,
-        top_p,
-        max_tokens,
-    )
+    global _scheduler  # noqa: PLW0603
 
-    model_id = "Qwen/Qwen2.5-7B-Instruct"
-    key = (temperature, top_p, max_tokens)
+    with _scheduler_lock:
+        if _scheduler is None:
+            logger.info("Initializing Qwen2.5-7B model")
 
-    if key not in _pipelines:
-        model = AutoModelForCausalLM.from_pretrained(
-            model_id,
-            torch_dtype=torch.float16,
-            device_map="auto",
-            trust_remote_code=True,
-        )
-        tokenizer = AutoTokenizer.from_pretrained(
-            model_id,
-            trust_remote_code=True,
-        )
+            model_id = "Qwen/Qwen2.5-7B-Instruct"
 
-        if tokenizer.pad_token is None:
-            tokenizer.pad_token = tokenizer.eos_token
+            model = AutoModelForCausalLM.from_pretrained(
+                model_id,
+                torch_dtype=torch.float16,
+                device_map="auto",
+                trust_remote_code=True,
+            )
+            tokenizer = AutoTokenizer.from_pretrained(
+                model_id,
+                trust_remote_code=True,
+            )
 
-        pipe = pipeline(
-            "text-generation",
-            model=model,
-            tokenizer=tokenizer,
-            max_new_tokens=max_tokens,
-            do_sample=True,
-            temperature=temperature,
-            top_p=top_p,
-            pad_token_id=tokenizer.eos_token_id,
-        )
+            if tokenizer.pad_token is None:
+                tokenizer.pad_token = tokenizer.eos_token
 
-        _pipelines[key] = HuggingFacePipeline(pipeline=pipe)
+            _scheduler = GenerationScheduler(
+                model_id,
+                model,
+                tokenizer,
+                max_batch_size=settings.GENERATION_MAX_BATCH_SIZE,
+            )
 
-    return _pipelines[key]
+    return _scheduler
 
 
 async def stream_qwen2_5_7b_response(
@@ -70,25 +64,25 @@ async def stream_qwen2_5_7b_response(
     max_tokens: int,
 ) -> AsyncGenerator[str]:
     """
-    Streams a response from the Qwen2.5-7B model using the specified parameters.
+    Streams a response from the Qwen2.5-7B model token by token, using the
+    specified parameters. Concurrent requests share batched decode steps.
     """
     logger.info(
         "Streaming Qwen2.5-7B response for user prompt length: %d",
         len(user_prompt),
     )
 
-    llm = get_qwen2_5_7b_pipeline(temperature, top_p, max_tokens)
+    scheduler = await asyncio.to_thread(get_qwen2_5_7b_scheduler)
 
     messages = [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt},
     ]
 
-    prompt = llm.pipeline.tokenizer.apply_chat_template(
+    async for chunk in scheduler.generate(
         messages,
-        tokenize=False,
-        add_generation_prompt=True,
-    )
-
-    async for chunk in llm.astream(prompt):
+        temperature=temperature,
+        top_p=top_p,
+        max_tokens=max_tokens,
+    ):
         yield chunk
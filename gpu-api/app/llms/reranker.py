@@ -3,10 +3,14 @@ import logging
 import torch
 from sentence_transformers import CrossEncoder
 
+from app.utils.batching import MicroBatcher
 from app.utils.exceptions import ModelNotReadyError
+from app.utils.settings import Settings
 
 logger = logging.getLogger(__name__)
 
+settings = Settings()
+
 _reranker_model: CrossEncoder | None = None
 
 
@@ -29,10 +33,40 @@ def init_reranker() -> None:
         logger.info("Reranker model initialized successfully on device: %s", device)
 
 
-def rerank_documents(query: str, documents: list[str]) -> list[str]:
+def score_pairs(pairs: list[tuple[str, str]]) -> list[float]:
+    """
+    Score (query, document) pairs with the pre-loaded cross-encoder model,
+    in one forward pass per batch.
+    """
+    if _reranker_model is None:
+        raise ModelNotReadyError
+
+    scores = _reranker_model.predict(
+        pairs,
+        batch_size=settings.RERANK_BATCH_MAX_SIZE,
+        show_progress_bar=False,
+    )
+
+    return [float(score) for score in scores]
+
+
+reranker_batcher: MicroBatcher[tuple[str, str], float] = MicroBatcher(
+    "reranker",
+    score_pairs,
+    max_batch_size=settings.RERANK_BATCH_MAX_SIZE,
+    max_wait=settings.RERANK_BATCH_MAX_WAIT,
+)
+
+
+async def rerank_documents(
+    query: str,
+    documents: list[str],
+    top_n: int | None = None,
+) -> list[tuple[int, float]]:
     """
-    Re-ranks a list of documents based on their relevance to a query
-    using the pre-loaded cross-encoder model.
+    Re-ranks a list of documents based on their relevance to a query.
+    Returns (original index, score) pairs, most relevant first, limited to
+    `top_n` if given. Concurrent requests share forward passes.
     """
     logger.info(
         "Reranking %d documents for query: %s",
@@ -41,18 +75,10 @@ def rerank_documents(query: str, documents: list[str]) -> list[str]:
     )
 
     if not documents or not query:
-        return documents
-    if _reranker_model is None:
-        raise ModelNotReadyError
+        return [(index, 0.0) for index in range(len(documents))][:top_n]
 
-    model_inputs = [[query, doc] for doc in documents]
+    scores = await reranker_batcher.submit([(query, doc) for doc in documents])
 
-    scores = _reranker_model.predict(model_inputs)
-
-    scored_docs = sorted(
-        zip(scores, documents, strict=False),
-        key=lambda x: x[0],
-        reverse=True,
-    )
+    ranked = sorted(enumerate(scores), key=lambda x: x[1], reverse=True)
 
-    return [doc for _, doc in scored_docs]
+    return ranked[:top_n]
@@ -51,7 +51,9 @@ async def stream_response(
             top_p=top_p,
             max_tokens=max_tokens,
         ):
-            yield f"data: {token}\n\n"
+            # Tokens can end in newlines, which would end the SSE event early
+            preserved = token.replace("\n", "\\n")
+            yield f"data: {preserved}\n\n"
 
     return StreamingResponse(
         _sse_generator(),
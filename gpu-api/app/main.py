@@ -14,7 +14,8 @@ from app.api.health import router as health_router
 from app.api.rerank import router as rerank_router
 from app.api.streams import router as streams_router
 from app.llms.bge_m3 import init_bge_m3_embedder
-from app.llms.reranker import init_reranker
+from app.llms.embeddings import embedding_batchers
+from app.llms.reranker import init_reranker, reranker_batcher
 from app.utils.exceptions import ModelNotReadyError
 from app.utils.logger import setup_logging
 from app.utils.settings import Settings
@@ -36,6 +37,11 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None]:
 
     yield
 
+    await gather(
+        reranker_batcher.stop(),
+        *(batcher.stop() for batcher in embedding_batchers.values()),
+    )
+
 
 def make_app(settings: Settings) -> FastAPI:
     """
@@ -6,9 +6,36 @@ class RerankRequestSchema(BaseModel):
     documents: list[str] = Field(
         description="A list of document contents to be reranked.",
     )
+    top_n: int | None = Field(
+        default=None,
+        ge=1,
+        description="Return only this many most relevant documents.",
+    )
+    return_documents: bool = Field(
+        default=True,
+        description=(
+            "Whether to send the document contents back. Clients that keep "
+            "the documents can map the results by index instead."
+        ),
+    )
+
+
+class RerankResultSchema(BaseModel):
+    index: int = Field(description="The document's position in the request.")
+    score: float = Field(description="The cross-encoder's relevance score.")
+    document: str | None = Field(
+        default=None,
+        description="The document contents, if requested.",
+    )
 
 
 class RerankResponseSchema(BaseModel):
+    results: list[RerankResultSchema] = Field(
+        description="The documents' indices and scores, most relevant first.",
+    )
     reranked_documents: list[str] = Field(
-        description="The documents reordered by their relevance to the query.",
+        description=(
+            "The documents reordered by their relevance to the query. "
+            "Empty if `return_documents` is false."
+        ),
     )
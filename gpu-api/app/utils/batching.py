@@ -0,0 +1,139 @@
+import asyncio
+import contextlib
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchRequest[T, R]:
+    items: list[T]
+    future: asyncio.Future[list[R]] = field(
+        default_factory=lambda: asyncio.get_running_loop().create_future(),
+    )
+
+
+class MicroBatcher[T, R]:
+    """
+    Dynamic micro-batching in front of a blocking model call. Concurrent
+    requests are collected for up to `max_wait` seconds after the first one,
+    or until `max_batch_size` items are queued, and run through `process` as
+    one batch on a worker thread. The results are scattered back in order.
+
+    `process` must return one result per item. A request larger than the
+    batch size runs alone and is never split.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        process: Callable[[list[T]], list[R]],
+        *,
+        max_batch_size: int,
+        max_wait: float,
+    ) -> None:
+        """
+        Create a batcher; its worker task starts with the first request.
+        """
+        self.name: str = name
+        self.process: Callable[[list[T]], list[R]] = process
+        self.max_batch_size: int = max(max_batch_size, 1)
+        self.max_wait: float = max_wait
+
+        self.queue: asyncio.Queue[BatchRequest[T, R]] | None = None
+        self.carry: BatchRequest[T, R] | None = None
+        self.task: asyncio.Task | None = None
+
+    async def submit(self, items: list[T]) -> list[R]:
+        """
+        Queue the items for the next batch and return their results.
+        """
+        if not items:
+            return []
+
+        if self.queue is None or self.task is None or self.task.done():
+            self.queue = asyncio.Queue()
+            self.task = asyncio.create_task(self.run(self.queue))
+
+        request: BatchRequest[T, R] = BatchRequest(items)
+        await self.queue.put(request)
+
+        return await request.future
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.task
+            self.task = None
+
+    async def run(self, queue: asyncio.Queue[BatchRequest[T, R]]) -> None:
+        """
+        Collect and run batches until cancelled.
+        """
+        while True:
+            batch = await self.collect(queue)
+            if batch:
+                await self.run_batch(batch)
+
+    async def collect(
+        self,
+        queue: asyncio.Queue[BatchRequest[T, R]],
+    ) -> list[BatchRequest[T, R]]:
+        """
+        Wait for a request, then gather more until the batch is full or
+        `max_wait` has passed.
+        """
+        first = self.carry or await queue.get()
+        self.carry = None
+
+        batch = [first]
+        size = len(first.items)
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+
+        while size < self.max_batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            try:
+                if timeout > 0:
+                    request = await asyncio.wait_for(queue.get(), timeout)
+                else:
+                    request = queue.get_nowait()
+            except (TimeoutError, asyncio.QueueEmpty):
+                break
+
+            if size + len(request.items) > self.max_batch_size:
+                self.carry = request
+                break
+
+            batch.append(request)
+            size += len(request.items)
+
+        # Requests whose clients went away don't need to be computed
+        return [request for request in batch if not request.future.done()]
+
+    async def run_batch(self, batch: list[BatchRequest[T, R]]) -> None:
+        items = [item for request in batch for item in request.items]
+
+        logger.debug(
+            "Running %s batch of %d items from %d requests",
+            self.name,
+            len(items),
+            len(batch),
+        )
+
+        try:
+            results = await asyncio.to_thread(self.process, items)
+        except Exception as e:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+
+        offset = 0
+        for request in batch:
+            end = offset + len(request.items)
+            if not request.future.done():
+                request.future.set_result(results[offset:end])
+            offset = end
@@ -14,6 +14,16 @@ class Settings(BaseSettings):
 
     PRELOAD_BGEM3: bool = True
 
+    # Concurrent requests are merged into batches of up to this many inputs,
+    # waiting at most this many seconds for the batch to fill
+    EMBEDDING_BATCH_MAX_SIZE: int = 64
+    EMBEDDING_BATCH_MAX_WAIT: float = 0.005
+    RERANK_BATCH_MAX_SIZE: int = 64
+    RERANK_BATCH_MAX_WAIT: float = 0.005
+
+    # Sequences decoded together by the self-hosted chat models
+    GENERATION_MAX_BATCH_SIZE: int = 8
+
     ALLOWED_ORIGINS: list[str] = ["*"]
     EXPOSE_HEADERS: list[str] = ["*"]
 